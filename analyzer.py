@@ -1,11 +1,17 @@
+import argparse
+import asyncio
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import CharacterTextSplitter
 from langchain.chat_models import ChatOpenAI
 from langchain.chains import create_extraction_chain
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
+from chunk_executor import ChunkExecutor, estimate_tokens, get_rate_limiter
+from extraction_cache import ExtractionCache
+from token_chunker import chunk_token_budget, split_pages, token_counter
 
 # Load environment variables
 load_dotenv()
@@ -21,47 +27,21 @@ def find_pdf_files(directory):
                 pdf_files.append(os.path.join(root, file))
     return pdf_files
 
-def analyze_threat_intel_pdf(pdf_path, keyword=None):
-    """
-    Analyze a threat intelligence PDF and extract key information.
-    If keyword is provided, focus on information related to that keyword.
-    """
-    try:
-        # Load PDF
-        loader = PyPDFLoader(pdf_path)
-        pages = loader.load_and_split()
-        
-        # Split text into manageable chunks
-        text_splitter = CharacterTextSplitter(
-            separator="\n",
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        texts = text_splitter.split_documents(pages)
-        
-        # Define the schema for information extraction
-        schema = {
-            "properties": {
-                "threat_actor": {"type": "string", "description": "Name of the threat actor or group"},
-                "malware_name": {"type": "string", "description": "Names of any malware mentioned"},
-                "attack_vector": {"type": "string", "description": "Methods used to carry out the attack"},
-                "indicators": {"type": "string", "description": "IOCs like IP addresses, domains, or file hashes"},
-                "targeted_sectors": {"type": "string", "description": "Industries or sectors targeted"},
-                "severity": {"type": "string", "description": "Severity level of the threat"},
-                "relevance": {"type": "string", "description": "Relevance to the search keyword"},
-            },
-            "required": ["threat_actor", "malware_name", "attack_vector"],
-        }
-        
-        # Initialize LLM
-        llm = ChatOpenAI(temperature=0, model="gpt-3.5-turbo")
-        
-        # If keyword is provided, create a specific prompt for keyword-focused analysis
-        if keyword:
-            prompt = PromptTemplate(
-                input_variables=["text", "keyword"],
-                template="""
+# Define the schema for information extraction
+EXTRACTION_SCHEMA = {
+    "properties": {
+        "threat_actor": {"type": "string", "description": "Name of the threat actor or group"},
+        "malware_name": {"type": "string", "description": "Names of any malware mentioned"},
+        "attack_vector": {"type": "string", "description": "Methods used to carry out the attack"},
+        "indicators": {"type": "string", "description": "IOCs like IP addresses, domains, or file hashes"},
+        "targeted_sectors": {"type": "string", "description": "Industries or sectors targeted"},
+        "severity": {"type": "string", "description": "Severity level of the threat"},
+        "relevance": {"type": "string", "description": "Relevance to the search keyword"},
+    },
+    "required": ["threat_actor", "malware_name", "attack_vector"],
+}
+
+KEYWORD_PROMPT_TEMPLATE = """
                 Analyze the following threat intelligence text, focusing specifically on information related to '{keyword}':
                 
                 {text}
@@ -76,39 +56,233 @@ def analyze_threat_intel_pdf(pdf_path, keyword=None):
                 
                 If there's no relevant information about '{keyword}', indicate that clearly.
                 """
-            )
-            keyword_chain = LLMChain(llm=llm, prompt=prompt)
+
+LLM_MODEL = "gpt-3.5-turbo"
+LLM_TEMPERATURE = 0
+
+# Document tokens per LLM call (0 = derive from the model's context window)
+LLM_CHUNK_TOKENS = int(os.getenv("LLM_CHUNK_TOKENS", "0"))
+LLM_CHUNK_OVERLAP_TOKENS = int(os.getenv("LLM_CHUNK_OVERLAP_TOKENS", "0"))
+
+def load_pdf_chunks(pdf_path, max_tokens=None):
+    """
+    Load a PDF and pack its pages into chunks of up to max_tokens tokens
+    (by default the budget for LLM_MODEL, see token_chunker).
+    Returns (page_count, chunk_texts); safe to run in a worker process.
+    """
+    # Load PDF, one document per page
+    loader = PyPDFLoader(pdf_path)
+    pages = loader.load()
+    
+    if max_tokens is None:
+        max_tokens = chunk_token_budget(LLM_MODEL, {"chunk_tokens": LLM_CHUNK_TOKENS})
+    texts = split_pages(
+        [page.page_content for page in pages], max_tokens,
+        overlap_tokens=LLM_CHUNK_OVERLAP_TOKENS, count=token_counter(LLM_MODEL)
+    )
+    return len(pages), texts
+
+def build_chains(keyword=None):
+    """
+    Create the extraction chain and, if keyword is provided, the keyword relevance chain.
+    """
+    # Initialize LLM
+    llm = ChatOpenAI(temperature=LLM_TEMPERATURE, model=LLM_MODEL)
+    
+    # If keyword is provided, create a specific prompt for keyword-focused analysis
+    keyword_chain = None
+    if keyword:
+        prompt = PromptTemplate(
+            input_variables=["text", "keyword"],
+            template=KEYWORD_PROMPT_TEMPLATE
+        )
+        keyword_chain = LLMChain(llm=llm, prompt=prompt)
+    
+    # Create extraction chain
+    extraction_chain = create_extraction_chain(EXTRACTION_SCHEMA, llm)
+    return extraction_chain, keyword_chain
+
+async def extract_chunk(content, extraction_chain, keyword_chain, keyword, executor, cache=None):
+    """
+    Run the keyword check (if any) and structured extraction for one chunk.
+    With a cache, a previously seen chunk/model/prompt combination skips the LLM entirely.
+    """
+    cache_key = None
+    if cache is not None:
+        prompt = KEYWORD_PROMPT_TEMPLATE.replace("{keyword}", keyword) if keyword else None
+        cache_key = ExtractionCache.make_key(content, LLM_MODEL, LLM_TEMPERATURE, EXTRACTION_SCHEMA, prompt)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    result = await _extract_chunk_uncached(content, extraction_chain, keyword_chain, keyword, executor)
+    if cache_key is not None:
+        cache.set(cache_key, result)
+    return result
+
+async def _extract_chunk_uncached(content, extraction_chain, keyword_chain, keyword, executor):
+    keyword_analysis = None
+    # If keyword is provided, first check relevance
+    if keyword:
+        keyword_analysis = await executor.call(
+            keyword_chain.run, text=content, keyword=keyword,
+            tokens=estimate_tokens(content)
+        )
+        if "no relevant information" in keyword_analysis.lower():
+            return []
+    
+    # Extract structured information
+    result = await executor.call(
+        extraction_chain.run, content, tokens=estimate_tokens(content)
+    )
+    if not result:
+        return []
+    # Add keyword relevance if applicable
+    if keyword:
+        for item in result:
+            item["relevance"] = keyword_analysis
+    return result
+
+def analyze_threat_intel_pdf(pdf_path, keyword=None, executor=None, cache=None):
+    """
+    Analyze a threat intelligence PDF and extract key information.
+    If keyword is provided, focus on information related to that keyword.
+    Chunks are processed concurrently by `executor` (a ChunkExecutor); by default
+    one is built from LLM_MAX_CONCURRENCY and the OpenAI rate limits.
+    Pass an ExtractionCache as `cache` to reuse results for unchanged chunks.
+    """
+    try:
+        _, texts = load_pdf_chunks(pdf_path)
+        extraction_chain, keyword_chain = build_chains(keyword)
         
-        # Create extraction chain
-        extraction_chain = create_extraction_chain(schema, llm)
+        if executor is None:
+            executor = ChunkExecutor(rate_limiter=get_rate_limiter("openai"))
         
-        # Process each chunk and extract information
+        async def process_chunk(content):
+            return await extract_chunk(content, extraction_chain, keyword_chain, keyword, executor, cache)
+        
+        # Process chunks concurrently; results come back in chunk order
         all_results = []
-        for text in texts:
-            try:
-                # If keyword is provided, first check relevance
-                if keyword:
-                    keyword_analysis = keyword_chain.run(text=text.page_content, keyword=keyword)
-                    if "no relevant information" in keyword_analysis.lower():
-                        continue
-                
-                # Extract structured information
-                result = extraction_chain.run(text.page_content)
-                if result:
-                    # Add keyword relevance if applicable
-                    if keyword:
-                        for item in result:
-                            item["relevance"] = keyword_analysis
-                    all_results.extend(result)
-                    
-            except Exception as e:
-                print(f"Error processing chunk in {pdf_path}: {e}")
+        for chunk in executor.run(process_chunk, texts):
+            if chunk.ok:
+                all_results.extend(chunk.value)
+            else:
+                print(f"Error processing chunk {chunk.index} in {pdf_path}: {chunk.error}")
         
         return all_results
     except Exception as e:
         print(f"Error processing PDF {pdf_path}: {e}")
         return []
 
+class ThroughputMeter:
+    """
+    Count pages, chunks and files processed and print live rates.
+    """
+    def __init__(self, total_files, interval=2.0):
+        self.total_files = total_files
+        self.interval = interval
+        self.pages = 0
+        self.chunks = 0
+        self.files = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+    
+    def add(self, pages=0, chunks=0, files=0):
+        self.pages += pages
+        self.chunks += chunks
+        self.files += files
+        if time.monotonic() - self._last_report >= self.interval:
+            self.report()
+    
+    def report(self):
+        now = time.monotonic()
+        self._last_report = now
+        elapsed = max(now - self.started, 1e-9)
+        print(
+            f"[{elapsed:7.1f}s] files {self.files}/{self.total_files} | "
+            f"{self.pages / elapsed:.1f} pages/s | {self.chunks / elapsed:.1f} chunks/s"
+        )
+
+async def analyze_directory_parallel(pdf_files, keyword, output_dir, workers=None, executor=None, cache=None):
+    """
+    Analyze many PDFs at once: parse and split them in a process pool and feed
+    the chunks into a shared LLM work queue. Each file's summary is written to
+    output_dir as soon as its last chunk completes. Returns summaries in input order.
+    """
+    loop = asyncio.get_running_loop()
+    if executor is None:
+        executor = ChunkExecutor(rate_limiter=get_rate_limiter("openai"))
+    extraction_chain, keyword_chain = build_chains(keyword)
+    
+    workers = workers or os.cpu_count() or 1
+    queue = asyncio.Queue(maxsize=executor.max_concurrency * 4)
+    # Limit parsed-but-unqueued files so parsing cannot race far ahead of the LLM
+    parse_slots = asyncio.Semaphore(workers * 2)
+    pending = {}
+    summaries = [None] * len(pdf_files)
+    meter = ThroughputMeter(len(pdf_files))
+    
+    def finish(file_index, chunk_results):
+        # Runs on an LLM worker or parse task: report failures instead of raising,
+        # which would stop the worker and stall the queue
+        pdf_path = pdf_files[file_index]
+        try:
+            results = [item for chunk in chunk_results for item in chunk]
+            summary = format_results(results, pdf_path, keyword)
+            summaries[file_index] = summary
+            
+            # Save individual results
+            pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+            individual_output = os.path.join(output_dir, f"{pdf_name}_analysis.txt")
+            with open(individual_output, "w", encoding="utf-8") as f:
+                f.write(summary)
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {e}")
+        meter.add(files=1)
+    
+    async def llm_worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            file_index, chunk_index, content = item
+            try:
+                value = await extract_chunk(content, extraction_chain, keyword_chain, keyword, executor, cache)
+            except Exception as e:
+                print(f"Error processing chunk {chunk_index} in {pdf_files[file_index]}: {e}")
+                value = []
+            chunk_results = pending[file_index]
+            chunk_results[chunk_index] = value
+            meter.add(chunks=1)
+            if all(chunk is not None for chunk in chunk_results):
+                del pending[file_index]
+                finish(file_index, chunk_results)
+    
+    async def parse_file(pool, file_index, pdf_path):
+        async with parse_slots:
+            try:
+                page_count, texts = await loop.run_in_executor(pool, load_pdf_chunks, pdf_path)
+            except Exception as e:
+                print(f"Error processing PDF {pdf_path}: {e}")
+                page_count, texts = 0, []
+            meter.add(pages=page_count)
+            if not texts:
+                finish(file_index, [])
+                return
+            pending[file_index] = [None] * len(texts)
+            for chunk_index, content in enumerate(texts):
+                await queue.put((file_index, chunk_index, content))
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        llm_tasks = [asyncio.create_task(llm_worker()) for _ in range(executor.max_concurrency)]
+        await asyncio.gather(*(parse_file(pool, i, path) for i, path in enumerate(pdf_files)))
+        for _ in llm_tasks:
+            await queue.put(None)
+        await asyncio.gather(*llm_tasks)
+    
+    meter.report()
+    return summaries
+
 def format_results(results, pdf_path, keyword=None):
     """
     Format the analysis results into a readable summary.
@@ -142,21 +316,37 @@ def format_results(results, pdf_path, keyword=None):
     
     return summary
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory of threat intelligence PDFs.")
+    parser.add_argument("directory", nargs="?", help="Directory containing threat intelligence PDFs (prompted if omitted)")
+    parser.add_argument("--keyword", help="Keyword to focus the analysis on")
+    parser.add_argument("--workers", type=int, default=None, help="PDF parsing processes in parallel mode (default: CPU count)")
+    parser.add_argument("--sequential", action="store_true", help="Analyze one file at a time instead of the parallel batch mode")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the LLM instead of reusing cached chunk results")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    
     # Check for OpenAI API key
     if not os.getenv("OPENAI_API_KEY"):
         print("Error: OPENAI_API_KEY environment variable not set")
         return
     
     # Get directory path from user
-    directory = input("Enter the path to the directory containing threat intelligence PDFs: ")
+    directory = args.directory
+    keyword = args.keyword
+    if directory is None:
+        directory = input("Enter the path to the directory containing threat intelligence PDFs: ")
+        
+        # Get optional keyword from user
+        if keyword is None:
+            keyword = input("Enter a keyword to focus the analysis (or press Enter to analyze everything): ").strip()
     
     if not os.path.exists(directory):
         print(f"Error: Directory not found at {directory}")
         return
     
-    # Get optional keyword from user
-    keyword = input("Enter a keyword to focus the analysis (or press Enter to analyze everything): ").strip()
     if not keyword:
         keyword = None
     
@@ -173,23 +363,29 @@ def main():
     timestamp = os.path.join("analysis_results", f"analysis_{os.path.basename(directory)}_{os.path.basename(os.path.dirname(directory))}")
     os.makedirs(timestamp, exist_ok=True)
     
+    cache = None if args.no_cache else ExtractionCache()
+    
     # Process each PDF
     all_summaries = []
-    for i, pdf_path in enumerate(pdf_files, 1):
-        try:
-            print(f"\nProcessing {i}/{len(pdf_files)}: {os.path.basename(pdf_path)}")
-            results = analyze_threat_intel_pdf(pdf_path, keyword)
-            summary = format_results(results, pdf_path, keyword)
-            all_summaries.append(summary)
-            
-            # Save individual results
-            pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-            individual_output = os.path.join(timestamp, f"{pdf_name}_analysis.txt")
-            with open(individual_output, "w", encoding="utf-8") as f:
-                f.write(summary)
-            
-        except Exception as e:
-            print(f"Error processing {pdf_path}: {e}")
+    if not args.sequential:
+        summaries = asyncio.run(analyze_directory_parallel(pdf_files, keyword, timestamp, workers=args.workers, cache=cache))
+        all_summaries = [summary for summary in summaries if summary is not None]
+    else:
+        for i, pdf_path in enumerate(pdf_files, 1):
+            try:
+                print(f"\nProcessing {i}/{len(pdf_files)}: {os.path.basename(pdf_path)}")
+                results = analyze_threat_intel_pdf(pdf_path, keyword, cache=cache)
+                summary = format_results(results, pdf_path, keyword)
+                all_summaries.append(summary)
+                
+                # Save individual results
+                pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+                individual_output = os.path.join(timestamp, f"{pdf_name}_analysis.txt")
+                with open(individual_output, "w", encoding="utf-8") as f:
+                    f.write(summary)
+                
+            except Exception as e:
+                print(f"Error processing {pdf_path}: {e}")
     
     # Save combined results
     combined_output = os.path.join(timestamp, "combined_analysis.txt")
@@ -201,6 +397,10 @@ def main():
     print(f"\nAnalysis complete! Results have been saved to:")
     print(f"- Combined results: {combined_output}")
     print(f"- Individual results: {timestamp}/*.txt")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Extraction cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+        cache.close()
 
 if __name__ == "__main__":
     main()
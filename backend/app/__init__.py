@@ -1,8 +1,18 @@
-from .database import init, get_db, get_es, check_postgres_connection, check_es_connection
+import os
+import sys
+
+# Modules shared with the analyzer and the detector live at the repository
+# root when running from a checkout; the Docker image copies them next to
+# main.py instead
+_repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if os.path.isdir(os.path.join(_repo_root, "ics_anomaly_detector")) and _repo_root not in sys.path:
+    sys.path.append(_repo_root)
+
+from .database import init, get_db, get_es, get_async_es, check_postgres_connection, check_es_connection
 from .models import APIKey, LLMModel, APIKeyCreate, APIKeyUpdate, APIKeyResponse, LLMModelCreate, LLMModelUpdate, LLMModelResponse
 
 __all__ = [
-    'init', 'get_db', 'get_es', 'check_postgres_connection', 'check_es_connection',
+    'init', 'get_db', 'get_es', 'get_async_es', 'check_postgres_connection', 'check_es_connection',
     'APIKey', 'LLMModel', 'APIKeyCreate', 'APIKeyUpdate', 'APIKeyResponse',
     'LLMModelCreate', 'LLMModelUpdate', 'LLMModelResponse'
 ]
@@ -0,0 +1,19 @@
+import os
+import threading
+
+# One ExtractionCache serves the backend and the analyzer
+from extraction_cache import ExtractionCache
+
+# The backend keeps its cache outside the analyzer's results directory
+DEFAULT_CACHE_PATH = os.path.join("cache", "extraction_cache.sqlite3")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_extraction_cache():
+    """Get the process-wide extraction cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(os.getenv("EXTRACTION_CACHE_PATH", DEFAULT_CACHE_PATH))
+        return _cache
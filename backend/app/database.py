@@ -1,8 +1,8 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
 from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from typing import Generator
+from typing import Generator, Optional
 from contextlib import contextmanager
 import os
 from dotenv import load_dotenv
@@ -25,16 +25,25 @@ ES_USER = os.getenv("ES_USER", "elastic")
 ES_PASSWORD = os.getenv("ES_PASSWORD", "changeme")
 ES_INDEX = "threat-intel"
 
+# Async client used by the API routes: pooled connections per node, request
+# timeout (seconds) and retries. Idle pooled connections are closed after
+# aiohttp's default keep-alive (15s); elastic_transport does not expose it.
+ES_POOL_MAXSIZE = int(os.getenv("ES_POOL_MAXSIZE", "100"))
+ES_REQUEST_TIMEOUT = float(os.getenv("ES_REQUEST_TIMEOUT", "10"))
+ES_MAX_RETRIES = int(os.getenv("ES_MAX_RETRIES", "3"))
+
 # Create SQLAlchemy engine
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create Elasticsearch client
+# Create Elasticsearch client (startup and the bulk writer thread)
 es_client = Elasticsearch(
     [f"http://{ES_HOST}:{ES_PORT}"],
     basic_auth=(ES_USER, ES_PASSWORD)
 )
 
+_async_es_client: Optional[AsyncElasticsearch] = None
+
 Base = declarative_base()
 
 @contextmanager
@@ -67,6 +76,28 @@ def get_es():
     """Get Elasticsearch client."""
     return es_client
 
+def get_async_es() -> AsyncElasticsearch:
+    """Get the pooled async Elasticsearch client for request handlers."""
+    global _async_es_client
+    if _async_es_client is None:
+        _async_es_client = AsyncElasticsearch(
+            [f"http://{ES_HOST}:{ES_PORT}"],
+            basic_auth=(ES_USER, ES_PASSWORD),
+            node_class="aiohttp",
+            connections_per_node=ES_POOL_MAXSIZE,
+            request_timeout=ES_REQUEST_TIMEOUT,
+            max_retries=ES_MAX_RETRIES,
+            retry_on_timeout=True
+        )
+    return _async_es_client
+
+async def close_async_es():
+    """Close the async client's connection pool, if it was created."""
+    global _async_es_client
+    if _async_es_client is not None:
+        await _async_es_client.close()
+        _async_es_client = None
+
 # Database initialization function
 def init():
     try:
@@ -88,10 +119,10 @@ def check_postgres_connection():
         print(f"PostgreSQL connection error: {e}")
         return False
 
-def check_es_connection():
+async def check_es_connection():
     """Check Elasticsearch connection."""
     try:
-        return es_client.ping()
+        return await get_async_es().ping()
     except Exception as e:
         print(f"Elasticsearch connection error: {e}")
         return False
@@ -0,0 +1,35 @@
+import os
+import threading
+
+# One BulkWriter serves the backend and the detector
+from ics_anomaly_detector.es_bulk import BulkWriter
+
+# How long an upload waits for its document to be indexed
+ES_BULK_WAIT_TIMEOUT = float(os.getenv("ES_BULK_WAIT_TIMEOUT", "60"))
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_bulk_writer():
+    """Get the process-wide bulk writer for the backend Elasticsearch client."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            from app.database import get_es
+            from app.metrics import get_metrics
+            _writer = BulkWriter(
+                get_es(),
+                max_docs=int(os.getenv("ES_BULK_MAX_DOCS", "100")),
+                max_bytes=int(os.getenv("ES_BULK_MAX_BYTES", str(10 * 1024 * 1024))),
+                flush_interval=float(os.getenv("ES_BULK_FLUSH_INTERVAL", "1.0")),
+                latency=get_metrics().histogram("elasticsearch.bulk")
+            )
+        return _writer
+
+def close_bulk_writer():
+    """Flush and stop the bulk writer, if one was created."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
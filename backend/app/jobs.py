@@ -0,0 +1,190 @@
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_QUEUE_SIZE = int(os.getenv("ANALYSIS_QUEUE_SIZE", "32"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "1000"))
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more work."""
+
+class LocalBroker:
+    """
+    In-process stand-in for a message broker: a bounded FIFO of job ids.
+    A networked broker only needs to provide the same publish/consume methods.
+    """
+
+    def __init__(self, maxsize: int = ANALYSIS_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def publish(self, job_id: Optional[str], block: bool = False):
+        try:
+            self._queue.put(job_id, block=block)
+        except queue.Full:
+            raise QueueFullError("Analysis queue is full")
+
+    def consume(self, timeout: Optional[float] = None) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+@dataclass
+class Job:
+    id: str
+    func: Callable = field(repr=False)
+    args: tuple = field(default=(), repr=False)
+    kwargs: dict = field(default_factory=dict, repr=False)
+    key: Optional[str] = None
+    status: str = "queued"
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    chunks_done: int = 0
+    chunks_total: int = 0
+    result: Any = None
+    error: Optional[str] = None
+
+    def update_progress(self, chunks_done: int, chunks_total: int):
+        self.chunks_done = chunks_done
+        self.chunks_total = chunks_total
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": {
+                "chunks_done": self.chunks_done,
+                "chunks_total": self.chunks_total
+            },
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "error": self.error
+        }
+
+class JobQueue:
+    """
+    Run analysis jobs on a pool of worker threads fed from a bounded broker.
+
+    Job functions receive a `progress(chunks_done, chunks_total)` keyword
+    argument. Finished jobs are kept (up to `retention`) so their status and
+    results can be polled. Jobs submitted with a key can be found by it while
+    they are queued or running, so duplicate work can join them.
+    """
+
+    def __init__(self, workers: int = ANALYSIS_WORKERS, broker: Optional[LocalBroker] = None,
+                 retention: int = JOB_RETENTION):
+        self.workers = max(1, workers)
+        self.broker = broker or LocalBroker()
+        self.retention = retention
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"analysis-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self, timeout: Optional[float] = None):
+        for _ in self._threads:
+            self.broker.publish(None, block=True)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _remember(self, job: Job):
+        with self._lock:
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs once over the retention limit
+            for job_id in list(self._jobs):
+                if len(self._jobs) <= self.retention:
+                    break
+                if self._jobs[job_id].status in ("completed", "failed"):
+                    del self._jobs[job_id]
+
+    def _release(self, job: Job):
+        # Caller holds self._lock
+        if job.key is not None and self._active.get(job.key) is job:
+            del self._active[job.key]
+
+    def submit(self, func: Callable, *args, key: Optional[str] = None, **kwargs) -> Job:
+        """
+        Queue func(*args, progress=..., **kwargs); raises QueueFullError when
+        saturated. key (not passed to func) makes the job findable with
+        find_active until it finishes.
+        """
+        job = Job(id=uuid.uuid4().hex, func=func, args=args, kwargs=kwargs, key=key)
+        self._remember(job)
+        if key is not None:
+            with self._lock:
+                self._active[key] = job
+        try:
+            self.broker.publish(job.id)
+        except BaseException:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+                self._release(job)
+            raise
+        return job
+
+    def find_active(self, key: str) -> Optional[Job]:
+        """Return the queued or running job submitted with key, if any."""
+        with self._lock:
+            return self._active.get(key)
+
+    def completed(self, result: Any) -> Job:
+        """Record a job whose result is already known (e.g. a deduplicated upload)."""
+        now = datetime.utcnow()
+        job = Job(id=uuid.uuid4().hex, func=None, status="completed",
+                  started_at=now, finished_at=now, result=result)
+        self._remember(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _worker(self):
+        while True:
+            job_id = self.broker.consume()
+            if job_id is None:
+                return
+            job = self.get(job_id)
+            if job is None:
+                continue
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            try:
+                job.result = job.func(*job.args, progress=job.update_progress, **job.kwargs)
+                job.status = "completed"
+            except Exception as e:
+                print(f"Error running job {job.id}: {e}")
+                job.error = getattr(e, "detail", None) or str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = datetime.utcnow()
+                job.func = job.args = job.kwargs = None
+                with self._lock:
+                    self._release(job)
+
+job_queue = JobQueue()
+
+def get_job_queue() -> JobQueue:
+    """Get the analysis job queue."""
+    return job_queue
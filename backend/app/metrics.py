@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from ics_anomaly_detector.metrics import Histogram as _Histogram
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+class Histogram(_Histogram):
+    """
+    The detector's HDR-style latency histogram plus the maximum, summarized
+    as a dict for /api/metrics. Like the base class, recording takes no lock
+    and is meant for one writer; Metrics records routes and spans under its
+    own lock.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        super().record(seconds)
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self) -> dict:
+        """Summary plus the non-empty buckets as [upper bound in seconds, count] pairs."""
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            **{f"p{int(q * 100)}": self.quantile(q) for q in QUANTILES},
+            "buckets": [[upper, count] for upper, count in self.buckets()]
+        }
+
+class Metrics:
+    """
+    Per-route request latency, named span durations and counters.
+
+    Routes are keyed by their path template ("GET /api/documents/{document_id}")
+    so ids do not multiply the series. Spans time named stages of work such
+    as the parse, split, LLM and index steps of an upload.
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, Histogram] = defaultdict(Histogram)
+        self._statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._spans: Dict[str, Histogram] = defaultdict(Histogram)
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record_request(self, route: str, status_code: int, seconds: float):
+        with self._lock:
+            self._routes[route].record(seconds)
+            self._statuses[route][f"{status_code // 100}xx"] += 1
+
+    def record_span(self, name: str, seconds: float):
+        with self._lock:
+            self._spans[name].record(seconds)
+
+    def histogram(self, name: str) -> Histogram:
+        """The histogram behind span `name`, for a single writer to record into directly."""
+        with self._lock:
+            return self._spans[name]
+
+    def increment(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the enclosed block as span `name`; yields a dict the block may add counts to."""
+        counts = {}
+        started = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.record_span(name, time.perf_counter() - started)
+            for key, value in counts.items():
+                self.increment(f"{name}.{key}", value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {
+                route: {**histogram.to_dict(), "status": dict(self._statuses[route])}
+                for route, histogram in sorted(self._routes.items())
+            }
+            spans = {name: histogram.to_dict() for name, histogram in sorted(self._spans.items())}
+            counters = dict(sorted(self._counters.items()))
+        return {"routes": routes, "spans": spans, "counters": counters}
+
+metrics = Metrics()
+
+def get_metrics() -> Metrics:
+    """Get the process-wide metrics."""
+    return metrics
+
+def route_name(scope: dict) -> Optional[str]:
+    """'METHOD /path/template' for a matched request, None if no route matched."""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if template is None:
+        return None
+    # Routes of an included router may not carry the router prefix; take it
+    # from the part of the request path in front of the matched route
+    path = scope.get("path", "")
+    try:
+        matched = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        matched = None
+    if matched and path.endswith(matched):
+        template = path[:len(path) - len(matched)] + template
+    return f"{scope.get('method', '')} {template}"
@@ -102,6 +102,13 @@ es_threat_intel_mapping = {
                     "relevance": {"type": "text"}
                 }
             },
+            "model_used": {
+                "properties": {
+                    "id": {"type": "integer"},
+                    "name": {"type": "keyword"},
+                    "provider": {"type": "keyword"}
+                }
+            },
             "metadata": {
                 "properties": {
                     "file_size": {"type": "long"},
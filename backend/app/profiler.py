@@ -0,0 +1,119 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Opt-in sampling profiler: requests and analysis jobs slower than
+# PROFILE_SLOW_MS are written to PROFILE_DIR as collapsed stacks
+# (flamegraph.pl / speedscope / inferno input). 0 disables it.
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+class _Session:
+    def __init__(self, label: str, thread_id: int):
+        self.label = label
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+        self.stacks: Counter = Counter()
+        self.path: Optional[str] = None
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+def collapse_stack(frame) -> str:
+    """Root-first 'a;b;c' stack of a frame, as used by flame graph tools."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SamplingProfiler:
+    """
+    Sample the stacks of threads running a profiled request or job.
+
+    `profile(label)` registers the calling thread; while any session is
+    open a background thread reads `sys._current_frames()` every interval
+    and counts the collapsed stack of each registered thread. Sessions that
+    ran for at least `slow_seconds` are written to `output_dir`; the rest are
+    discarded. With slow_seconds=0 nothing is sampled. An async route
+    shares the event loop thread, so its samples include whatever else the
+    loop ran meanwhile.
+    """
+
+    def __init__(self, slow_seconds: float = PROFILE_SLOW_MS / 1000,
+                 interval: float = PROFILE_INTERVAL_MS / 1000, output_dir: str = PROFILE_DIR):
+        self.slow_seconds = slow_seconds
+        self.interval = interval
+        self.output_dir = output_dir
+        self.dumped = 0
+        self._sessions: Dict[int, _Session] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_seconds > 0
+
+    @contextmanager
+    def profile(self, label: str):
+        """Profile the enclosed block on the current thread; yields the session or None."""
+        if not self.enabled:
+            yield None
+            return
+        session = _Session(label, threading.get_ident())
+        with self._cond:
+            self._sessions[id(session)] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        try:
+            yield session
+        finally:
+            with self._cond:
+                del self._sessions[id(session)]
+            elapsed = time.perf_counter() - session.started
+            if elapsed >= self.slow_seconds and session.stacks:
+                self._dump(session, elapsed)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._sessions)
+                sessions = list(self._sessions.values())
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is not None:
+                    session.stacks[collapse_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _dump(self, session: _Session, elapsed: float):
+        label = re.sub(r"[^A-Za-z0-9_.-]+", "_", session.label).strip("_") or "profile"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{label}-{int(elapsed * 1000)}ms.folded"
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, name)
+            with open(path, "w") as f:
+                for stack, count in session.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"Error writing profile for {session.label}: {e}")
+            return
+        session.path = path
+        self.dumped += 1
+        print(f"Slow {session.label} ({elapsed:.2f}s) profile written to {path}")
+
+profiler = SamplingProfiler()
+
+def get_profiler() -> SamplingProfiler:
+    """Get the process-wide sampling profiler."""
+    return profiler
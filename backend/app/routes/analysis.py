@@ -1,132 +1,317 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import os
+import tempfile
 from datetime import datetime
 import hashlib
-from app.database import get_db, get_es
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from app.database import get_db, get_async_es
 from app.models import LLMModel
+from app.cache import ExtractionCache, get_extraction_cache
+from token_chunker import chunk_token_budget, split_pages, token_counter
+from app.jobs import QueueFullError, get_job_queue
+from app.es_bulk import ES_BULK_WAIT_TIMEOUT, get_bulk_writer
+from app.metrics import get_metrics
+from app.profiler import get_profiler
+from langchain_community.callbacks import get_openai_callback
 from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import CharacterTextSplitter
 from langchain_community.chat_models import ChatOpenAI
 from langchain.chains import create_extraction_chain
 
 router = APIRouter()
 
+# Upload spooling configuration
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+# Form field carrying the PDF, and the allowance for multipart boundaries and
+# part headers on top of MAX_UPLOAD_BYTES when bounding the request body
+UPLOAD_FIELD = "file"
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+EXTRACTION_SCHEMA = {
+    "properties": {
+        "threat_actor": {"type": "string"},
+        "malware_name": {"type": "string"},
+        "attack_vector": {"type": "string"},
+        "indicators": {"type": "string"},
+        "targeted_sectors": {"type": "string"},
+        "severity": {"type": "string"}
+    },
+    "required": ["threat_actor", "malware_name", "attack_vector"]
+}
+
 def get_document_hash(content: bytes) -> str:
     """Generate a unique hash for the document."""
     return hashlib.sha256(content).hexdigest()
 
-async def process_pdf(file: UploadFile, model_id: int, db: Session):
-    """Process PDF file and store in Elasticsearch."""
-    # Read file content
-    content = await file.read()
-    document_id = get_document_hash(content)
+def _upload_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the {max_bytes} byte upload limit")
+
+class _FileSpooler:
+    """MultipartParser callbacks writing the UPLOAD_FIELD part to an open file, hashing it."""
     
-    # Save file temporarily
-    temp_path = f"temp_{file.filename}"
-    with open(temp_path, "wb") as f:
-        f.write(content)
+    def __init__(self, out, max_bytes: int):
+        self.out = out
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.filename = None
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._spooling = False
     
-    try:
-        # Get model configuration
-        model = db.query(LLMModel).filter(LLMModel.id == model_id).first()
-        if not model:
-            raise HTTPException(status_code=404, detail="Model not found")
-        
-        # Load and process PDF
-        loader = PyPDFLoader(temp_path)
-        pages = loader.load_and_split()
-        
-        # Get file metadata
-        file_stats = os.stat(temp_path)
-        
-        # Prepare document metadata
-        metadata = {
-            "file_size": file_stats.st_size,
-            "page_count": len(pages),
-            "last_modified": datetime.fromtimestamp(file_stats.st_mtime).isoformat()
-        }
-        
-        # Process content
-        text_splitter = CharacterTextSplitter(
-            separator="\n",
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        texts = text_splitter.split_documents(pages)
-        
-        # Initialize LLM with model configuration
-        llm = ChatOpenAI(
-            model=model.model_name,
-            temperature=model.configuration.get("temperature", 0),
-            api_key=model.api_key.key_value
-        )
-        
-        # Create extraction chain
-        chain = create_extraction_chain({
-            "properties": {
-                "threat_actor": {"type": "string"},
-                "malware_name": {"type": "string"},
-                "attack_vector": {"type": "string"},
-                "indicators": {"type": "string"},
-                "targeted_sectors": {"type": "string"},
-                "severity": {"type": "string"}
-            },
-            "required": ["threat_actor", "malware_name", "attack_vector"]
-        }, llm)
-        
-        # Process each chunk
-        all_results = []
-        for text in texts:
-            try:
-                result = chain.run(text.page_content)
-                if result:
-                    all_results.extend(result)
-            except Exception as e:
-                print(f"Error processing chunk: {e}")
-        
-        # Prepare document for Elasticsearch
-        es_document = {
-            "document_id": document_id,
-            "filename": file.filename,
-            "upload_date": datetime.utcnow().isoformat(),
-            "content": "\n".join(text.page_content for text in texts),
-            "analysis_results": all_results,
-            "metadata": metadata,
-            "model_used": {
-                "id": model.id,
-                "name": model.model_name,
-                "provider": model.provider
-            }
-        }
-        
-        # Store in Elasticsearch
-        es = get_es()
-        es.index(index="threat-intel", document=es_document, id=document_id)
-        
+    def callbacks(self) -> dict:
         return {
-            "document_id": document_id,
-            "results": all_results,
-            "metadata": metadata
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
         }
+    
+    def on_part_begin(self):
+        self._headers = {}
+    
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+    
+    def on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+    
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first file field is kept; other form fields are skipped
+        self._spooling = options.get(b"name") == UPLOAD_FIELD.encode() and self.filename is None
+        if self._spooling:
+            self.filename = options.get(b"filename", b"").decode("utf-8", "replace")
+            if not self.filename.endswith(".pdf"):
+                raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if not self._spooling:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise _upload_too_large(self.max_bytes)
+        self.digest.update(chunk)
+        self.out.write(chunk)
+    
+    def on_part_end(self):
+        self._spooling = False
+
+async def spool_upload(request: Request, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[str, str, str, int]:
+    """
+    Parse a multipart upload from request.stream(), writing its file part to a
+    unique temporary file and hashing it as it arrives. Taking an UploadFile
+    instead would let Starlette spool the whole body to its own temporary file
+    first, so the limit would not bound ingest and the file would be written
+    twice; here the body is rejected on Content-Length up front and cut off as
+    soon as it goes over.
+    Returns (path, filename, sha256 hex digest, size); rejects files over
+    max_bytes with 413.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    
+    body_limit = max_bytes + UPLOAD_OVERHEAD_BYTES
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > body_limit:
+        raise _upload_too_large(max_bytes)
+    
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=".pdf", dir=UPLOAD_TMP_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            spooler = _FileSpooler(f, max_bytes)
+            parser = MultipartParser(boundary, spooler.callbacks())
+            received = 0
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > body_limit:
+                    raise _upload_too_large(max_bytes)
+                try:
+                    parser.write(chunk)
+                except FormParserError as e:
+                    raise HTTPException(status_code=400, detail=f"Malformed multipart upload: {e}")
+            parser.finalize()
+        if spooler.filename is None:
+            raise HTTPException(status_code=422, detail=f"Missing '{UPLOAD_FIELD}' form field")
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, spooler.filename, spooler.digest.hexdigest(), spooler.size
+
+async def find_indexed_document(document_id: str, model: LLMModel) -> Optional[dict]:
+    """Return the stored document if this file was already analyzed with the same model."""
+    es = get_async_es()
+    result = await es.options(ignore_status=404).get(
+        index="threat-intel",
+        id=document_id,
+        source_includes=["document_id", "analysis_results", "metadata", "model_used"]
+    )
+    if not result.get("found"):
+        return None
+    source = result["_source"]
+    model_used = source.get("model_used") or {}
+    if model_used.get("name") != model.model_name or model_used.get("provider") != model.provider:
+        return None
+    return source
+
+def process_pdf(pdf_path: str, filename: str, document_id: str, model_id: int, progress=None):
+    """
+    Analyze a stored PDF and index it in Elasticsearch. Runs on a job worker;
+    `progress(chunks_done, chunks_total)` is called as chunks complete.
+    The file at pdf_path is removed when processing ends. Raises (failing the
+    job) if the document could not be indexed.
+    Each stage is timed as a process_pdf.* span in /api/metrics.
+    """
+    metrics = get_metrics()
+    try:
+        with get_profiler().profile(f"process_pdf {filename}"), metrics.span("process_pdf"), get_db() as db:
+            # Get model configuration
+            model = db.query(LLMModel).filter(LLMModel.id == model_id).first()
+            if not model:
+                raise HTTPException(status_code=404, detail="Model not found")
+            
+            # Load and process PDF, one document per page
+            with metrics.span("process_pdf.parse") as counts:
+                loader = PyPDFLoader(pdf_path)
+                pages = loader.load()
+                counts["pages"] = len(pages)
+            
+            # Get file metadata
+            file_stats = os.stat(pdf_path)
+            
+            # Prepare document metadata
+            metadata = {
+                "file_size": file_stats.st_size,
+                "page_count": len(pages),
+                "last_modified": datetime.fromtimestamp(file_stats.st_mtime).isoformat()
+            }
+            
+            # Pack pages into chunks sized to the model's token budget
+            configuration = model.configuration or {}
+            with metrics.span("process_pdf.split") as counts:
+                texts = split_pages(
+                    [page.page_content for page in pages],
+                    chunk_token_budget(model.model_name, configuration),
+                    overlap_tokens=int(configuration.get("chunk_overlap_tokens", 0)),
+                    count=token_counter(model.model_name)
+                )
+                counts["chunks"] = len(texts)
+            if progress:
+                progress(0, len(texts))
+            
+            # Initialize LLM with model configuration
+            temperature = configuration.get("temperature", 0)
+            llm = ChatOpenAI(
+                model=model.model_name,
+                temperature=temperature,
+                api_key=model.api_key.key_value
+            )
+            
+            # Create extraction chain
+            chain = create_extraction_chain(EXTRACTION_SCHEMA, llm)
+            cache = get_extraction_cache()
+            
+            # Process each chunk, skipping the LLM for chunks already in the cache
+            all_results = []
+            for done, text in enumerate(texts, 1):
+                try:
+                    cache_key = ExtractionCache.make_key(
+                        text, model.model_name, temperature, EXTRACTION_SCHEMA
+                    )
+                    result = cache.get(cache_key)
+                    if result is None:
+                        with metrics.span("process_pdf.llm") as counts, get_openai_callback() as usage:
+                            result = chain.run(text) or []
+                            counts["prompt_tokens"] = usage.prompt_tokens
+                            counts["completion_tokens"] = usage.completion_tokens
+                        cache.set(cache_key, result)
+                    else:
+                        metrics.increment("process_pdf.cache_hits")
+                    if result:
+                        all_results.extend(result)
+                except Exception as e:
+                    print(f"Error processing chunk: {e}")
+                if progress:
+                    progress(done, len(texts))
+            
+            # Prepare document for Elasticsearch
+            es_document = {
+                "document_id": document_id,
+                "filename": filename,
+                "upload_date": datetime.utcnow().isoformat(),
+                "content": "\n".join(texts),
+                "analysis_results": all_results,
+                "metadata": metadata,
+                "model_used": {
+                    "id": model.id,
+                    "name": model.model_name,
+                    "provider": model.provider
+                }
+            }
+            
+            # Store in Elasticsearch through the shared bulk writer, flushing
+            # now and waiting for the item's result
+            with metrics.span("process_pdf.index"):
+                get_bulk_writer().index_and_wait(
+                    "threat-intel", es_document, id=document_id, timeout=ES_BULK_WAIT_TIMEOUT
+                )
+            
+            return {
+                "document_id": document_id,
+                "results": all_results,
+                "metadata": metadata,
+                "deduplicated": False
+            }
         
     finally:
         # Cleanup
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
 
-@router.post("/upload")
+# The body is parsed by spool_upload, so the form is only described for the docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {UPLOAD_FIELD: {"type": "string", "format": "binary"}},
+                    "required": [UPLOAD_FIELD]
+                }
+            }
+        }
+    }
+}
+
+@router.post("/upload", status_code=202, openapi_extra=UPLOAD_REQUEST_BODY)
 async def upload_file(
-    file: UploadFile = File(...),
+    request: Request,
+    response: Response,
     model_id: int = None,
+    force: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Upload and analyze a PDF file."""
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-    
+    """
+    Upload a PDF file (multipart form field "file") and queue it for analysis.
+    Returns the job to poll at /api/jobs/{job_id}; an upload of a file that is
+    already queued or running with the same model returns that job. Set
+    force=true to re-analyze an already indexed file.
+    """
     if not model_id:
         # Use default model if none specified
         model = db.query(LLMModel).filter(
@@ -138,9 +323,62 @@ async def upload_file(
                 status_code=400,
                 detail="No default model available. Please specify a model_id"
             )
-        model_id = model.id
+    else:
+        model = db.query(LLMModel).filter(LLMModel.id == model_id).first()
+        if not model:
+            raise HTTPException(status_code=404, detail="Model not found")
     
-    return await process_pdf(file, model_id, db)
+    # Stream the upload to a unique temporary file, hashing it as it arrives
+    temp_path, filename, document_id, _ = await spool_upload(request)
+    jobs = get_job_queue()
+    job_key = f"{document_id}:{model.id}"
+    
+    # The spooled file is removed on every path that does not hand it to a job
+    job = None
+    try:
+        # Skip re-analysis if this exact file was already indexed with the same model
+        existing = None if force else await find_indexed_document(document_id, model)
+        # Join an analysis of the same file and model that is still queued or running
+        active = None if existing else jobs.find_active(job_key)
+        if not existing and not active:
+            job = jobs.submit(process_pdf, temp_path, filename, document_id, model.id, key=job_key)
+    except QueueFullError:
+        os.remove(temp_path)
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis queue is full. Please retry later",
+            headers={"Retry-After": "30"}
+        )
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    if job is not None:
+        return job.to_dict()
+    
+    os.remove(temp_path)
+    if active:
+        return active.to_dict()
+    job = jobs.completed({
+        "document_id": document_id,
+        "results": existing.get("analysis_results", []),
+        "metadata": existing.get("metadata", {}),
+        "deduplicated": True
+    })
+    response.status_code = 200
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status, progress and results of an analysis job."""
+    job = get_job_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Get extraction cache hit/miss counters."""
+    return get_extraction_cache().stats()
 
 @router.get("/documents")
 async def list_documents(
@@ -149,7 +387,7 @@ async def list_documents(
     to_date: Optional[str] = None
 ):
     """List analyzed documents with optional filtering."""
-    es = get_es()
+    es = get_async_es()
     
     # Build search query
     must_conditions = []
@@ -181,15 +419,15 @@ async def list_documents(
         } if must_conditions else {"match_all": {}}
     }
     
-    result = es.search(index="threat-intel", body=body)
+    result = await es.search(index="threat-intel", body=body)
     return result["hits"]["hits"]
 
 @router.get("/documents/{document_id}")
 async def get_document(document_id: str):
     """Get a specific document by ID."""
-    es = get_es()
+    es = get_async_es()
     try:
-        result = es.get(index="threat-intel", id=document_id)
+        result = await es.get(index="threat-intel", id=document_id)
         return result["_source"]
     except Exception as e:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -197,9 +435,9 @@ async def get_document(document_id: str):
 @router.delete("/documents/{document_id}")
 async def delete_document(document_id: str):
     """Delete a document by ID."""
-    es = get_es()
+    es = get_async_es()
     try:
-        es.delete(index="threat-intel", id=document_id)
+        await es.delete(index="threat-intel", id=document_id)
         return {"message": "Document deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=404, detail="Document not found")
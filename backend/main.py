@@ -1,8 +1,13 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+import time
 import uvicorn
-from app.database import init, check_postgres_connection, check_es_connection
+from app.database import init, check_postgres_connection, check_es_connection, close_async_es
 from app.routes import api_keys_router, analysis_router
+from app.jobs import get_job_queue
+from app.es_bulk import close_bulk_writer
+from app.metrics import get_metrics, route_name
+from app.profiler import get_profiler
 
 app = FastAPI(title="Threat Intelligence Analyzer")
 
@@ -15,6 +20,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record per-route latency; with PROFILE_SLOW_MS set, profile slow requests."""
+    started = time.perf_counter()
+    status_code = 500
+    with get_profiler().profile(f"{request.method} {request.url.path}"):
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            route = route_name(request.scope) or f"{request.method} unmatched"
+            get_metrics().record_request(route, status_code, time.perf_counter() - started)
+
 # 註冊路由
 app.include_router(api_keys_router, prefix="/api", tags=["API Keys & Models"])
 app.include_router(analysis_router, prefix="/api", tags=["Analysis"])
@@ -27,12 +46,20 @@ async def startup_event():
     except Exception as e:
         print(f"Error during initialization: {e}")
         raise
+    get_job_queue().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the analysis workers, flush pending Elasticsearch writes and close the ES pool."""
+    get_job_queue().shutdown(timeout=5)
+    close_bulk_writer()
+    await close_async_es()
 
 @app.get("/api/health")
 async def health_check():
     """Check the health of all services."""
     postgres_ok = check_postgres_connection()
-    es_ok = check_es_connection()
+    es_ok = await check_es_connection()
     
     status = {
         "postgres": "healthy" if postgres_ok else "unhealthy",
@@ -51,6 +78,18 @@ async def health_check():
         "services": status
     }
 
+@app.get("/api/metrics")
+async def metrics():
+    """Per-route latency histograms, process_pdf stage spans and counters."""
+    snapshot = get_metrics().snapshot()
+    profiler = get_profiler()
+    snapshot["profiler"] = {
+        "enabled": profiler.enabled,
+        "slow_seconds": profiler.slow_seconds,
+        "profiles_written": profiler.dumped
+    }
+    return snapshot
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -0,0 +1,61 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from app.routes import analysis
+
+class SlowAsyncES:
+    """Async client stand-in where every call takes `delay` seconds of awaiting."""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.documents = {"doc1": {"document_id": "doc1", "content": "Test content"}}
+        self.searches = []
+
+    async def search(self, index, body):
+        await asyncio.sleep(self.delay)
+        self.searches.append(body)
+        return {"hits": {"hits": [{"_id": k, "_source": v} for k, v in self.documents.items()]}}
+
+    async def get(self, index, id):
+        await asyncio.sleep(self.delay)
+        if id not in self.documents:
+            raise KeyError(id)
+        return {"_source": self.documents[id]}
+
+    async def delete(self, index, id):
+        await asyncio.sleep(self.delay)
+        del self.documents[id]
+
+@pytest.fixture
+def es(monkeypatch):
+    client = SlowAsyncES()
+    monkeypatch.setattr(analysis, "get_async_es", lambda: client)
+    return client
+
+def test_document_routes_await_the_async_client(es):
+    async def scenario():
+        hits = await analysis.list_documents(query="TestMalware")
+        document = await analysis.get_document("doc1")
+        deleted = await analysis.delete_document("doc1")
+        with pytest.raises(HTTPException) as exc_info:
+            await analysis.get_document("doc1")
+        return hits, document, deleted, exc_info.value.status_code
+
+    hits, document, deleted, missing_status = asyncio.run(scenario())
+    assert hits[0]["_source"]["document_id"] == "doc1"
+    assert es.searches[0]["query"]["bool"]["must"][0]["multi_match"]["query"] == "TestMalware"
+    assert document["content"] == "Test content"
+    assert deleted == {"message": "Document deleted successfully"}
+    assert missing_status == 404
+
+def test_concurrent_searches_do_not_block_each_other(es):
+    async def scenario():
+        return await asyncio.gather(*(analysis.list_documents() for _ in range(100)))
+
+    started = time.perf_counter()
+    results = asyncio.run(scenario())
+    elapsed = time.perf_counter() - started
+    assert len(results) == 100
+    # Serialized, 100 searches would take 10 s
+    assert elapsed < 2
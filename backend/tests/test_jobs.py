@@ -0,0 +1,76 @@
+import threading
+import pytest
+from app.jobs import JobQueue, LocalBroker, QueueFullError
+
+def wait_for(job, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if job.status in ("completed", "failed"):
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job {job.id} still {job.status}")
+
+def test_job_runs_and_reports_progress():
+    jobs = JobQueue(workers=1)
+    jobs.start()
+
+    def work(n, progress):
+        for i in range(1, n + 1):
+            progress(i, n)
+        return {"total": n}
+
+    job = wait_for(jobs.submit(work, 3))
+    jobs.shutdown()
+
+    data = job.to_dict()
+    assert data["status"] == "completed"
+    assert data["result"] == {"total": 3}
+    assert data["progress"] == {"chunks_done": 3, "chunks_total": 3}
+    assert jobs.get(job.id) is job
+
+def test_failed_job_records_error():
+    jobs = JobQueue(workers=1)
+    jobs.start()
+
+    def work(progress):
+        raise ValueError("broken pdf")
+
+    job = wait_for(jobs.submit(work))
+    jobs.shutdown()
+    assert job.status == "failed"
+    assert job.error == "broken pdf"
+
+def test_submit_rejects_when_queue_full():
+    jobs = JobQueue(workers=1, broker=LocalBroker(maxsize=1))
+    jobs.submit(lambda progress: None)
+    with pytest.raises(QueueFullError):
+        jobs.submit(lambda progress: None)
+
+def test_completed_job():
+    jobs = JobQueue(workers=1)
+    job = jobs.completed({"deduplicated": True})
+    assert jobs.get(job.id).to_dict()["status"] == "completed"
+
+def test_keyed_job_is_active_until_it_finishes():
+    jobs = JobQueue(workers=1)
+    release = threading.Event()
+
+    def work(progress):
+        release.wait(5)
+        return "done"
+
+    job = jobs.submit(work, key="doc:1")
+    assert jobs.find_active("doc:1") is job
+    jobs.start()
+    release.set()
+    wait_for(job)
+    jobs.shutdown()
+    assert jobs.find_active("doc:1") is None
+
+def test_rejected_keyed_job_is_not_active():
+    jobs = JobQueue(workers=1, broker=LocalBroker(maxsize=1))
+    jobs.submit(lambda progress: None, key="doc:1")
+    with pytest.raises(QueueFullError):
+        jobs.submit(lambda progress: None, key="doc:2")
+    assert jobs.find_active("doc:2") is None
+    assert jobs.find_active("doc:1") is not None
+
@@ -0,0 +1,69 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.metrics import Histogram, Metrics, get_metrics
+from app.profiler import SamplingProfiler
+
+def test_histogram_quantiles_are_within_one_bucket():
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    summary = histogram.to_dict()
+    assert summary["count"] == 1000
+    assert summary["max"] == 1.0
+    for key, exact in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        assert exact <= summary[key] <= exact * 1.125
+    assert sum(count for _, count in summary["buckets"]) == 1000
+
+def test_spans_record_durations_and_counts():
+    metrics = Metrics()
+    for tokens in (100, 50):
+        with metrics.span("process_pdf.llm") as counts:
+            counts["prompt_tokens"] = tokens
+    with pytest.raises(ValueError):
+        with metrics.span("process_pdf.parse"):
+            raise ValueError("bad pdf")
+
+    snapshot = metrics.snapshot()
+    assert snapshot["spans"]["process_pdf.llm"]["count"] == 2
+    assert snapshot["spans"]["process_pdf.parse"]["count"] == 1
+    assert snapshot["counters"]["process_pdf.llm.prompt_tokens"] == 150
+
+def test_requests_are_recorded_by_route_template():
+    from main import app
+
+    client = TestClient(app)
+    for job_id in ("a", "b", "c"):
+        assert client.get(f"/api/jobs/{job_id}").status_code == 404
+    routes = client.get("/api/metrics").json()["routes"]
+    assert routes["GET /api/jobs/{job_id}"]["count"] >= 3
+    assert routes["GET /api/jobs/{job_id}"]["status"]["4xx"] >= 3
+    assert not any("/api/jobs/a" in route for route in routes)
+    assert get_metrics().snapshot()["routes"]["GET /api/jobs/{job_id}"]["count"] >= 3
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_profiler_writes_collapsed_stacks_for_slow_work(tmp_path):
+    profiler = SamplingProfiler(slow_seconds=0.05, interval=0.001, output_dir=str(tmp_path))
+    with profiler.profile("fast job") as session:
+        pass
+    assert session.path is None
+    with profiler.profile("slow job") as session:
+        busy_wait(0.2)
+    assert profiler.dumped == 1
+    with open(session.path) as f:
+        lines = f.read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert any("busy_wait (test_metrics.py" in line for line in lines)
+
+def test_disabled_profiler_does_not_sample(tmp_path):
+    profiler = SamplingProfiler(slow_seconds=0, output_dir=str(tmp_path))
+    with profiler.profile("job") as session:
+        busy_wait(0.01)
+    assert session is None
+    assert profiler._thread is None
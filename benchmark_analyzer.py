@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from fake_llm import FakeLLMServer
+
+BENCHMARK_SCHEMA_VERSION = 1
+
+_ACTORS = ["APT28", "Sandworm", "Lazarus Group", "FIN7", "Turla", "Volt Typhoon", "XENOTIME"]
+_MALWARE = ["Industroyer2", "TRITON", "BlackEnergy", "PIPEDREAM", "Cobalt Strike", "Emotet"]
+_VECTORS = ["spearphishing attachments", "exposed VPN appliances", "watering-hole websites",
+            "compromised engineering workstations", "supply-chain updates"]
+_SECTORS = ["electric utilities", "water treatment", "oil and gas", "manufacturing", "transportation"]
+_FILLER = ("The campaign relied on living-off-the-land techniques and staged tooling on "
+           "jump hosts before moving into the OT network. Analysts observed beaconing at "
+           "irregular intervals and credential harvesting from historian servers.").split()
+
+def report_lines(rng, count):
+    """Deterministic threat-report style text lines"""
+    lines = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.2:
+            line = (f"{rng.choice(_ACTORS)} deployed {rng.choice(_MALWARE)} via {rng.choice(_VECTORS)} "
+                    f"against {rng.choice(_SECTORS)}.")
+        elif kind < 0.3:
+            line = (f"IOC: {rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}."
+                    f"{rng.randint(1, 254)} sha256 {rng.getrandbits(128):032x}")
+        else:
+            line = " ".join(rng.choice(_FILLER) for _ in range(rng.randint(10, 16)))
+        lines.append(line)
+    return lines
+
+def _pdf_text(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF; pages is a list of line lists"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 760 Td " + " ".join(f"({_pdf_text(line)}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def make_corpus(directory, page_counts=(1, 5, 20), lines_per_page=55, seed=0):
+    """Generate one report PDF per page count; returns their paths"""
+    rng = random.Random(seed)
+    paths = []
+    for i, page_count in enumerate(page_counts):
+        path = os.path.join(directory, f"report_{i:02d}_{page_count}p.pdf")
+        write_pdf(path, [report_lines(rng, lines_per_page) for _ in range(page_count)])
+        paths.append(path)
+    return paths
+
+def _timed(func):
+    started = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - started
+
+def bench_parsing(corpus):
+    """PDF loading and chunking only (no LLM)"""
+    from pypdf import PdfReader
+    from analyzer import load_pdf_chunks
+
+    # Count pages separately so the timed section only covers loading and chunking
+    pages = sum(len(PdfReader(path).pages) for path in corpus)
+    chunks, seconds = _timed(lambda: sum(len(load_pdf_chunks(path)[1]) for path in corpus))
+    return {"documents": len(corpus), "pages": pages, "chunks": chunks, "seconds": seconds,
+            "pages_per_s": pages / seconds, "chunks_per_s": chunks / seconds}
+
+def bench_analyzer(corpus, server, concurrency_levels, keyword=None):
+    """analyze_threat_intel_pdf over the corpus for each LLM concurrency level"""
+    from analyzer import analyze_threat_intel_pdf, load_pdf_chunks
+    from chunk_executor import ChunkExecutor
+
+    chunks = sum(len(load_pdf_chunks(path)[1]) for path in corpus)
+    results = {}
+    for concurrency in concurrency_levels:
+        server.reset()
+        executor = ChunkExecutor(max_concurrency=concurrency)
+        findings, seconds = _timed(
+            lambda: sum(len(analyze_threat_intel_pdf(path, keyword, executor=executor)) for path in corpus)
+        )
+        llm = server.stats()
+        results[str(concurrency)] = {
+            "documents": len(corpus),
+            "chunks": chunks,
+            "findings": findings,
+            "seconds": seconds,
+            "chunks_per_s": chunks / seconds,
+            "llm_calls": llm["calls"],
+            "llm_calls_per_document": llm["calls"] / len(corpus),
+            "prompt_tokens": llm["prompt_tokens"],
+            "completion_tokens": llm["completion_tokens"]
+        }
+    return results
+
+def bench_analyzer_directory(corpus, server, concurrency, workers=None, keyword=None):
+    """Batch mode: process-pool parsing feeding the shared LLM queue"""
+    from analyzer import analyze_directory_parallel
+    from chunk_executor import ChunkExecutor
+
+    server.reset()
+    with tempfile.TemporaryDirectory() as output_dir:
+        _, seconds = _timed(lambda: asyncio.run(analyze_directory_parallel(
+            corpus, keyword, output_dir, workers=workers, executor=ChunkExecutor(max_concurrency=concurrency)
+        )))
+    llm = server.stats()
+    return {"documents": len(corpus), "concurrency": concurrency, "seconds": seconds,
+            "documents_per_s": len(corpus) / seconds, "llm_calls": llm["calls"],
+            "prompt_tokens": llm["prompt_tokens"]}
+
+class _FakeQuery:
+    def __init__(self, model):
+        self.model = model
+
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return self.model
+
+class _FakeSession:
+    def __init__(self, model):
+        self.model = model
+
+    def query(self, entity):
+        return _FakeQuery(self.model)
+
+class _NullCache:
+    """Extraction cache that never hits, so every upload reaches the LLM"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+class _NullBulkWriter:
+    def __init__(self):
+        self.documents = 0
+
+    def index_and_wait(self, index, document, id=None, timeout=None):
+        self.documents += 1
+
+def bench_backend(corpus, server, upload_levels):
+    """
+    process_pdf on the backend's job queue with 1..N concurrent uploads of
+    the largest document. Postgres, Elasticsearch and the extraction cache
+    are replaced with in-process stand-ins so only parsing and LLM traffic
+    are measured; the cache stand-in never hits.
+    """
+    from contextlib import contextmanager
+
+    backend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+    if backend not in sys.path:
+        sys.path.insert(0, backend)
+    try:
+        from app.jobs import JobQueue, LocalBroker
+        from app.metrics import Metrics
+        from app.routes import analysis
+    except Exception as e:
+        return {"skipped": f"backend could not be imported: {e}"}
+
+    model = SimpleNamespace(id=1, model_name="gpt-3.5-turbo", provider="openai", configuration={},
+                            api_key=SimpleNamespace(key_value="benchmark"))
+    writer = _NullBulkWriter()
+
+    @contextmanager
+    def fake_db():
+        yield _FakeSession(model)
+
+    originals = (analysis.get_db, analysis.get_bulk_writer, analysis.get_extraction_cache, analysis.get_metrics)
+    analysis.get_db = fake_db
+    analysis.get_bulk_writer = lambda: writer
+    analysis.get_extraction_cache = _NullCache
+    document = max(corpus, key=os.path.getsize)
+    results = {}
+    try:
+        for uploads in upload_levels:
+            server.reset()
+            metrics = Metrics()
+            analysis.get_metrics = lambda: metrics
+            queue = JobQueue(workers=uploads, broker=LocalBroker(maxsize=uploads))
+            queue.start()
+            started = time.perf_counter()
+            jobs = []
+            for i in range(uploads):
+                fd, path = tempfile.mkstemp(suffix=".pdf")
+                os.close(fd)
+                shutil.copyfile(document, path)
+                jobs.append(queue.submit(analysis.process_pdf, path, os.path.basename(document), f"doc-{i}", model.id))
+            queue.shutdown()
+            seconds = time.perf_counter() - started
+            llm = server.stats()
+            failed = [job.error for job in jobs if job.status != "completed"]
+            durations = sorted((job.finished_at - job.started_at).total_seconds() for job in jobs)
+            results[str(uploads)] = {
+                "uploads": uploads,
+                "seconds": seconds,
+                "uploads_per_s": uploads / seconds,
+                "job_seconds_max": durations[-1],
+                "failed": len(failed),
+                "llm_calls": llm["calls"],
+                "llm_calls_per_document": llm["calls"] / uploads,
+                "prompt_tokens": llm["prompt_tokens"],
+                # Mean seconds per process_pdf stage from its metrics spans
+                # (llm is per call, total per upload)
+                "stage_seconds": {
+                    name.split(".", 1)[1] if "." in name else "total": span["mean"]
+                    for name, span in metrics.snapshot()["spans"].items()
+                }
+            }
+    finally:
+        (analysis.get_db, analysis.get_bulk_writer, analysis.get_extraction_cache,
+         analysis.get_metrics) = originals
+    return results
+
+def run_benchmarks(page_counts=(1, 5, 20), concurrency_levels=(1, 4, 8), upload_levels=(1, 2, 4),
+                   latency=0.05, tokens_per_second=0.0, keyword=None, backend=True, seed=0):
+    """Run the analysis benchmarks against a fake LLM server; returns a JSON-serialisable report"""
+    report = {
+        "benchmark": "threat_intel_analyzer",
+        "schema_version": BENCHMARK_SCHEMA_VERSION,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "page_counts": list(page_counts),
+            "concurrency_levels": list(concurrency_levels),
+            "upload_levels": list(upload_levels),
+            "llm_latency": latency,
+            "llm_tokens_per_second": tokens_per_second,
+            "keyword": keyword,
+            "seed": seed
+        },
+        "results": {}
+    }
+    results = report["results"]
+    saved_env = {name: os.environ.get(name) for name in ("OPENAI_API_BASE", "OPENAI_API_KEY")}
+    with tempfile.TemporaryDirectory() as corpus_dir, \
+            FakeLLMServer(latency=latency, tokens_per_second=tokens_per_second) as server:
+        os.environ["OPENAI_API_BASE"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "benchmark"
+        try:
+            corpus = make_corpus(corpus_dir, page_counts, seed=seed)
+            results["parsing"] = bench_parsing(corpus)
+            results["analyzer"] = bench_analyzer(corpus, server, concurrency_levels, keyword)
+            results["analyzer_batch"] = bench_analyzer_directory(corpus, server, max(concurrency_levels), keyword=keyword)
+            if backend:
+                results["backend"] = bench_backend(corpus, server, upload_levels)
+        finally:
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    return report
+
+def _levels(text):
+    return [int(level) for level in text.split(",") if level.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PDF analysis against a local fake LLM")
+    parser.add_argument("--pages", default="1,5,20", help="Comma-separated page counts of the generated PDFs")
+    parser.add_argument("--concurrency", default="1,4,8", help="LLM concurrency levels for the analyzer")
+    parser.add_argument("--uploads", default="1,2,4", help="Concurrent upload levels for the backend")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake LLM latency per call in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Fake LLM generation speed (0 = instant)")
+    parser.add_argument("--keyword", help="Run keyword-focused analysis (two LLM calls per chunk)")
+    parser.add_argument("--no-backend", action="store_true", help="Skip the backend process_pdf benchmark")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        page_counts=_levels(args.pages),
+        concurrency_levels=_levels(args.concurrency),
+        upload_levels=_levels(args.uploads),
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        keyword=args.keyword,
+        backend=not args.no_backend
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,193 @@
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+# LLM API statuses worth retrying (request timeout, rate limit, server errors)
+RETRYABLE_STATUSES = {408, 429}
+# Client errors raised without a status code (timeouts, dropped connections)
+# or with one only on older SDKs; matched by name to avoid importing the SDK
+RETRYABLE_ERRORS = {
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    "Timeout", "ServiceUnavailableError", "TryAgain"
+}
+
+
+def estimate_tokens(text):
+    """
+    Rough token estimate for rate limiting (about four characters per token).
+    """
+    return max(1, math.ceil(len(text) / 4))
+
+
+def is_retryable(error):
+    """True for rate limits, timeouts, connection failures and 5xx responses."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    for attribute in ("status_code", "http_status", "status"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int):
+            return status in RETRYABLE_STATUSES or status >= 500
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter enforcing requests per minute and tokens per minute.
+    A limit of None (or 0) disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self._requests = float(self.requests_per_minute or 0)
+        self._tokens = float(self.tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(
+                float(self.requests_per_minute),
+                self._requests + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._tokens = min(
+                float(self.tokens_per_minute),
+                self._tokens + elapsed * self.tokens_per_minute / 60.0
+            )
+
+    def reserve(self, tokens=0):
+        """
+        Reserve capacity for one request and return the seconds to wait before sending it.
+        Balances may go negative; later callers then wait for the debt to be repaid.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = 0.0
+            if self.requests_per_minute:
+                self._requests -= 1
+                if self._requests < 0:
+                    wait = max(wait, -self._requests * 60.0 / self.requests_per_minute)
+            if self.tokens_per_minute:
+                self._tokens -= min(tokens, self.tokens_per_minute)
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens * 60.0 / self.tokens_per_minute)
+            return wait
+
+    async def acquire(self, tokens=0):
+        """Wait until a request of the given token size may be sent."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider="openai"):
+    """
+    Return the shared rate limiter for an LLM provider.
+    Limits are read from <PROVIDER>_REQUESTS_PER_MINUTE and <PROVIDER>_TOKENS_PER_MINUTE.
+    """
+    key = provider.lower()
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            prefix = key.upper()
+            _rate_limiters[key] = RateLimiter(
+                requests_per_minute=int(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", "0")),
+                tokens_per_minute=int(os.getenv(f"{prefix}_TOKENS_PER_MINUTE", "0"))
+            )
+        return _rate_limiters[key]
+
+
+@dataclass
+class ChunkResult:
+    """Outcome of processing one chunk; exactly one of value/error is meaningful."""
+    index: int
+    value: Any = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class ChunkExecutor:
+    """
+    Run per-chunk LLM work concurrently with a bounded fan-out.
+
+    `call` wraps a single blocking LLM call with rate limiting and retries
+    transient failures (`retry_on`, by default `is_retryable`) with
+    exponential backoff; `map` fans a coroutine out over all chunks, keeping
+    the results in chunk order and isolating failures to their own chunk.
+    """
+
+    def __init__(self, max_concurrency=None, rate_limiter=None, max_retries=3,
+                 backoff_base=1.0, backoff_max=30.0, retry_on=is_retryable):
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_on = retry_on
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def call(self, func: Callable, *args, tokens=0, **kwargs):
+        """
+        Run a blocking call in a worker thread, honouring the rate limiter
+        and retrying transient failures up to max_retries times. Other
+        errors are raised at once.
+        """
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(tokens)
+            try:
+                return await asyncio.to_thread(func, *args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.retry_on(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+
+    async def map(self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any]) -> List[ChunkResult]:
+        """
+        Apply an async function to every item with at most max_concurrency in flight.
+        Results are returned in input order; exceptions are captured per item.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(index, item):
+            async with semaphore:
+                try:
+                    return ChunkResult(index, value=await func(item))
+                except Exception as e:
+                    return ChunkResult(index, error=e)
+
+        return list(await asyncio.gather(
+            *(run_one(index, item) for index, item in enumerate(items))
+        ))
+
+    def run(self, func: Callable[[Any], Awaitable[Any]], items: Iterable[Any]) -> List[ChunkResult]:
+        """Synchronous wrapper around `map` for callers outside an event loop."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.map(func, items))
+        raise RuntimeError(
+            "ChunkExecutor.run() cannot be called from a running event loop; "
+            "use `await executor.map(...)` instead"
+        )
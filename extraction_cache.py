@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_CACHE_PATH = os.path.join("analysis_results", ".extraction_cache.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache of per-chunk LLM extraction results.
+
+    Entries live in a local SQLite database and are evicted least-recently-used
+    first once the stored values exceed max_bytes. The total size and the LRU
+    clock are kept in the database and updated in the same transaction as each
+    write, so processes sharing the file (analyzer runs, backend workers) see
+    one budget. Hit and miss counts are kept for the lifetime of the object.
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or os.getenv("EXTRACTION_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if max_bytes is None:
+            max_bytes = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS extraction_cache_last_access ON extraction_cache (last_access)"
+        )
+        # One-row running total of the stored sizes, seeded from existing entries
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extraction_cache_size ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO extraction_cache_size (id, total) "
+            "SELECT 0, COALESCE(SUM(size), 0) FROM extraction_cache"
+        )
+
+    @staticmethod
+    def make_key(text, model, temperature, schema, prompt=None):
+        """
+        Hash everything that determines an extraction result: the chunk text,
+        model name, temperature, extraction schema and keyword prompt.
+        """
+        payload = json.dumps(
+            [text, model, temperature, schema, prompt],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # Logical clock for LRU ordering, shared through the table; wall-clock time
+    # can tie on fast hosts. MAX uses the last_access index.
+    _NEXT_ACCESS = "(SELECT COALESCE(MAX(last_access), 0) + 1 FROM extraction_cache)"
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM extraction_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                f"UPDATE extraction_cache SET last_access = {self._NEXT_ACCESS} WHERE key = ?", (key,)
+            )
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a JSON-serialisable value and evict old entries if over budget."""
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so no other process can
+            # change the entries or the total between reading and updating them
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = self._conn.execute(
+                    "SELECT size FROM extraction_cache WHERE key = ?", (key,)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO extraction_cache (key, value, size, last_access) "
+                    f"VALUES (?, ?, ?, {self._NEXT_ACCESS})",
+                    (key, data, size)
+                )
+                total = self._add_bytes(size - (previous[0] if previous else 0))
+                if total > self.max_bytes:
+                    self._evict(total)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _add_bytes(self, delta):
+        """Adjust the stored total by delta and return the new total."""
+        self._conn.execute("UPDATE extraction_cache_size SET total = total + ? WHERE id = 0", (delta,))
+        return self._conn.execute("SELECT total FROM extraction_cache_size WHERE id = 0").fetchone()[0]
+
+    def _evict(self, total):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        rows = self._conn.execute(
+            "SELECT key, size FROM extraction_cache ORDER BY last_access"
+        )
+        victims = []
+        freed = 0
+        for key, size in rows:
+            if total - freed <= self.max_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM extraction_cache WHERE key = ?", victims)
+        self._add_bytes(-freed)
+
+    def stats(self):
+        """Return hit/miss counters and current cache size."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+            total = self._conn.execute("SELECT total FROM extraction_cache_size WHERE id = 0").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chunk_executor import estimate_tokens
+
+class FakeLLMServer:
+    """
+    Local stand-in for the OpenAI chat completions API, for benchmarks.
+
+    Every request waits `latency` seconds plus the time to "generate" its
+    completion at `tokens_per_second`, then returns a deterministic answer
+    derived from the prompt: a function call for extraction chains and plain
+    text otherwise. Calls and token counts are tallied so a benchmark can
+    report exactly what it would have sent to a real provider.
+
+    Point clients at it with OPENAI_API_BASE=server.base_url.
+    """
+
+    def __init__(self, latency=0.0, tokens_per_second=0.0, completion_tokens=60, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.generated_tokens
+            }
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.prompt_tokens = self.generated_tokens = 0
+
+    def complete(self, request):
+        """Build the deterministic response body for one chat completion request"""
+        prompt = "\n".join(str(message.get("content") or "") for message in request.get("messages", []))
+        prompt_tokens = estimate_tokens(prompt)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+        if request.get("functions"):
+            name = request["functions"][0]["name"]
+            arguments = json.dumps({"info": [{
+                "threat_actor": f"APT-{digest[:6]}",
+                "malware_name": f"Loader-{digest[6:10]}",
+                "attack_vector": "spearphishing attachment",
+                "indicators": f"{digest[:32]}",
+            }]})
+            message = {"role": "assistant", "content": None, "function_call": {"name": name, "arguments": arguments}}
+        else:
+            message = {"role": "assistant", "content": f"Related activity found (ref {digest[:12]})."}
+
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.generated_tokens += self.completion_tokens
+        return {
+            "id": f"chatcmpl-{digest[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": prompt_tokens + self.completion_tokens
+            }
+        }
+
+    def _delay(self):
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += self.completion_tokens / self.tokens_per_second
+        if delay:
+            time.sleep(delay)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return self._reply(400, {"error": {"message": "invalid JSON"}})
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    return self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+                body = server.complete(request)
+                server._delay()
+                self._reply(200, body)
+
+            def _reply(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
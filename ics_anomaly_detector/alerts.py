@@ -0,0 +1,204 @@
+import json
+import random
+import struct
+import threading
+import time
+from datetime import datetime
+
+from ics_anomaly_detector.es_bulk import json_default
+from ics_anomaly_detector.flows import FLOW_FEATURE_NAMES
+from ics_anomaly_detector.scoring import ScoredWindow
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for encoding="msgpack"
+    msgpack = None
+
+# Bump whenever the binary layout or the feature order changes
+ALERT_SCHEMA_VERSION = 1
+ALERT_MAGIC = b"ICSA"
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODING_STRUCT = "struct"
+ENCODINGS = (ENCODING_JSON, ENCODING_MSGPACK, ENCODING_STRUCT)
+_BINARY_ENCODING_IDS = {ENCODING_STRUCT: 1, ENCODING_MSGPACK: 2}
+
+# magic, schema version, encoding id, feature count, result count
+_header = struct.Struct("!4sBBHH")
+
+def _epoch(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return timestamp.timestamp()
+
+def _vector(result, feature_names):
+    """Feature values in feature_names order, straight from the array for a ScoredWindow"""
+    if isinstance(result, ScoredWindow) and result.batch.feature_names == feature_names:
+        return result.values.tolist()
+    features = result["features"]
+    return [features[name] for name in feature_names]
+
+def encode_alerts(results, encoding=ENCODING_JSON, feature_names=FLOW_FEATURE_NAMES):
+    """
+    Encode detection results into one message.
+
+    json keeps the original document format: a single object, or a list
+    for several results. Binary encodings start with a fixed header (magic,
+    schema version, encoding, feature count, result count) followed by one
+    record per result with features in feature_names order: packed float32
+    for struct, arrays for msgpack.
+    """
+    if encoding == ENCODING_JSON:
+        body = results[0] if len(results) == 1 else results
+        return json.dumps(body, default=json_default)
+
+    header = _header.pack(
+        ALERT_MAGIC, ALERT_SCHEMA_VERSION, _BINARY_ENCODING_IDS[encoding],
+        len(feature_names), len(results)
+    )
+    if encoding == ENCODING_STRUCT:
+        # timestamp (epoch seconds), anomaly score, is_anomaly, then the features
+        record = struct.Struct(f"!dfB{len(feature_names)}f")
+        return header + b"".join(
+            record.pack(
+                _epoch(result["timestamp"]), result["anomaly_score"], result["is_anomaly"],
+                *_vector(result, feature_names)
+            )
+            for result in results
+        )
+    return header + msgpack.packb([
+        [
+            _epoch(result["timestamp"]), float(result["anomaly_score"]), bool(result["is_anomaly"]),
+            [float(value) for value in _vector(result, feature_names)]
+        ]
+        for result in results
+    ])
+
+def decode_alerts(payload, feature_names=FLOW_FEATURE_NAMES):
+    """Decode a message produced by encode_alerts back into result dicts"""
+    if isinstance(payload, str) or not payload.startswith(ALERT_MAGIC):
+        body = json.loads(payload)
+        return body if isinstance(body, list) else [body]
+
+    _, version, encoding_id, n_features, count = _header.unpack_from(payload)
+    if version != ALERT_SCHEMA_VERSION:
+        raise ValueError(f"Unsupported alert schema version {version}")
+    if n_features != len(feature_names):
+        raise ValueError(f"Message has {n_features} features, expected {len(feature_names)}")
+
+    if encoding_id == _BINARY_ENCODING_IDS[ENCODING_STRUCT]:
+        record = struct.Struct(f"!dfB{n_features}f")
+        records = [record.unpack_from(payload, _header.size + i * record.size) for i in range(count)]
+        records = [(r[0], r[1], r[2], r[3:]) for r in records]
+    elif encoding_id == _BINARY_ENCODING_IDS[ENCODING_MSGPACK]:
+        if msgpack is None:
+            raise ImportError("msgpack is required to decode msgpack alerts")
+        records = msgpack.unpackb(payload[_header.size:])
+    else:
+        raise ValueError(f"Unknown alert encoding id {encoding_id}")
+
+    return [
+        {
+            'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+            'is_anomaly': bool(is_anomaly),
+            'anomaly_score': score,
+            'features': dict(zip(feature_names, features))
+        }
+        for timestamp, score, is_anomaly, features in records
+    ]
+
+class AlertPublisher:
+    """
+    Publish detection results to MQTT with selection, batching and encoding.
+
+    Anomalies are always published; normal windows are published with
+    probability normal_sample_rate (0 = anomalies only). Up to batch_size
+    results share one message. A partial batch is sent after flush_interval
+    seconds by a background thread so alerts are never held back for long.
+    latency, if given, is a metrics Histogram timing each MQTT publish call.
+    """
+
+    def __init__(self, mqtt_client, topic, encoding=ENCODING_JSON, normal_sample_rate=1.0,
+                 batch_size=1, flush_interval=1.0, qos=0, feature_names=FLOW_FEATURE_NAMES, latency=None):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown alert encoding {encoding!r}; expected one of {', '.join(ENCODINGS)}")
+        if encoding == ENCODING_MSGPACK and msgpack is None:
+            raise ImportError("msgpack is not installed; pip install msgpack or use another encoding")
+        self.mqtt_client = mqtt_client
+        self.topic = topic
+        self.encoding = encoding
+        self.normal_sample_rate = normal_sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.qos = qos
+        self.feature_names = list(feature_names)
+        self.latency = latency
+
+        self.messages = 0
+        self.published = 0
+        self.suppressed = 0
+
+        self._batch = []
+        self._random = random.Random()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def publish(self, result):
+        """Queue one result; returns False if it was sampled out"""
+        if not result['is_anomaly'] and self._random.random() >= self.normal_sample_rate:
+            self.suppressed += 1
+            return False
+        with self._cond:
+            self._batch.append(result)
+            if len(self._batch) < self.batch_size:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="mqtt-alert-flusher", daemon=True)
+                    self._thread.start()
+                return True
+            batch, self._batch = self._batch, []
+        self._send(batch)
+        return True
+
+    def flush(self):
+        with self._cond:
+            batch, self._batch = self._batch, []
+        if batch:
+            self._send(batch)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def stats(self):
+        return {
+            "messages": self.messages,
+            "published": self.published,
+            "suppressed": self.suppressed,
+            "pending": len(self._batch)
+        }
+
+    def _send(self, batch):
+        payload = encode_alerts(batch, self.encoding, self.feature_names)
+        started = time.perf_counter()
+        try:
+            self.mqtt_client.publish(self.topic, payload, qos=self.qos)
+        except Exception as e:
+            print(f"Error publishing to MQTT: {e}")
+            return
+        if self.latency is not None:
+            self.latency.record(time.perf_counter() - started)
+        self.messages += 1
+        self.published += len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._cond.wait_for(lambda: self._closed, self.flush_interval):
+                    return
+            self.flush()
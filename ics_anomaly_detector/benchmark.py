@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+from scapy.all import Ether
+
+from ics_anomaly_detector.detector import ICSAnomalyDetector
+from ics_anomaly_detector.flows import FlowTable
+from ics_anomaly_detector.pcap import iter_pcap_headers
+from ics_anomaly_detector.pipeline import DetectionPipeline
+from ics_anomaly_detector.synthetic import generate_traffic, write_pcap
+
+BENCHMARK_SCHEMA_VERSION = 1
+
+class NullMQTT:
+    """MQTT stand-in that only counts messages"""
+
+    def __init__(self):
+        self.messages = 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.messages += 1
+
+class _NullIndices:
+    def exists(self, index):
+        return True
+
+    def create(self, index, **kwargs):
+        pass
+
+class NullES:
+    """Elasticsearch stand-in that accepts every bulk request"""
+
+    def __init__(self):
+        self.indices = _NullIndices()
+        self.documents = 0
+
+    def bulk(self, operations):
+        count = len(operations) // 2
+        self.documents += count
+        return {"errors": False, "items": [{"index": {"status": 201}}] * count}
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def percentiles_ms(samples):
+    samples = np.asarray(samples) * 1000
+    if not len(samples):
+        return None
+    p50, p90, p99, p999 = np.percentile(samples, [50, 90, 99, 99.9])
+    return {"p50": p50, "p90": p90, "p99": p99, "p99.9": p999, "max": samples.max(), "count": len(samples)}
+
+def _timed(func):
+    started = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - started
+
+def bench_pcap_extraction(detector, path):
+    """pcap parsing plus flow tracking: the replay feature-extraction path"""
+    table = FlowTable(detector.flow_table.idle_timeout, detector.flow_table.active_timeout,
+                      detector.flow_table.max_flows)
+
+    def run():
+        packets = flows = 0
+        for header in iter_pcap_headers(path):
+            packets += 1
+            flows += len(table.update(header))
+        return packets, flows + len(table.flush())
+
+    (packets, flows), seconds = _timed(run)
+    return {"packets": packets, "flows": flows, "seconds": seconds, "packets_per_s": packets / seconds}
+
+def bench_scapy_extraction(detector, frames):
+    """Live-capture path: scapy dissection is done up front, header extraction is timed"""
+    packets = []
+    for timestamp, frame, _ in frames:
+        packet = Ether(frame)
+        packet.time = timestamp
+        packets.append(packet)
+    table = FlowTable(detector.flow_table.idle_timeout, detector.flow_table.active_timeout)
+
+    def run():
+        for packet in packets:
+            table.update(detector.packet_header(packet))
+
+    _, seconds = _timed(run)
+    return {"packets": len(packets), "seconds": seconds, "packets_per_s": len(packets) / seconds}
+
+def bench_scoring(detector, windows, total=100000, batch_sizes=(1, 64, 256, 1024)):
+    """Model scoring throughput for several micro-batch sizes over `total` windows"""
+    X = detector.features_to_array(windows)
+    X = np.resize(X, (max(total, len(X)), X.shape[1]))
+    results = {}
+    for batch_size in batch_sizes:
+        # Keep the batch-of-one case short: it is dominated by call overhead
+        rows = X[:min(len(X), batch_size * 200)]
+
+        def run():
+            for start in range(0, len(rows), batch_size):
+                detector.detect_batch(rows[start:start + batch_size])
+
+        _, seconds = _timed(run)
+        results[str(batch_size)] = {"windows": len(rows), "seconds": seconds, "windows_per_s": len(rows) / seconds}
+    return results
+
+def bench_end_to_end(detector, frames, score_batch_size=256):
+    """
+    Staged pipeline from capture callback to sinks. Latency is measured per
+    window, from the moment the feature worker queues it to the moment the
+    last sink has handled it.
+    """
+    latencies = []
+
+    def record(result):
+        latencies.append(time.perf_counter() - result.queued_at)
+
+    pipeline = DetectionPipeline(
+        detector,
+        sinks={'mqtt': detector.publish_result, 'elasticsearch': detector.store_result, 'latency': record},
+        capture_buffer=len(frames) + 1,
+        score_batch_size=score_batch_size,
+        expire_interval=3600  # expire on packet time only
+    )
+
+    packets = []
+    for timestamp, frame, _ in frames:
+        packet = Ether(frame)
+        packet.time = timestamp
+        packets.append(packet)
+
+    def run():
+        pipeline.start()
+        for packet in packets:
+            pipeline.submit(packet)
+        pipeline.stop()
+
+    _, seconds = _timed(run)
+    stats = pipeline.stats()
+    return {
+        "packets": len(packets),
+        "seconds": seconds,
+        "packets_per_s": len(packets) / seconds,
+        "windows_scored": stats["windows_scored"],
+        "dropped": sum(stage.get("dropped", 0) for stage in stats.values() if isinstance(stage, dict)),
+        "latency_ms": percentiles_ms(latencies)
+    }
+
+def run_benchmarks(packets=200000, scapy_packets=20000, anomaly_rate=0.001, seed=0, workdir=None):
+    """Run every detector benchmark and return the results as a JSON-serialisable dict"""
+    detector = ICSAnomalyDetector(mqtt_client=NullMQTT(), es_client=NullES())
+    report = {
+        "benchmark": "ics_anomaly_detector",
+        "schema_version": BENCHMARK_SCHEMA_VERSION,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {"packets": packets, "scapy_packets": scapy_packets, "anomaly_rate": anomaly_rate, "seed": seed},
+        "results": {}
+    }
+    results = report["results"]
+    try:
+        frames, seconds = _timed(lambda: list(generate_traffic(packets, anomaly_rate=anomaly_rate, seed=seed)))
+        results["generate"] = {
+            "packets": len(frames),
+            "anomalous_packets": sum(1 for frame in frames if frame[2]),
+            "seconds": seconds
+        }
+
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+            path = os.path.join(tmp, "synthetic.pcap")
+            write_pcap(path, frames)
+
+            # Train on the same traffic's flows (baseline), then time each stage
+            windows = []
+            table = FlowTable(detector.flow_table.idle_timeout, detector.flow_table.active_timeout)
+            for header in iter_pcap_headers(path):
+                windows.extend(flow.to_features() for flow in table.update(header))
+            windows.extend(flow.to_features() for flow in table.flush())
+            _, seconds = _timed(lambda: detector.train(windows))
+            results["train"] = {"windows": len(windows), "seconds": seconds}
+
+            results["pcap_extraction"] = bench_pcap_extraction(detector, path)
+            results["scapy_extraction"] = bench_scapy_extraction(detector, frames[:scapy_packets])
+            results["scoring"] = bench_scoring(detector, windows)
+
+            count, seconds = _timed(lambda: detector.replay_pcap(path))
+            results["replay"] = {
+                "packets": count,
+                "seconds": seconds,
+                "packets_per_s": count / seconds,
+                "mqtt_messages": detector.mqtt_client.messages
+            }
+            results["end_to_end"] = bench_end_to_end(detector, frames[:scapy_packets])
+    finally:
+        detector.close()
+    results["elasticsearch_documents"] = detector.es_client.documents
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ICS anomaly detector on synthetic traffic")
+    parser.add_argument("--packets", type=int, default=200000, help="Synthetic packets to generate")
+    parser.add_argument("--scapy-packets", type=int, default=20000,
+                        help="Packets used for the scapy-based live-capture stages")
+    parser.add_argument("--anomaly-rate", type=float, default=0.001, help="Chance of an anomaly after each poll")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.packets, args.scapy_packets, args.anomaly_rate, args.seed)
+    text = json.dumps(report, indent=2, default=float)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
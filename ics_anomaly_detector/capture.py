@@ -0,0 +1,114 @@
+import socket
+import sys
+
+from scapy.all import conf
+from scapy.arch.common import compile_filter, free_filter
+from scapy.data import SO_ATTACH_FILTER
+from scapy.error import Scapy_Exception
+from scapy.libs.structures import sock_fprog
+
+# Well-known ICS service ports; a transport of None matches both TCP and UDP
+ICS_PROTOCOL_PORTS = {
+    'modbus': ('tcp', 502),
+    'dnp3': (None, 20000),
+    's7': ('tcp', 102),
+    'enip': (None, 44818),
+    'opcua': ('tcp', 4840),
+}
+
+# Headers plus the application payload the protocol parsers read (the ics_*
+# features): a full Modbus/TCP ADU (260) or DNP3 frame (292) after the
+# largest headers. PDUs cut off further into a segment are not counted.
+PROTOCOL_SNAPLEN = 512
+
+BPF_RET_K = 0x06  # BPF_RET | BPF_K: accept k bytes of the packet (0 = drop)
+
+def capture_snaplen(headers_only=False, snaplen=None, default=None):
+    """
+    Kernel snaplen for the capture options: an explicit snaplen, else
+    PROTOCOL_SNAPLEN with headers_only, else default (None keeps packets whole)
+    """
+    if snaplen:
+        return snaplen
+    return PROTOCOL_SNAPLEN if headers_only else default
+
+def build_capture_filter(protocols=None, extra=None):
+    """
+    Build a BPF expression selecting ICS traffic.
+    protocols is a list of preset names (see ICS_PROTOCOL_PORTS) or port
+    numbers and defaults to every preset; extra is ORed in verbatim.
+    VLAN-tagged copies of the same traffic are matched as well.
+    """
+    if protocols is None:
+        protocols = list(ICS_PROTOCOL_PORTS)
+    terms = []
+    for protocol in protocols:
+        if isinstance(protocol, int) or str(protocol).isdigit():
+            terms.append(f"port {int(protocol)}")
+            continue
+        try:
+            transport, port = ICS_PROTOCOL_PORTS[protocol.lower()]
+        except KeyError:
+            raise ValueError(
+                f"Unknown ICS protocol {protocol!r}; expected a port number or one of "
+                f"{', '.join(ICS_PROTOCOL_PORTS)}"
+            )
+        terms.append(f"{transport} port {port}" if transport else f"port {port}")
+    if extra:
+        terms.append(f"({extra})")
+    if not terms:
+        return None
+    expression = " or ".join(terms)
+    # Port offsets only line up for tagged frames after the 'vlan' keyword
+    return f"({expression}) or (vlan and ({expression}))"
+
+def _apply_snaplen(program, snaplen):
+    """Make every accepting return of a compiled program keep only snaplen bytes"""
+    for i in range(program.bf_len):
+        insn = program.bf_insns[i]
+        if insn.code == BPF_RET_K and insn.k:
+            insn.k = min(insn.k, snaplen)
+    return program
+
+def compile_capture_filter(expression, interface, snaplen=None):
+    """
+    Compile a BPF expression with libpcap for the interface's link type.
+    With snaplen, accepted packets are truncated to that many bytes by the
+    kernel. Raises ValueError for an invalid expression.
+    """
+    try:
+        program = compile_filter(expression or "", iface=interface)
+    except Scapy_Exception as e:
+        raise ValueError(str(e))
+    if snaplen:
+        _apply_snaplen(program, snaplen)
+    return program
+
+def open_capture_socket(interface, expression=None, snaplen=None):
+    """
+    Open a listening socket whose filter runs in the kernel, so packets that
+    fail it (or the bytes past snaplen) are never copied into Python.
+    Truncation needs a Linux packet socket; elsewhere only the filter applies.
+    """
+    if not sys.platform.startswith('linux'):
+        if snaplen:
+            print("Kernel snaplen truncation is only supported on Linux; capturing full packets")
+        return conf.L2listen(iface=interface, filter=expression)
+
+    program = compile_capture_filter(expression, interface, snaplen) if (expression or snaplen) else None
+    sock = conf.L2listen(iface=interface)
+    if program is not None:
+        try:
+            sock.ins.setsockopt(
+                socket.SOL_SOCKET, SO_ATTACH_FILTER,
+                sock_fprog(program.bf_len, program.bf_insns)
+            )
+        finally:
+            free_filter(program)
+        # Discard anything queued before the filter was attached
+        try:
+            while sock.ins.recv(65535, socket.MSG_DONTWAIT):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+    return sock
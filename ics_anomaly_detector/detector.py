@@ -1,147 +1,530 @@
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from scapy.all import *
 import paho.mqtt.client as mqtt
 from elasticsearch import Elasticsearch
-import json
-import os
+import argparse
+import time
 from datetime import datetime
+from ics_anomaly_detector.alerts import ENCODINGS, AlertPublisher
+from ics_anomaly_detector.capture import PROTOCOL_SNAPLEN, build_capture_filter, capture_snaplen, open_capture_socket
+from ics_anomaly_detector.es_bulk import BulkWriter
+from ics_anomaly_detector.features import FeatureBuffer
+from ics_anomaly_detector.flows import FLOW_FEATURE_NAMES, FlowTable, PacketHeader
+from ics_anomaly_detector.metrics import DetectorMetrics, MetricsServer
+from ics_anomaly_detector.model_store import feature_statistics, load_model, save_model
+from ics_anomaly_detector.online import HalfSpaceTrees
+from ics_anomaly_detector.pcap import iter_pcap_headers
+from ics_anomaly_detector.pipeline import DetectionPipeline
+from ics_anomaly_detector.protocols import parse_payload
+from ics_anomaly_detector.scoring import decision_scores, features_to_array, score_batch, score_features
+from ics_anomaly_detector.sharding import ShardedDetector
+from ics_anomaly_detector.training import ReservoirSample, iter_es_feature_batches, iter_pcap_feature_batches
 
 # MQTT Configuration
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 MQTT_TOPIC = "ics/anomaly"
+MQTT_QOS = 0
+# json (one document per message), msgpack or struct (binary with a schema header)
+MQTT_ENCODING = "json"
+# Anomalies are always published; this fraction of normal windows is too
+MQTT_NORMAL_SAMPLE_RATE = 1.0
+MQTT_BATCH_SIZE = 1
+MQTT_FLUSH_INTERVAL = 1.0
 
 # Elasticsearch Configuration
 ES_HOST = "localhost"
 ES_PORT = 9200
 ES_INDEX = "ics_anomalies"
+ES_BULK_MAX_DOCS = 500
+ES_BULK_MAX_BYTES = 5 * 1024 * 1024
+ES_BULK_FLUSH_INTERVAL = 1.0
+
+# Flow table configuration
+FLOW_IDLE_TIMEOUT = 30.0
+FLOW_ACTIVE_TIMEOUT = 120.0
+FLOW_TABLE_MAX_FLOWS = 500000
+
+# Live capture filter: ICS protocol presets compiled to BPF and run in the
+# kernel; CAPTURE_SNAPLEN truncates accepted packets (None keeps them whole).
+# Protocol features need the payload, so stay at or above PROTOCOL_SNAPLEN.
+CAPTURE_PROTOCOLS = ['modbus', 'dnp3', 's7', 'enip', 'opcua']
+CAPTURE_SNAPLEN = None
+
+# Out-of-core training keeps a uniform sample of at most this many flows
+# (float32, ~116 bytes per flow)
+TRAINING_SAMPLE_SIZE = 1000000
+
+# Online (streaming) model: half-space trees over tumbling windows
+ONLINE_TREES = 25
+ONLINE_TREE_HEIGHT = 8
+ONLINE_WINDOW_SIZE = 1024
+
+# Prometheus text endpoint (GET /metrics); only rendered when scraped
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
 
 class ICSAnomalyDetector:
-    def __init__(self):
-        self.model = IsolationForest(contamination=0.1, random_state=42)
-        self.feature_names = [
-            'packet_size',
-            'inter_arrival_time',
-            'protocol_type',
-            'port_number',
-            'packet_count',
-            'byte_count',
-            'flow_duration',
-            'tcp_flags',
-            'tcp_window_size',
-            'payload_length'
-        ]
+    def __init__(self, mqtt_client=None, es_client=None, online=False):
+        if online:
+            # Keeps learning from every scored window, so baselines follow
+            # gradual drift without retraining
+            self.model = HalfSpaceTrees(
+                n_trees=ONLINE_TREES,
+                height=ONLINE_TREE_HEIGHT,
+                window_size=ONLINE_WINDOW_SIZE,
+                contamination=0.1,
+                random_state=42
+            )
+        else:
+            self.model = IsolationForest(contamination=0.1, random_state=42)
+        self.feature_names = list(FLOW_FEATURE_NAMES)
+        self.feature_stats = None
+        self.model_path = None
+        self.flow_table = FlowTable(
+            idle_timeout=FLOW_IDLE_TIMEOUT,
+            active_timeout=FLOW_ACTIVE_TIMEOUT,
+            max_flows=FLOW_TABLE_MAX_FLOWS
+        )
+        self.metrics = DetectorMetrics()
         
         # Initialize MQTT client
-        self.mqtt_client = mqtt.Client()
-        self.mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        self.mqtt_client.loop_start()
+        if mqtt_client is None:
+            mqtt_client = mqtt.Client()
+            mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
+            mqtt_client.loop_start()
+        self.mqtt_client = mqtt_client
+        self.alert_publisher = AlertPublisher(
+            mqtt_client,
+            MQTT_TOPIC,
+            encoding=MQTT_ENCODING,
+            normal_sample_rate=MQTT_NORMAL_SAMPLE_RATE,
+            batch_size=MQTT_BATCH_SIZE,
+            flush_interval=MQTT_FLUSH_INTERVAL,
+            qos=MQTT_QOS,
+            feature_names=self.feature_names,
+            latency=self.metrics.mqtt_publish_seconds
+        )
         
         # Initialize Elasticsearch client
-        self.es_client = Elasticsearch([{'host': ES_HOST, 'port': ES_PORT}])
+        if es_client is None:
+            es_client = Elasticsearch([{'host': ES_HOST, 'port': ES_PORT}])
+        self.es_client = es_client
         
         # Create index if not exists
         if not self.es_client.indices.exists(index=ES_INDEX):
             self.es_client.indices.create(index=ES_INDEX)
-    
-    def extract_features(self, packet):
-        """Extract features from a network packet"""
-        features = {}
         
-        # Basic packet features
-        features['packet_size'] = len(packet)
-        features['protocol_type'] = packet.proto if 'IP' in packet else 0
-        features['port_number'] = packet[TCP].dport if TCP in packet else (packet[UDP].dport if UDP in packet else 0)
-        
-        # TCP specific features
+        # Results are written through a buffered bulk writer
+        self.es_writer = BulkWriter(
+            self.es_client,
+            max_docs=ES_BULK_MAX_DOCS,
+            max_bytes=ES_BULK_MAX_BYTES,
+            flush_interval=ES_BULK_FLUSH_INTERVAL,
+            latency=self.metrics.es_bulk_seconds
+        )
+        self._track_sinks()
+    
+    def _track_sinks(self):
+        """Expose flow table, MQTT and Elasticsearch state as scrape-time metrics"""
+        track = self.metrics.track
+        track("ics_flows_active", "Flows currently tracked", self.flow_table.__len__)
+        track("ics_flows_evicted_total", "Flows evicted from a full flow table",
+              lambda: self.flow_table.evicted, "counter")
+        publisher = self.alert_publisher
+        track("ics_mqtt_results_total", "Results published to MQTT", lambda: publisher.published, "counter")
+        track("ics_mqtt_suppressed_total", "Normal results sampled out of MQTT",
+              lambda: publisher.suppressed, "counter")
+        writer = self.es_writer
+        track("ics_es_pending", "Documents waiting for an Elasticsearch bulk request",
+              lambda: writer.stats()["pending"])
+        track("ics_es_indexed_total", "Documents indexed in Elasticsearch", lambda: writer.indexed, "counter")
+        track("ics_es_failed_total", "Documents Elasticsearch rejected", lambda: writer.failed, "counter")
+    
+    def serve_metrics(self, host=METRICS_HOST, port=METRICS_PORT):
+        """Serve this detector's metrics at http://host:port/metrics; returns the MetricsServer"""
+        return MetricsServer(self.metrics.registry, host, port).start()
+    
+    def packet_header(self, packet):
+        """Reduce a scapy packet to the header fields used by the flow table"""
+        if IP not in packet:
+            return None
+        ip = packet[IP]
+        sport = dport = flags = window = 0
+        l4_header = 0
+        ics = None
         if TCP in packet:
-            features['tcp_flags'] = packet[TCP].flags
-            features['tcp_window_size'] = packet[TCP].window
+            tcp = packet[TCP]
+            sport, dport, flags, window = tcp.sport, tcp.dport, int(tcp.flags), tcp.window
+            l4_header = (tcp.dataofs or 5) * 4
+        elif UDP in packet:
+            sport, dport = packet[UDP].sport, packet[UDP].dport
+            l4_header = 8
+        if ip.len is None:
+            # Locally built packet: nothing was truncated
+            length = len(packet)
+            payload_length = len(packet[Raw].load) if Raw in packet else 0
         else:
-            features['tcp_flags'] = 0
-            features['tcp_window_size'] = 0
-        
-        # Payload length
-        features['payload_length'] = len(packet[Raw].load) if Raw in packet else 0
-        
-        return features
+            # Sizes come from the IP header so snaplen-truncated captures keep
+            # their on-the-wire lengths
+            length = len(packet) - len(ip) + ip.len
+            payload_length = max(ip.len - ip.ihl * 4 - l4_header, 0)
+        if payload_length and Raw in packet:
+            # Only the captured part of the payload is parsed; a snaplen below
+            # PROTOCOL_SNAPLEN drops PDUs from the ics_* features
+            load = memoryview(packet[Raw].load)
+            ics = parse_payload(load, 0, len(load), sport, dport)
+        return PacketHeader(
+            float(packet.time), ip.src, ip.dst, sport, dport, ip.proto,
+            length, flags, window, payload_length, ics
+        )
     
-    def process_packet_batch(self, packets):
-        """Process a batch of packets and extract time-based features"""
-        if not packets:
-            return None
-            
-        # Calculate time-based features
-        timestamps = [float(p.time) for p in packets]
-        sizes = [len(p) for p in packets]
-        
-        features = {
-            'packet_count': len(packets),
-            'byte_count': sum(sizes),
-            'flow_duration': max(timestamps) - min(timestamps),
-            'inter_arrival_time': np.mean(np.diff(timestamps)) if len(timestamps) > 1 else 0
-        }
-        
-        # Add packet-level features (using the first packet as reference)
-        packet_features = self.extract_features(packets[0])
-        features.update(packet_features)
-        
-        return features
+    def features_to_array(self, features_list):
+        """Convert feature dicts into an (n, n_features) array in feature_names order"""
+        return features_to_array(features_list, self.feature_names)
     
     def train(self, training_data):
         """Train the anomaly detection model"""
-        X = pd.DataFrame(training_data)[self.feature_names]
+        X = self.features_to_array(training_data)
+        self.model.fit(X)
+        self.feature_stats = feature_statistics(X)
+        self.model_path = None
+    
+    def train_streaming(self, batches, sample_size=TRAINING_SAMPLE_SIZE, n_jobs=None):
+        """
+        Train from an iterable of (n, n_features) arrays with bounded memory.
+        A reservoir keeps a uniform sample of at most sample_size rows and the
+        model is fitted on it; n_jobs builds Isolation Forest trees in
+        parallel (-1 = all cores). Returns the number of rows seen.
+        """
+        reservoir = ReservoirSample(sample_size, len(self.feature_names), random_state=42)
+        for batch in batches:
+            reservoir.add(batch)
+        if not len(reservoir):
+            raise ValueError("No training data")
+        if n_jobs is not None and 'n_jobs' in self.model.get_params():
+            self.model.set_params(n_jobs=n_jobs)
+        X = reservoir.sample()
         self.model.fit(X)
+        self.feature_stats = feature_statistics(X)
+        self.model_path = None
+        return reservoir.seen
+    
+    def train_from_pcaps(self, paths, sample_size=TRAINING_SAMPLE_SIZE, n_jobs=None):
+        """Train on the flows of one or more pcap files without loading them whole"""
+        batches = iter_pcap_feature_batches(
+            paths, self.feature_names,
+            idle_timeout=self.flow_table.idle_timeout,
+            active_timeout=self.flow_table.active_timeout,
+            max_flows=self.flow_table.max_flows
+        )
+        return self.train_streaming(batches, sample_size, n_jobs)
+    
+    def train_from_elasticsearch(self, index=ES_INDEX, query=None, sample_size=TRAINING_SAMPLE_SIZE,
+                                 n_jobs=None):
+        """Train on stored detection results, scrolling the index in batches"""
+        batches = iter_es_feature_batches(self.es_client, index, self.feature_names, query=query)
+        return self.train_streaming(batches, sample_size, n_jobs)
+    
+    def save_model(self, path):
+        """Save the trained model with its feature schema and training statistics"""
+        save_model(path, self.model, self.feature_names, self.feature_stats)
+        self.model_path = path
+    
+    def load_model(self, path):
+        """Load a model saved with save_model instead of retraining"""
+        bundle = load_model(path, expected_features=self.feature_names)
+        self.model = bundle["model"]
+        self.feature_stats = bundle["feature_stats"]
+        self.model_path = path
+    
+    def drift_stats(self):
+        """Concept-drift statistics of the online model, or None for a batch model"""
+        if not isinstance(self.model, HalfSpaceTrees):
+            return None
+        return self.model.drift_stats(self.feature_names)
+    
+    def detect_batch(self, X):
+        """
+        Score many feature vectors with a single model call.
+        X is an (n, n_features) array in feature_names order. Returns
+        (is_anomaly, scores) arrays; scores below zero are anomalous.
+        An online model also learns from X.
+        """
+        return decision_scores(self.model, X)
+    
+    def score_windows(self, features_list):
+        """Score a micro-batch of windows; returns (result dicts, is_anomaly array)"""
+        return score_features(self.model, self.feature_names, features_list)
+    
+    def publish_result(self, result):
+        """Send a detection result to MQTT (subject to sampling and batching)"""
+        started = time.perf_counter()
+        self.alert_publisher.publish(result)
+        self.metrics.sink_seconds['mqtt'].record(time.perf_counter() - started)
+    
+    def close(self):
+        """Flush pending MQTT batches and Elasticsearch writes"""
+        self.alert_publisher.close()
+        self.es_writer.close()
+    
+    def store_result(self, result):
+        """Store a detection result in Elasticsearch"""
+        started = time.perf_counter()
+        self.es_writer.index(ES_INDEX, result)
+        self.metrics.sink_seconds['elasticsearch'].record(time.perf_counter() - started)
+    
+    def detect_many(self, features_list):
+        """Detect anomalies in a micro-batch of windows and publish every result"""
+        started = time.perf_counter()
+        results, is_anomaly = self.score_windows(features_list)
+        self.metrics.detect_seconds.record(time.perf_counter() - started)
+        self.metrics.scored(is_anomaly)
+        for result in results:
+            self.publish_result(result)
+            self.store_result(result)
+        return is_anomaly
+    
+    def detect_buffer(self, windows):
+        """
+        Score the rows of a FeatureBuffer, send each result to the sinks and
+        clear the buffer for reuse. Returns the is_anomaly array.
+        """
+        if not len(windows):
+            return np.zeros(0, dtype=bool)
+        started = time.perf_counter()
+        batch = score_batch(self.model, self.feature_names, windows.rows())
+        self.metrics.detect_seconds.record(time.perf_counter() - started)
+        self.metrics.scored(batch.is_anomaly)
+        windows.clear()
+        for result in batch:
+            self.publish_result(result)
+            self.store_result(result)
+        return batch.is_anomaly
     
     def detect(self, features):
         """Detect anomalies in the current features"""
-        X = pd.DataFrame([features])[self.feature_names]
-        prediction = self.model.predict(X)[0]
+        return bool(self.detect_many([features])[0])
+    
+    def create_pipeline(self, capture_buffer=65536, sink_buffer=10000, score_batch_size=256):
+        """Build a staged pipeline that feeds this detector's MQTT and Elasticsearch sinks"""
+        return DetectionPipeline(
+            self,
+            sinks={'mqtt': self.publish_result, 'elasticsearch': self.store_result},
+            capture_buffer=capture_buffer,
+            sink_buffer=sink_buffer,
+            score_batch_size=score_batch_size,
+            metrics=self.metrics
+        )
+    
+    def create_sharded(self, workers=None, score_batch_size=1024, expire_interval=None):
+        """Build a multi-process detector that feeds this detector's sinks"""
+        return ShardedDetector(
+            self,
+            sinks={'mqtt': self.publish_result, 'elasticsearch': self.store_result},
+            workers=workers,
+            score_batch_size=score_batch_size,
+            expire_interval=expire_interval,
+            metrics=self.metrics
+        )
+    
+    def open_capture(self, interface='eth0', capture_filter=None, snaplen=CAPTURE_SNAPLEN):
+        """
+        Open a capture socket with a kernel-side BPF filter.
+        capture_filter defaults to the CAPTURE_PROTOCOLS presets; pass an
+        empty string to capture all traffic.
+        """
+        if capture_filter is None:
+            capture_filter = build_capture_filter(CAPTURE_PROTOCOLS)
+        return open_capture_socket(interface, capture_filter or None, snaplen)
+    
+    def start_capture(self, interface='eth0', capture_buffer=65536, sink_buffer=10000,
+                      score_batch_size=256, stats_interval=60, workers=1,
+                      capture_filter=None, snaplen=CAPTURE_SNAPLEN):
+        """
+        Start capturing packets and detecting anomalies.
+        Only packets passing capture_filter reach Python (see open_capture).
+        The sniff callback only enqueues packets into a bounded ring buffer;
+        flow extraction, scoring and each sink run on their own threads.
+        Queue depths and drop counters are printed every stats_interval seconds.
+        With workers > 1 flows are sharded across processes instead.
+        """
+        sock = self.open_capture(interface, capture_filter, snaplen)
+        if workers != 1:
+            return self._start_sharded_capture(sock, workers, score_batch_size, stats_interval)
         
-        # -1 indicates anomaly, 1 indicates normal
-        is_anomaly = prediction == -1
+        pipeline = self.create_pipeline(capture_buffer, sink_buffer, score_batch_size)
+        pipeline.start()
+        last_stats = time.time()
         
-        # Prepare result
-        result = {
-            'timestamp': datetime.now().isoformat(),
-            'is_anomaly': is_anomaly,
-            'features': features
-        }
+        def process_packet(packet):
+            nonlocal last_stats
+            pipeline.submit(packet)
+            if stats_interval and time.time() - last_stats >= stats_interval:
+                last_stats = time.time()
+                print(f"Pipeline stats: {pipeline.stats()}")
+                if self.drift_stats() is not None:
+                    print(f"Drift stats: {self.drift_stats()}")
         
-        # Send to MQTT
-        self.mqtt_client.publish(MQTT_TOPIC, json.dumps(result))
+        # Start packet capture
+        try:
+            sniff(opened_socket=sock, prn=process_packet, store=0)
+        finally:
+            sock.close()
+            pipeline.stop()
+            print(f"Pipeline stats: {pipeline.stats()}")
+            self.close()
+    
+    def _start_sharded_capture(self, sock, workers, score_batch_size, stats_interval,
+                               flush_interval=0.5):
+        """
+        Live capture with flows sharded over worker processes. The sniff
+        callback only extracts the header and hands it to its shard; batches
+        for a saturated shard are dropped rather than stalling capture.
+        Partial batches are flushed every flush_interval seconds, including
+        when no packets arrive.
+        """
+        sharded = self.create_sharded(workers, score_batch_size, expire_interval=1.0)
+        sharded.start()
+        last_flush = last_stats = time.time()
         
-        # Store in Elasticsearch
-        self.es_client.index(index=ES_INDEX, body=result)
+        packets = self.metrics.packets
         
-        return is_anomaly
-    
-    def start_capture(self, interface='eth0', batch_size=100, batch_timeout=10):
-        """Start capturing packets and detecting anomalies"""
-        packets = []
-        last_batch_time = time.time()
+        def tick():
+            nonlocal last_flush, last_stats
+            now = time.time()
+            if now - last_flush >= flush_interval:
+                sharded.flush(block=False)
+                last_flush = now
+            if stats_interval and now - last_stats >= stats_interval:
+                last_stats = now
+                print(f"Shard stats: {sharded.stats()}")
         
         def process_packet(packet):
-            nonlocal packets, last_batch_time
-            
-            if IP in packet:
-                packets.append(packet)
-                
-                current_time = time.time()
-                if len(packets) >= batch_size or (current_time - last_batch_time) >= batch_timeout:
-                    features = self.process_packet_batch(packets)
-                    if features:
-                        self.detect(features)
-                    packets = []
-                    last_batch_time = current_time
+            header = self.packet_header(packet)
+            if header is not None:
+                packets.inc()
+                sharded.submit(header, block=False)
+            tick()
         
-        # Start packet capture
-        sniff(iface=interface, prn=process_packet, store=0)
+        try:
+            # sniff returns every flush_interval so a quiet link still gets its
+            # last packets to the shards; chainCC lets Ctrl-C end the loop
+            while not sock.closed:
+                sniff(opened_socket=sock, prn=process_packet, store=0,
+                      timeout=flush_interval, chainCC=True)
+                tick()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
+            sharded.stop()
+            print(f"Shard stats: {sharded.stats()}")
+            self.close()
+
+    def _paced_headers(self, path, realtime, speed):
+        """Yield pcap headers, optionally paced to their original timing"""
+        first_ts = None
+        start = time.monotonic()
+        for header in iter_pcap_headers(path):
+            if realtime:
+                if first_ts is None:
+                    first_ts = header.timestamp
+                delay = (header.timestamp - first_ts) / speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            yield header
+
+    def replay_pcap(self, path, realtime=False, speed=1.0, score_batch_size=1024, workers=1):
+        """
+        Replay a pcap file through the flow table and scorer.
+        Headers are read straight from the memory-mapped file without scapy
+        dissection. By default packets are processed as fast as possible; with
+        realtime=True they are paced to their original timing divided by speed.
+        With workers > 1 flows are sharded across processes by 5-tuple hash.
+        Returns the number of IP packets processed.
+        """
+        packets = self.metrics.packets
+        if workers != 1:
+            sharded = self.create_sharded(workers, score_batch_size)
+            sharded.start()
+            count = 0
+            try:
+                for header in self._paced_headers(path, realtime, speed):
+                    sharded.submit(header)
+                    count += 1
+                    packets.inc()
+            finally:
+                sharded.stop()
+            self.alert_publisher.flush()
+            self.es_writer.flush()
+            return count
+        
+        windows = FeatureBuffer(score_batch_size, len(self.feature_names))
+        count = 0
+        for header in self._paced_headers(path, realtime, speed):
+            count += 1
+            packets.inc()
+            for flow in self.flow_table.update(header):
+                windows.add(flow)
+                if windows.full:
+                    self.detect_buffer(windows)
+        
+        for flow in self.flow_table.flush():
+            windows.add(flow)
+            if windows.full:
+                self.detect_buffer(windows)
+        self.detect_buffer(windows)
+        self.alert_publisher.flush()
+        self.es_writer.flush()
+        return count
 
 if __name__ == "__main__":
-    detector = ICSAnomalyDetector()
+    parser = argparse.ArgumentParser(description="ICS network anomaly detector")
+    parser.add_argument("--interface", default="eth0", help="Interface for live capture")
+    parser.add_argument("--pcap", help="Replay a pcap file instead of capturing live")
+    parser.add_argument("--realtime", action="store_true", help="Replay at the original packet timing")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed-up factor for --realtime replay")
+    parser.add_argument("--protocols", default=",".join(CAPTURE_PROTOCOLS),
+                        help="Comma-separated ICS presets or ports to capture")
+    parser.add_argument("--filter", dest="capture_filter",
+                        help="Raw BPF expression (overrides --protocols; '' captures everything)")
+    parser.add_argument("--headers-only", action="store_true",
+                        help=f"Truncate captured packets to {PROTOCOL_SNAPLEN} bytes in the kernel "
+                             "(headers plus the ICS PDUs parsed for protocol features)")
+    parser.add_argument("--snaplen", type=int,
+                        help="Truncate captured packets to this many bytes in the kernel; below "
+                             f"{PROTOCOL_SNAPLEN} protocol features miss PDUs")
+    parser.add_argument("--online", action="store_true",
+                        help="Use the streaming half-space-trees model that keeps learning")
+    parser.add_argument("--mqtt-encoding", choices=ENCODINGS, default=MQTT_ENCODING,
+                        help="MQTT payload encoding")
+    parser.add_argument("--mqtt-sample-normals", type=float, default=MQTT_NORMAL_SAMPLE_RATE,
+                        help="Fraction of normal windows published to MQTT (0 = anomalies only)")
+    parser.add_argument("--mqtt-batch", type=int, default=MQTT_BATCH_SIZE,
+                        help="Results per MQTT message")
+    parser.add_argument("--model", help="Load a saved model instead of training")
+    parser.add_argument("--train-pcap", action="append", default=[],
+                        help="Train on the flows in this pcap (repeatable)")
+    parser.add_argument("--train-es", action="store_true",
+                        help="Train on non-anomalous results stored in Elasticsearch")
+    parser.add_argument("--sample-size", type=int, default=TRAINING_SAMPLE_SIZE,
+                        help="Maximum flows kept for training")
+    parser.add_argument("--n-jobs", type=int, help="Parallel tree building (-1 = all cores)")
+    parser.add_argument("--save-model", help="Save the trained model to this path")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Shard flows across this many processes (0 = one per core)")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help=f"Serve Prometheus metrics on {METRICS_HOST}:PORT/metrics (0 = disabled)")
+    args = parser.parse_args()
+    
+    MQTT_ENCODING = args.mqtt_encoding
+    MQTT_NORMAL_SAMPLE_RATE = args.mqtt_sample_normals
+    MQTT_BATCH_SIZE = args.mqtt_batch
+    detector = ICSAnomalyDetector(online=args.online)
+    if args.metrics_port:
+        detector.serve_metrics(port=args.metrics_port)
     
     # Example usage:
     # 1. Collect some normal traffic for training
@@ -160,10 +543,58 @@ if __name__ == "__main__":
             'flow_duration': 5.0,
             'tcp_flags': 2,
             'tcp_window_size': 8192,
-            'payload_length': 80
+            'payload_length': 80,
+            'inter_arrival_std': 0.02,
+            'payload_std': 10,
+            'payload_max': 120,
+            'fin_count': 0,
+            'syn_count': 1,
+            'rst_count': 0,
+            'psh_count': 24,
+            'ack_count': 49,
+            'urg_count': 0,
+            'ics_request_count': 24,
+            'ics_response_count': 24,
+            'ics_read_count': 24,
+            'ics_write_count': 0,
+            'ics_control_count': 0,
+            'ics_function_count': 1,
+            'ics_write_read_ratio': 0.0,
+            'ics_exception_rate': 0.0,
+            'ics_unit_count': 1,
+            'ics_register_span': 10
         }
         # Add more training samples here
     ]
     
-    detector.train(training_data)
-    detector.start_capture()
+    if args.model:
+        detector.load_model(args.model)
+    else:
+        if args.train_pcap:
+            flows = detector.train_from_pcaps(args.train_pcap, args.sample_size, args.n_jobs)
+            print(f"Trained on a sample of {min(flows, args.sample_size)} of {flows} flows")
+        elif args.train_es:
+            flows = detector.train_from_elasticsearch(sample_size=args.sample_size, n_jobs=args.n_jobs)
+            print(f"Trained on a sample of {min(flows, args.sample_size)} of {flows} stored results")
+        else:
+            detector.train(training_data)
+        if args.save_model:
+            detector.save_model(args.save_model)
+    
+    if args.pcap:
+        started = time.monotonic()
+        packets = detector.replay_pcap(args.pcap, realtime=args.realtime, speed=args.speed,
+                                       workers=args.workers)
+        elapsed = time.monotonic() - started
+        print(f"Replayed {packets} packets in {elapsed:.1f}s ({packets / max(elapsed, 1e-9):.0f} packets/s)")
+        detector.close()
+    else:
+        capture_filter = args.capture_filter
+        if capture_filter is None:
+            capture_filter = build_capture_filter([p.strip() for p in args.protocols.split(",") if p.strip()])
+        detector.start_capture(
+            interface=args.interface,
+            workers=args.workers,
+            capture_filter=capture_filter or "",
+            snaplen=capture_snaplen(args.headers_only, args.snaplen, default=CAPTURE_SNAPLEN)
+        )
@@ -0,0 +1,245 @@
+import json
+import threading
+import time
+from datetime import date, datetime
+
+# Bulk item statuses worth retrying (throttling / temporarily unavailable)
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+def json_default(value):
+    """Serialize scored windows, numpy values, datetimes and scapy flag fields."""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+class BulkIndexError(Exception):
+    """Raised by index_and_wait when a document was not indexed."""
+
+class _Receipt:
+    """Outcome of one queued document, for index_and_wait"""
+    __slots__ = ('done', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+def _resolve(entries, error=None):
+    for entry in entries:
+        receipt = entry[2]
+        if receipt is not None:
+            receipt.error = error
+            receipt.done.set()
+
+class BulkWriter:
+    """
+    Buffered Elasticsearch writer using the bulk API.
+
+    Documents are queued by `index` and sent from a background thread when
+    the buffer reaches max_docs or max_bytes, or every flush_interval seconds.
+    Items rejected with a retryable status are resent with exponential
+    backoff. Once max_pending documents are waiting, `index` blocks so a slow
+    cluster pushes back on the producer instead of growing memory.
+    `index_and_wait` is for callers that must know the document was stored.
+    latency, if given, is a metrics Histogram timing each bulk request.
+    """
+
+    def __init__(self, es_client, max_docs=500, max_bytes=5 * 1024 * 1024, flush_interval=1.0,
+                 max_pending=None, max_retries=3, retry_backoff=0.5, latency=None):
+        self.es_client = es_client
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending or max_docs * 10
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.latency = latency
+
+        self.indexed = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.requests = 0
+
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="es-bulk-writer", daemon=True)
+            self._thread.start()
+
+    def index(self, index, document, id=None, timeout=None):
+        """
+        Queue a document for indexing. Blocks while the writer is saturated;
+        returns False if it could not be queued within timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        return self._enqueue(index, document, id, None, deadline)
+
+    def index_and_wait(self, index, document, id=None, timeout=None):
+        """
+        Queue a document, flush it without waiting for the batch to fill and
+        wait for its bulk item result. Raises BulkIndexError if Elasticsearch
+        rejected it (after retries) or it was not indexed within timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        receipt = _Receipt()
+        if not self._enqueue(index, document, id, receipt, deadline, flush=True):
+            raise BulkIndexError(f"Timed out queueing document {id} for {index}")
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        if not receipt.done.wait(remaining):
+            raise BulkIndexError(f"Timed out waiting for document {id} to be indexed in {index}")
+        if receipt.error is not None:
+            raise BulkIndexError(f"Failed to index document {id} in {index}: {receipt.error}")
+
+    def _enqueue(self, index, document, id, receipt, deadline, flush=False):
+        action = {"index": {"_index": index}}
+        if id is not None:
+            action["index"]["_id"] = id
+        entry = (
+            json.dumps(action).encode("utf-8"),
+            json.dumps(document, default=json_default).encode("utf-8"),
+            receipt
+        )
+        size = len(entry[0]) + len(entry[1]) + 2
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BulkWriter is closed")
+            self._ensure_started()
+            while len(self._buffer) + self._in_flight >= self.max_pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.dropped += 1
+                    return False
+                self._cond.wait(remaining)
+            self._buffer.append(entry)
+            self._buffer_bytes += size
+            if flush:
+                self._flush_requested = True
+            if flush or self._batch_ready():
+                self._cond.notify_all()
+        return True
+
+    def flush(self, timeout=None):
+        """Send everything queued so far and wait for it to complete."""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._flush_requested = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._buffer and not self._in_flight, timeout)
+
+    def close(self, timeout=None):
+        """Flush remaining documents and stop the background thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._buffer) + self._in_flight,
+                "indexed": self.indexed,
+                "failed": self.failed,
+                "retried": self.retried,
+                "dropped": self.dropped,
+                "requests": self.requests
+            }
+
+    def _batch_ready(self):
+        return len(self._buffer) >= self.max_docs or self._buffer_bytes >= self.max_bytes
+
+    def _take_batch(self):
+        count = 0
+        size = 0
+        for action, source, _ in self._buffer:
+            if count and (count >= self.max_docs or size >= self.max_bytes):
+                break
+            count += 1
+            size += len(action) + len(source) + 2
+        batch = self._buffer[:count]
+        del self._buffer[:count]
+        self._buffer_bytes -= size
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not (self._closed or self._flush_requested or self._batch_ready()):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._buffer:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                batch = self._take_batch()
+                self._in_flight = len(batch)
+            try:
+                self._send(batch)
+            finally:
+                with self._cond:
+                    self._in_flight = 0
+                    self._cond.notify_all()
+
+    def _send(self, batch):
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            started = time.perf_counter()
+            try:
+                self.requests += 1
+                response = self.es_client.bulk(operations=[line for entry in pending for line in entry[:2]])
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Error sending bulk request to Elasticsearch: {e}")
+                    self.failed += len(pending)
+                    _resolve(pending, str(e))
+                    return
+                self.retried += len(pending)
+                continue
+            if self.latency is not None:
+                self.latency.record(time.perf_counter() - started)
+
+            if not response.get("errors"):
+                self.indexed += len(pending)
+                _resolve(pending)
+                return
+
+            retry = []
+            for entry, item in zip(pending, response["items"]):
+                result = next(iter(item.values()))
+                status = result.get("status", 500)
+                if status < 300:
+                    self.indexed += 1
+                    _resolve([entry])
+                elif status in RETRYABLE_STATUSES and attempt < self.max_retries:
+                    retry.append(entry)
+                else:
+                    self.failed += 1
+                    print(f"Error indexing document: {result.get('error')}")
+                    _resolve([entry], str(result.get("error") or f"status {status}"))
+            if not retry:
+                return
+            self.retried += len(retry)
+            pending = retry
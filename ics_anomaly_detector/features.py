@@ -0,0 +1,114 @@
+import threading
+import time
+
+import numpy as np
+
+from ics_anomaly_detector.flows import FLOW_FEATURE_NAMES
+
+class FeatureBuffer:
+    """
+    Preallocated (capacity, n_features) float64 batch of flow feature vectors.
+
+    Expired flows write their features straight into the next free row, so
+    filling and scoring a batch allocates no per-flow dicts or arrays; the
+    buffer is reused after `clear`.
+    """
+
+    def __init__(self, capacity, n_features=len(FLOW_FEATURE_NAMES)):
+        self.array = np.zeros((capacity, n_features), dtype=np.float64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def full(self):
+        return self.size >= len(self.array)
+
+    def add(self, flow):
+        """Write one flow's features into the next row; the buffer must not be full"""
+        flow.write_features(self.array[self.size])
+        self.size += 1
+
+    def rows(self):
+        """View of the filled rows"""
+        return self.array[:self.size]
+
+    def clear(self):
+        self.size = 0
+
+class FeatureRing:
+    """
+    Bounded ring of feature vectors between the feature worker and the scorer.
+
+    Rows live in one preallocated array together with the time each was
+    queued. Like StageQueue, `put_flow` never blocks: when the ring is full
+    the flow is dropped and counted. `take` copies rows out in FIFO order
+    into the caller's own preallocated arrays.
+    """
+
+    def __init__(self, name, capacity, n_features=len(FLOW_FEATURE_NAMES)):
+        self.name = name
+        self.maxsize = capacity
+        self.enqueued = 0
+        self.dropped = 0
+        self._rows = np.zeros((capacity, n_features), dtype=np.float64)
+        self._queued_at = np.zeros(capacity, dtype=np.float64)
+        self._head = 0
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        return self._size
+
+    def put_flow(self, flow):
+        with self._cond:
+            if self._closed or self._size >= self.maxsize:
+                self.dropped += 1
+                return False
+            slot = (self._head + self._size) % self.maxsize
+            flow.write_features(self._rows[slot])
+            self._queued_at[slot] = time.perf_counter()
+            self._size += 1
+            self.enqueued += 1
+            self._cond.notify()
+            return True
+
+    def take(self, out, queued_at=None, timeout=None):
+        """
+        Wait up to timeout for at least one row and copy up to len(out) rows
+        into out (and their queue times into queued_at). Returns the row
+        count: 0 on timeout or once the ring is closed and drained.
+        """
+        with self._cond:
+            if not self._size and not self._closed:
+                self._cond.wait(timeout)
+            count = min(len(out), self._size)
+            first = min(count, self.maxsize - self._head)
+            head = self._head
+            out[:first] = self._rows[head:head + first]
+            out[first:count] = self._rows[:count - first]
+            if queued_at is not None:
+                queued_at[:first] = self._queued_at[head:head + first]
+                queued_at[first:count] = self._queued_at[:count - first]
+            self._head = (head + count) % self.maxsize
+            self._size -= count
+            return count
+
+    @property
+    def finished(self):
+        return self._closed and not self._size
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            "depth": self._size,
+            "capacity": self.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped
+        }
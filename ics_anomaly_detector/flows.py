@@ -0,0 +1,243 @@
+import math
+from collections import OrderedDict, namedtuple
+
+from ics_anomaly_detector.protocols import PROTOCOL_FEATURE_NAMES
+
+# Minimal per-packet header information needed by the flow table. Produced
+# from scapy packets in live capture and from raw bytes in pcap replay.
+# `ics` is the ProtocolSummary of a Modbus/DNP3/S7 payload, or None.
+PacketHeader = namedtuple(
+    "PacketHeader",
+    "timestamp src dst sport dport proto length tcp_flags window payload_length ics",
+    defaults=(None,)
+)
+
+# Distinct Modbus units / DNP3 outstations remembered per flow
+MAX_FLOW_UNITS = 256
+
+# TCP flag bits, in the order of the per-flow flag histogram
+TCP_FLAG_BITS = (
+    ('fin', 0x01),
+    ('syn', 0x02),
+    ('rst', 0x04),
+    ('psh', 0x08),
+    ('ack', 0x10),
+    ('urg', 0x20),
+)
+
+FLOW_FEATURE_NAMES = [
+    'packet_size',
+    'inter_arrival_time',
+    'protocol_type',
+    'port_number',
+    'packet_count',
+    'byte_count',
+    'flow_duration',
+    'tcp_flags',
+    'tcp_window_size',
+    'payload_length',
+    'inter_arrival_std',
+    'payload_std',
+    'payload_max',
+] + [f'{name}_count' for name, _ in TCP_FLAG_BITS] + PROTOCOL_FEATURE_NAMES
+
+def flow_key(header):
+    """Direction-independent 5-tuple so both sides of a conversation share a flow"""
+    a = (header.src, header.sport)
+    b = (header.dst, header.dport)
+    if a <= b:
+        return (header.proto,) + a + b
+    return (header.proto,) + b + a
+
+class FlowStats:
+    """Incremental aggregates for one flow; every update is O(1)"""
+    __slots__ = (
+        'key', 'proto', 'service_port', 'first_seen', 'last_seen',
+        'packet_count', 'byte_count', 'iat_mean', 'iat_m2',
+        'payload_sum', 'payload_sq_sum', 'payload_max',
+        'tcp_flags', 'flag_counts', 'window',
+        'ics_requests', 'ics_responses', 'ics_reads', 'ics_writes', 'ics_controls',
+        'ics_exceptions', 'ics_functions', 'ics_units', 'ics_register_low', 'ics_register_high'
+    )
+
+    def __init__(self, key, header):
+        self.key = key
+        self.proto = header.proto
+        # The lower port is almost always the ICS service port (502, 102, ...)
+        ports = [p for p in (header.sport, header.dport) if p]
+        self.service_port = min(ports) if ports else 0
+        self.first_seen = header.timestamp
+        self.last_seen = header.timestamp
+        self.packet_count = 0
+        self.byte_count = 0
+        self.iat_mean = 0.0
+        self.iat_m2 = 0.0
+        self.payload_sum = 0
+        self.payload_sq_sum = 0
+        self.payload_max = 0
+        self.tcp_flags = 0
+        self.flag_counts = [0] * len(TCP_FLAG_BITS)
+        self.window = 0
+        self.ics_requests = 0
+        self.ics_responses = 0
+        self.ics_reads = 0
+        self.ics_writes = 0
+        self.ics_controls = 0
+        self.ics_exceptions = 0
+        self.ics_functions = 0
+        self.ics_units = None
+        self.ics_register_low = -1
+        self.ics_register_high = -1
+
+    def update(self, header):
+        if self.packet_count:
+            # Welford's online mean/variance of inter-arrival times
+            iat = header.timestamp - self.last_seen
+            n = self.packet_count
+            delta = iat - self.iat_mean
+            self.iat_mean += delta / n
+            self.iat_m2 += delta * (iat - self.iat_mean)
+        self.last_seen = header.timestamp
+        self.packet_count += 1
+        self.byte_count += header.length
+
+        payload = header.payload_length
+        self.payload_sum += payload
+        self.payload_sq_sum += payload * payload
+        if payload > self.payload_max:
+            self.payload_max = payload
+
+        flags = header.tcp_flags
+        if flags:
+            self.tcp_flags |= flags
+            counts = self.flag_counts
+            for i, (_, bit) in enumerate(TCP_FLAG_BITS):
+                if flags & bit:
+                    counts[i] += 1
+        if header.window:
+            self.window = header.window
+
+        ics = header.ics
+        if ics is not None:
+            requests, responses, reads, writes, controls, exceptions, functions, unit, low, high = ics
+            self.ics_requests += requests
+            self.ics_responses += responses
+            self.ics_reads += reads
+            self.ics_writes += writes
+            self.ics_controls += controls
+            self.ics_exceptions += exceptions
+            self.ics_functions |= functions
+            if unit >= 0:
+                units = self.ics_units
+                if units is None:
+                    self.ics_units = {unit}
+                elif len(units) < MAX_FLOW_UNITS:
+                    units.add(unit)
+            if low >= 0:
+                if self.ics_register_low < 0 or low < self.ics_register_low:
+                    self.ics_register_low = low
+                if high > self.ics_register_high:
+                    self.ics_register_high = high
+
+    def feature_values(self):
+        """Feature values of the finished flow as a list in FLOW_FEATURE_NAMES order"""
+        n = self.packet_count
+        payload_mean = self.payload_sum / n
+        payload_var = max(self.payload_sq_sum / n - payload_mean * payload_mean, 0.0)
+        iat_var = self.iat_m2 / (n - 1) if n > 1 else 0.0
+        values = [
+            self.byte_count / n,
+            self.iat_mean,
+            self.proto,
+            self.service_port,
+            n,
+            self.byte_count,
+            self.last_seen - self.first_seen,
+            self.tcp_flags,
+            self.window,
+            payload_mean,
+            math.sqrt(iat_var),
+            math.sqrt(payload_var),
+            self.payload_max,
+        ]
+        values += self.flag_counts
+        values += (
+            self.ics_requests,
+            self.ics_responses,
+            self.ics_reads,
+            self.ics_writes,
+            self.ics_controls,
+            self.ics_functions.bit_count(),
+            self.ics_writes / max(self.ics_reads, 1),
+            self.ics_exceptions / self.ics_responses if self.ics_responses else 0.0,
+            len(self.ics_units) if self.ics_units else 0,
+            self.ics_register_high - self.ics_register_low + 1 if self.ics_register_low >= 0 else 0,
+        )
+        return values
+
+    def write_features(self, out):
+        """Write the feature vector into a preallocated row (e.g. of a FeatureBuffer)"""
+        out[:] = self.feature_values()
+
+    def to_features(self):
+        """Feature vector for the finished flow, keyed by FLOW_FEATURE_NAMES"""
+        return dict(zip(FLOW_FEATURE_NAMES, self.feature_values()))
+
+class FlowTable:
+    """
+    Track concurrent flows keyed by 5-tuple and expire them into feature vectors.
+
+    A flow is emitted when it has been idle for idle_timeout seconds, when it
+    has been active for active_timeout seconds (long-lived ICS sessions are
+    then reported periodically), or when the table is full and it is the
+    least recently seen flow. Flows are kept in last-seen order so expiry
+    only ever inspects the head of the table.
+    """
+
+    def __init__(self, idle_timeout=30.0, active_timeout=120.0, max_flows=500000):
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.max_flows = max_flows
+        self.flows = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.flows)
+
+    def update(self, header):
+        """Add one packet; returns the flows that expired as a result"""
+        expired = self.expire(header.timestamp)
+        key = flow_key(header)
+        flow = self.flows.get(key)
+        if flow is not None:
+            if header.timestamp - flow.first_seen >= self.active_timeout:
+                del self.flows[key]
+                expired.append(flow)
+                flow = None
+            else:
+                self.flows.move_to_end(key)
+        if flow is None:
+            if len(self.flows) >= self.max_flows:
+                expired.append(self.flows.popitem(last=False)[1])
+                self.evicted += 1
+            flow = FlowStats(key, header)
+            self.flows[key] = flow
+        flow.update(header)
+        return expired
+
+    def expire(self, now):
+        """Remove and return flows idle for at least idle_timeout as of `now`"""
+        expired = []
+        flows = self.flows
+        while flows:
+            flow = next(iter(flows.values()))
+            if now - flow.last_seen < self.idle_timeout:
+                break
+            expired.append(flows.popitem(last=False)[1])
+        return expired
+
+    def flush(self):
+        """Remove and return every tracked flow"""
+        expired = list(self.flows.values())
+        self.flows.clear()
+        return expired
@@ -0,0 +1,287 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram resolution: values below 2**SUB_BUCKET_BITS microseconds get one
+# bucket each, every power of two above that is split into
+# 2**(SUB_BUCKET_BITS - 1) linear sub-buckets (<= 12.5% relative error)
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS >> 1
+# Largest recorded value is clamped to ~2**40 us (about 12 days)
+_MAX_SHIFT = 40 - SUB_BUCKET_BITS
+_N_BUCKETS = _SUB_BUCKETS + _MAX_SHIFT * _HALF
+
+# Exported Prometheus bucket bounds: powers of two from 1 us to ~67 s. They
+# coincide with histogram bucket edges, so cumulative counts are exact.
+EXPORT_BOUNDS_US = [1 << i for i in range(27)]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _bucket_index(us):
+    if us < _SUB_BUCKETS:
+        return us if us > 0 else 0
+    shift = us.bit_length() - SUB_BUCKET_BITS
+    if shift > _MAX_SHIFT:
+        return _N_BUCKETS - 1
+    return _SUB_BUCKETS + (shift - 1) * _HALF + (us >> shift) - _HALF
+
+def _bucket_bounds(index):
+    """[low, high) in microseconds covered by a histogram bucket"""
+    if index < _SUB_BUCKETS:
+        return index, index + 1
+    shift = (index - _SUB_BUCKETS) // _HALF + 1
+    top = (index - _SUB_BUCKETS) % _HALF + _HALF
+    return top << shift, (top + 1) << shift
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic counter. `inc` is a plain attribute update with no lock: each
+    counter is meant to be written by one stage thread, and a scrape only
+    reads it.
+    """
+    __slots__ = ('value',)
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, labels):
+        return [(name, labels, self.value)]
+
+class Histogram:
+    """
+    HDR-style latency histogram over log-linear microsecond buckets.
+
+    `record` costs a bit_length and a list increment, memory is a fixed
+    list of counters and quantiles are accurate to one bucket. Like Counter
+    it takes no lock: each histogram has one writing thread.
+    """
+    kind = "histogram"
+
+    def __init__(self):
+        self.counts = [0] * _N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        us = int(seconds * 1e6)
+        if us < _SUB_BUCKETS:
+            index = us if us > 0 else 0
+        else:
+            # _bucket_index inlined: this runs once per scored window per sink
+            shift = us.bit_length() - SUB_BUCKET_BITS
+            index = _SUB_BUCKETS + (shift - 1) * _HALF + (us >> shift) - _HALF if shift <= _MAX_SHIFT else _N_BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+
+    def time(self):
+        """Context manager recording the duration of its block"""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Upper bound (seconds) of the bucket holding the q-quantile, 0 if empty"""
+        counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if count and seen >= rank:
+                return _bucket_bounds(index)[1] / 1e6
+        return _bucket_bounds(_N_BUCKETS - 1)[1] / 1e6
+
+    def buckets(self):
+        """(upper bound in seconds, count) of every non-empty bucket"""
+        return [(_bucket_bounds(index)[1] / 1e6, count) for index, count in enumerate(list(self.counts)) if count]
+
+    def samples(self, name, labels):
+        counts = list(self.counts)
+        cumulative = []
+        seen = 0
+        bound = 0
+        for index, count in enumerate(counts):
+            high = _bucket_bounds(index)[1]
+            while bound < len(EXPORT_BOUNDS_US) and EXPORT_BOUNDS_US[bound] < high:
+                cumulative.append(seen)
+                bound += 1
+            seen += count
+        cumulative += [seen] * (len(EXPORT_BOUNDS_US) - len(cumulative))
+        samples = [
+            (name + "_bucket", labels + (("le", repr(upper / 1e6)),), value)
+            for upper, value in zip(EXPORT_BOUNDS_US, cumulative)
+        ]
+        samples.append((name + "_bucket", labels + (("le", "+Inf"),), seen))
+        samples.append((name + "_sum", labels, self.total))
+        samples.append((name + "_count", labels, seen))
+        return samples
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.record(time.perf_counter() - self.started)
+
+class Callback:
+    """Gauge or counter read from fn() at scrape time; costs nothing between scrapes"""
+    __slots__ = ('fn', 'kind')
+
+    def __init__(self, fn, kind="gauge"):
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self, name, labels):
+        return [(name, labels, self.fn())]
+
+class MetricsRegistry:
+    """
+    Named metrics rendered in the Prometheus text exposition format.
+
+    Metrics are registered once by name (counters include the _total
+    suffix) and optional labels; registering a
+    name again returns the existing metric (callbacks are replaced, so a new
+    pipeline can take over its queue gauges).
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, help, labels, factory, replace=False):
+        labels = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.setdefault(name, {"help": help, "metrics": {}})
+            metrics = family["metrics"]
+            if replace or labels not in metrics:
+                metrics[labels] = factory()
+            return metrics[labels]
+
+    def counter(self, name, help, labels=None):
+        return self._register(name, help, labels, Counter)
+
+    def histogram(self, name, help, labels=None):
+        return self._register(name, help, labels, Histogram)
+
+    def callback(self, name, help, fn, kind="gauge", labels=None):
+        return self._register(name, help, labels, lambda: Callback(fn, kind), replace=True)
+
+    def render(self):
+        with self._lock:
+            families = [(name, family["help"], list(family["metrics"].items()))
+                        for name, family in sorted(self._families.items())]
+        lines = []
+        for name, help, metrics in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {metrics[0][1].kind}")
+            for labels, metric in metrics:
+                try:
+                    samples = metric.samples(name, labels)
+                except Exception as e:
+                    print(f"Error collecting metric {name}: {e}")
+                    continue
+                for sample_name, sample_labels, value in samples:
+                    lines.append(f"{sample_name}{_format_labels(sample_labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+class DetectorMetrics:
+    """The detector's hot-path counters and latency histograms"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.packets = r.counter("ics_packets_total", "IP packets fed to the flow table")
+        self.windows_scored = r.counter("ics_windows_scored_total", "Flow windows scored by the model")
+        self.anomalies = r.counter("ics_anomalies_total", "Flow windows scored as anomalous")
+        # Per packet batch: header extraction plus flow table updates in the
+        # pipeline's feature worker, flow table updates in a shard
+        self.extract_seconds = {
+            stage: r.histogram("ics_extract_seconds", "Time to feed one packet batch into the flow table",
+                               {"stage": stage})
+            for stage in ("pipeline", "shard")
+        }
+        self.detect_seconds = r.histogram("ics_detect_seconds", "Time to score one batch of windows")
+        self.queue_seconds = r.histogram(
+            "ics_feature_queue_seconds", "Time a flow window waited between expiry and scoring"
+        )
+        self.sink_seconds = {
+            sink: r.histogram("ics_sink_seconds", "Time to hand one result to a sink", {"sink": sink})
+            for sink in ("mqtt", "elasticsearch")
+        }
+        self.mqtt_publish_seconds = r.histogram("ics_mqtt_publish_seconds", "MQTT publish call latency")
+        self.es_bulk_seconds = r.histogram("ics_es_bulk_seconds", "Elasticsearch bulk request latency")
+
+    def scored(self, is_anomaly):
+        self.windows_scored.inc(len(is_anomaly))
+        self.anomalies.inc(int(is_anomaly.sum()))
+
+    def track(self, name, help, fn, kind="gauge", **labels):
+        """Register a scrape-time callback, e.g. a queue depth or drop counter"""
+        self.registry.callback(name, help, fn, kind, labels)
+
+    def render(self):
+        return self.registry.render()
+
+class MetricsServer:
+    """
+    Serve a registry at GET /metrics from a daemon thread. The text is only
+    rendered when a scrape arrives.
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9108):
+        render = registry.render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
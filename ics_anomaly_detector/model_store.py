@@ -0,0 +1,63 @@
+import os
+from datetime import datetime
+
+import joblib
+import numpy as np
+import sklearn
+
+MODEL_FORMAT = "ics-anomaly-model"
+MODEL_FORMAT_VERSION = 1
+
+def feature_statistics(X):
+    """Per-feature training statistics stored alongside the model"""
+    # Accumulate in float64 without copying large float32 training samples
+    X = np.asarray(X)
+    return {
+        "count": int(X.shape[0]),
+        "mean": X.mean(axis=0, dtype=np.float64),
+        "std": X.std(axis=0, dtype=np.float64),
+        "min": X.min(axis=0).astype(np.float64),
+        "max": X.max(axis=0).astype(np.float64)
+    }
+
+def save_model(path, model, feature_names, feature_stats=None):
+    """
+    Write a fitted model with its feature schema and training statistics.
+    The file is an uncompressed joblib pickle, replaced atomically.
+    """
+    bundle = {
+        "format": MODEL_FORMAT,
+        "version": MODEL_FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "sklearn_version": sklearn.__version__,
+        "feature_names": list(feature_names),
+        "feature_stats": feature_stats,
+        "model": model
+    }
+    tmp_path = f"{path}.tmp"
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+
+def load_model(path, expected_features=None):
+    """
+    Load a bundle written by save_model.
+    Raises ValueError for unknown formats or a mismatched feature schema.
+
+    The model is loaded into private memory: scikit-learn's trees copy their
+    node arrays when unpickled, so mapping the file would not be shared.
+    Each shard worker loads its own copy.
+    """
+    bundle = joblib.load(path)
+    if not isinstance(bundle, dict) or bundle.get("format") != MODEL_FORMAT:
+        raise ValueError(f"{path} is not an ICS anomaly model")
+    if bundle.get("version") != MODEL_FORMAT_VERSION:
+        raise ValueError(
+            f"{path} uses model format version {bundle.get('version')}, "
+            f"expected {MODEL_FORMAT_VERSION}"
+        )
+    if expected_features is not None and list(bundle["feature_names"]) != list(expected_features):
+        raise ValueError(f"{path} was trained on a different feature schema")
+    if bundle.get("sklearn_version") != sklearn.__version__:
+        print(f"Warning: {path} was saved with scikit-learn {bundle.get('sklearn_version')}, "
+              f"running {sklearn.__version__}")
+    return bundle
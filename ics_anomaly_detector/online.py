@@ -0,0 +1,228 @@
+from collections import deque
+
+import numpy as np
+
+class HalfSpaceTrees:
+    """
+    Streaming Half-Space Trees anomaly detector (Tan, Ting & Liu, 2011).
+
+    Each tree splits a randomly perturbed copy of the feature space in half
+    at every level, independent of the data. Trees only hold two mass
+    profiles: `r`, the per-node counts of the previous window, used for
+    scoring, and `l`, the counts of the window being filled. Every
+    window_size samples `l` replaces `r`, so the model follows gradual
+    drift with memory fixed by n_trees * 2^height.
+
+    The interface mirrors IsolationForest: decision_function is negative
+    for anomalies. score_partial scores a batch and then learns from it.
+    Features are log-scaled before splitting because flow counters are
+    heavy-tailed.
+    """
+
+    def __init__(self, n_trees=25, height=8, window_size=256, contamination=0.1,
+                 size_limit=0.1, drift_history=100, random_state=None):
+        self.n_trees = n_trees
+        self.height = height
+        self.window_size = window_size
+        self.contamination = contamination
+        self.size_limit = size_limit
+        self.drift_history = drift_history
+        self.random_state = random_state
+        self.chunk_size = 65536
+        self.fitted_ = False
+
+    def _transform(self, X):
+        X = np.log1p(np.maximum(np.asarray(X, dtype=np.float64), 0.0))
+        return (X - self.low_) / self.span_
+
+    def _build_trees(self, n_features, rng):
+        n_internal = 2 ** self.height - 1
+        self.split_dim_ = np.empty((self.n_trees, n_internal), dtype=np.intp)
+        self.split_value_ = np.empty((self.n_trees, n_internal), dtype=np.float64)
+        for t in range(self.n_trees):
+            # Random work space around a point in [0, 1]^d, wide enough to cover it
+            s = rng.random(n_features)
+            half = np.maximum(s, 1.0 - s)
+            lows = np.empty((n_internal, n_features))
+            highs = np.empty((n_internal, n_features))
+            lows[0], highs[0] = s - half, s + half
+            for node in range(n_internal):
+                dim = rng.integers(n_features)
+                mid = (lows[node, dim] + highs[node, dim]) / 2
+                self.split_dim_[t, node] = dim
+                self.split_value_[t, node] = mid
+                left, right = 2 * node + 1, 2 * node + 2
+                if right < n_internal:
+                    lows[left], highs[left] = lows[node], highs[node]
+                    lows[right], highs[right] = lows[node], highs[node]
+                    highs[left, dim] = mid
+                    lows[right, dim] = mid
+
+    def fit(self, X):
+        """Fix the feature scaling and use X as the first reference window"""
+        rng = np.random.default_rng(self.random_state)
+        raw = np.log1p(np.maximum(np.asarray(X, dtype=np.float64), 0.0))
+        self.low_ = raw.min(axis=0)
+        span = raw.max(axis=0) - self.low_
+        self.span_ = np.where(span > 0, span, 1.0)
+        n_features = raw.shape[1]
+        self._build_trees(n_features, rng)
+
+        n_nodes = 2 ** (self.height + 1) - 1
+        self.r_mass_ = np.zeros((self.n_trees, n_nodes))
+        self.l_mass_ = np.zeros((self.n_trees, n_nodes))
+        self._window_count = 0
+        self._window_scores = np.empty(self.window_size)
+        self._window_flagged = 0
+        self._window_out_of_range = 0
+        self._l_sum = np.zeros(n_features)
+        self._l_sq_sum = np.zeros(n_features)
+
+        Xs = self._transform(X)
+        for start in range(0, len(Xs), self.chunk_size):
+            self.r_mass_ += self._mass(self._paths(Xs[start:start + self.chunk_size]))
+        self.r_mass_ /= len(Xs)
+        self._ref_mean = Xs.mean(axis=0)
+        self._ref_std = Xs.std(axis=0)
+        self.threshold_ = float(np.quantile(self._scores(Xs), self.contamination))
+
+        self.samples_seen = 0
+        self.windows_completed = 0
+        self.drift = deque(maxlen=self.drift_history)
+        self.fitted_ = True
+        return self
+
+    def _paths(self, Xs):
+        """Node index at every depth for every tree and sample: (height + 1, n_trees, n)"""
+        n = len(Xs)
+        trees = np.arange(self.n_trees)[:, None]
+        samples = np.arange(n)[None, :]
+        paths = np.zeros((self.height + 1, self.n_trees, n), dtype=np.intp)
+        node = paths[0]
+        for depth in range(self.height):
+            dims = self.split_dim_[trees, node]
+            right = Xs[samples, dims] > self.split_value_[trees, node]
+            node = 2 * node + 1 + right
+            paths[depth + 1] = node
+        return paths
+
+    def _mass(self, paths):
+        """Per-node visit counts for a batch of paths"""
+        n_nodes = self.l_mass_.shape[1]
+        flat = paths + (np.arange(self.n_trees) * n_nodes)[None, :, None]
+        counts = np.bincount(flat.ravel(), minlength=self.n_trees * n_nodes)
+        return counts.reshape(self.n_trees, n_nodes)
+
+    def _score_paths(self, paths):
+        """Mass score in [0, 1]; low values are anomalous"""
+        trees = np.arange(self.n_trees)[None, :, None]
+        mass = self.r_mass_[trees, paths]
+        # Stop at the first node whose reference mass is below size_limit
+        sparse = mass < self.size_limit
+        depth = np.where(sparse.any(axis=0), sparse.argmax(axis=0), self.height)
+        terminal = np.take_along_axis(mass, depth[None], axis=0)[0]
+        per_tree = terminal * np.exp2(depth)
+        return per_tree.sum(axis=0) / (self.n_trees * 2 ** self.height)
+
+    def _scores(self, Xs):
+        # Paths take (height + 1) * n_trees indices per row, so score in chunks
+        return np.concatenate([
+            self._score_paths(self._paths(Xs[start:start + self.chunk_size]))
+            for start in range(0, len(Xs), self.chunk_size)
+        ]) if len(Xs) else np.empty(0)
+
+    def _check_fitted(self):
+        if not self.fitted_:
+            raise ValueError("HalfSpaceTrees is not fitted yet; call fit first")
+
+    def decision_function(self, X):
+        """Score without learning; negative values are anomalous"""
+        self._check_fitted()
+        return self._scores(self._transform(X)) - self.threshold_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def score_partial(self, X):
+        """Score a batch against the reference window, then learn from it"""
+        self._check_fitted()
+        Xs = self._transform(X)
+        out = np.empty(len(Xs))
+        start = 0
+        while start < len(Xs):
+            take = min(len(Xs) - start, self.window_size - self._window_count)
+            segment = Xs[start:start + take]
+            paths = self._paths(segment)
+            scores = self._score_paths(paths)
+            out[start:start + take] = scores - self.threshold_
+            self._learn(segment, paths, scores)
+            start += take
+        return out
+
+    def _learn(self, Xs, paths, scores):
+        count = self._window_count
+        self.l_mass_ += self._mass(paths)
+        self._window_scores[count:count + len(scores)] = scores
+        self._window_flagged += int((scores < self.threshold_).sum())
+        self._window_out_of_range += int(((Xs < 0) | (Xs > 1)).any(axis=1).sum())
+        self._l_sum += Xs.sum(axis=0)
+        self._l_sq_sum += (Xs * Xs).sum(axis=0)
+        self._window_count += len(Xs)
+        self.samples_seen += len(Xs)
+        if self._window_count >= self.window_size:
+            self._rotate()
+
+    def _rotate(self):
+        n = self._window_count
+        latest = self.l_mass_ / n
+        leaves = slice(2 ** self.height - 1, None)
+        # Total variation distance between leaf mass distributions, averaged over trees
+        mass_shift = 0.5 * np.abs(latest[:, leaves] - self.r_mass_[:, leaves]).sum(axis=1).mean()
+        mean = self._l_sum / n
+        std = np.sqrt(np.maximum(self._l_sq_sum / n - mean * mean, 0.0))
+        reference_std = np.where(self._ref_std > 0, self._ref_std, 1.0)
+        scores = self._window_scores[:n]
+
+        self.drift.append({
+            "window": self.windows_completed,
+            "samples_seen": self.samples_seen,
+            "mass_shift": float(mass_shift),
+            "anomaly_rate": self._window_flagged / n,
+            "mean_score": float(scores.mean()),
+            "out_of_range_rate": self._window_out_of_range / n,
+            "feature_shift": ((mean - self._ref_mean) / reference_std).tolist()
+        })
+
+        self.r_mass_ = latest
+        self.l_mass_ = np.zeros_like(self.l_mass_)
+        self.threshold_ = float(np.quantile(scores, self.contamination))
+        self._ref_mean, self._ref_std = mean, std
+        self._window_count = 0
+        self._window_flagged = 0
+        self._window_out_of_range = 0
+        self._l_sum[:] = 0
+        self._l_sq_sum[:] = 0
+        self.windows_completed += 1
+
+    def drift_stats(self, feature_names=None):
+        """
+        Concept-drift summary: the latest completed window and the mean mass
+        shift over the retained history. feature_shift is the change of each
+        feature's mean in reference standard deviations (log-scaled space).
+        """
+        self._check_fitted()
+        stats = {
+            "samples_seen": self.samples_seen,
+            "windows_completed": self.windows_completed,
+            "window_fill": self._window_count / self.window_size,
+            "threshold": float(self.threshold_),
+            "latest": None,
+            "mean_mass_shift": None
+        }
+        if self.drift:
+            latest = dict(self.drift[-1])
+            if feature_names is not None:
+                latest["feature_shift"] = dict(zip(feature_names, latest["feature_shift"]))
+            stats["latest"] = latest
+            stats["mean_mass_shift"] = float(np.mean([w["mass_shift"] for w in self.drift]))
+        return stats
@@ -0,0 +1,182 @@
+import mmap
+import struct
+
+from ics_anomaly_detector.flows import PacketHeader
+from ics_anomaly_detector.protocols import PORT_PARSERS
+
+# Classic libpcap magic numbers (pcapng is not supported)
+PCAP_MAGIC_USEC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+PCAPNG_MAGIC = 0x0a0d0d0a
+
+# Link-layer header types
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 14, 101)
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8, 0x9100)
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+
+_u16 = struct.Struct('!H').unpack_from
+_ipv4 = struct.Struct('!BxHxxxxxBxxII').unpack_from  # ver/ihl, total length, proto, src, dst
+_tcp = struct.Struct('!HHxxxxxxxxBBH').unpack_from   # sport, dport, data offset, flags, window
+_ports = struct.Struct('!HH').unpack_from
+
+class PcapReader:
+    """
+    Header-only reader for classic pcap files.
+
+    The file is memory-mapped and Ethernet/IP/TCP/UDP fields are read at fixed
+    offsets with struct, so no per-packet objects are created beyond the
+    PacketHeader tuple. Modbus/DNP3/S7 payloads are parsed in place from the
+    map as well. Non-IP frames are skipped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty")
+        if len(self._map) < 24:
+            self.close()
+            raise ValueError(f"{path} is too short to be a pcap file")
+
+        magic = struct.unpack_from('<I', self._map, 0)[0]
+        if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            endian = '<'
+        elif struct.unpack_from('>I', self._map, 0)[0] in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            endian = '>'
+            magic = struct.unpack_from('>I', self._map, 0)[0]
+        else:
+            self.close()
+            if magic == PCAPNG_MAGIC:
+                raise ValueError(f"{path} is pcapng; convert it with 'editcap -F pcap'")
+            raise ValueError(f"{path} is not a pcap file")
+
+        self._record = struct.Struct(endian + 'IIII').unpack_from
+        self.ts_divisor = 1e9 if magic == PCAP_MAGIC_NSEC else 1e6
+        self.snaplen, self.linktype = struct.unpack_from(endian + 'II', self._map, 16)
+
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _network_offset(self, buf, offset, caplen):
+        """Offset of the IP header and its version (4/6), or (None, None) for non-IP frames"""
+        linktype = self.linktype
+        if linktype == LINKTYPE_ETHERNET:
+            if caplen < 14:
+                return None, None
+            ethertype = _u16(buf, offset + 12)[0]
+            pos = offset + 14
+            while ethertype in ETHERTYPE_VLAN and pos + 4 <= offset + caplen:
+                ethertype = _u16(buf, pos + 2)[0]
+                pos += 4
+        elif linktype == LINKTYPE_LINUX_SLL:
+            if caplen < 16:
+                return None, None
+            ethertype = _u16(buf, offset + 14)[0]
+            pos = offset + 16
+        elif linktype == LINKTYPE_LINUX_SLL2:
+            if caplen < 20:
+                return None, None
+            ethertype = _u16(buf, offset)[0]
+            pos = offset + 20
+        elif linktype in LINKTYPE_RAW:
+            if caplen < 1:
+                return None, None
+            version = buf[offset] >> 4
+            return offset, version
+        else:
+            return None, None
+
+        if ethertype == ETHERTYPE_IPV4:
+            return pos, 4
+        if ethertype == ETHERTYPE_IPV6:
+            return pos, 6
+        return None, None
+
+    def __iter__(self):
+        buf = self._map
+        record = self._record
+        divisor = self.ts_divisor
+        parsers = PORT_PARSERS
+        size = len(buf)
+        offset = 24
+
+        while offset + 16 <= size:
+            ts_sec, ts_frac, caplen, wirelen = record(buf, offset)
+            offset += 16
+            if offset + caplen > size:
+                break  # truncated capture
+            frame = offset
+            offset += caplen
+            end = frame + caplen
+
+            ip, version = self._network_offset(buf, frame, caplen)
+            if ip is None:
+                continue
+            if version == 4:
+                if ip + 20 > end:
+                    continue
+                ver_ihl, total_length, proto, src, dst = _ipv4(buf, ip)
+                l4 = ip + (ver_ihl & 0x0f) * 4
+                ip_end = ip + total_length
+            elif version == 6:
+                if ip + 40 > end:
+                    continue
+                ip_end = ip + 40 + _u16(buf, ip + 4)[0]
+                proto = buf[ip + 6]
+                src = buf[ip + 8:ip + 24]
+                dst = buf[ip + 24:ip + 40]
+                l4 = ip + 40
+            else:
+                continue
+
+            sport = dport = flags = window = 0
+            if proto == IPPROTO_TCP and l4 + 20 <= end:
+                sport, dport, data_offset, flags, window = _tcp(buf, l4)
+                data = l4 + (data_offset >> 4) * 4
+            elif proto == IPPROTO_UDP and l4 + 8 <= end:
+                sport, dport = _ports(buf, l4)
+                data = l4 + 8
+            else:
+                data = l4
+            payload = ip_end - data
+
+            # Industrial protocol payloads are parsed straight from the map
+            ics = None
+            if payload > 0:
+                parser = parsers.get(dport)
+                if parser is not None:
+                    ics = parser(buf, data, min(ip_end, end), True)
+                else:
+                    parser = parsers.get(sport)
+                    if parser is not None:
+                        ics = parser(buf, data, min(ip_end, end), False)
+
+            yield PacketHeader(
+                ts_sec + ts_frac / divisor, src, dst, sport, dport, proto,
+                wirelen, flags, window, payload if payload > 0 else 0, ics
+            )
+
+def iter_pcap_headers(path):
+    """Yield a PacketHeader for every IP packet in a pcap file"""
+    with PcapReader(path) as reader:
+        yield from reader
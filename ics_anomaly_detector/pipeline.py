@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from ics_anomaly_detector.features import FeatureRing
+from ics_anomaly_detector.scoring import score_batch
+
+class StageQueue:
+    """
+    Bounded FIFO between pipeline stages.
+
+    `put` never blocks: when the queue is full the item is dropped and
+    counted, so a slow downstream stage can only lose its own backlog and
+    never stalls the stage feeding it.
+    """
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self.enqueued = 0
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._cond:
+            if self._closed or len(self._items) >= self.maxsize:
+                self.dropped += 1
+                return False
+            self._items.append(item)
+            self.enqueued += 1
+            self._cond.notify()
+            return True
+
+    def get_many(self, max_items, timeout=None):
+        """
+        Wait up to timeout for at least one item and return up to max_items.
+        Returns an empty list on timeout or once the queue is closed and drained.
+        """
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            items = self._items
+            count = min(max_items, len(items))
+            return [items.popleft() for _ in range(count)]
+
+    @property
+    def finished(self):
+        return self._closed and not self._items
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            "depth": len(self._items),
+            "capacity": self.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped
+        }
+
+class DetectionPipeline:
+    """
+    Staged detection pipeline decoupling capture from analysis.
+
+    capture callback -> ring buffer -> feature worker (flow table)
+    -> feature ring -> scorer (micro-batched model) -> one queue and thread per sink
+
+    Every hand-off drops rather than blocks when full, so a slow sink
+    (Elasticsearch, MQTT) loses results from its own queue instead of
+    delaying the capture thread. Feature vectors travel as rows of
+    preallocated arrays (FeatureRing, then the scorer's batch buffer) and
+    sinks receive ScoredWindow views of the scored block, so no per-flow
+    dicts are built unless a sink asks for one.
+
+    The feature worker owns the flow table; scale-out across cores is done
+    by sharding whole pipelines rather than sharing one table.
+
+    With metrics (a DetectorMetrics), the stages count packets and scored
+    windows and record per-batch extraction latency, scoring latency and
+    feature-queue wait times; queue depths and drops are read from the
+    queues at scrape time.
+    """
+
+    def __init__(self, detector, sinks, capture_buffer=65536, feature_batch=256,
+                 score_batch_size=256, score_timeout=0.5, sink_buffer=10000,
+                 expire_interval=1.0, metrics=None):
+        self.detector = detector
+        self.metrics = metrics
+        self.feature_batch = feature_batch
+        self.score_batch_size = score_batch_size
+        self.score_timeout = score_timeout
+        self.expire_interval = expire_interval
+
+        self.ring = StageQueue("capture", capture_buffer)
+        self.windows = FeatureRing("features", max(sink_buffer, score_batch_size * 4),
+                                   len(detector.feature_names))
+        self.sink_queues = {name: StageQueue(name, sink_buffer) for name in sinks}
+        self.sinks = sinks
+        self.windows_scored = 0
+        self._threads = []
+        if metrics is not None:
+            self._track_queues(metrics)
+
+    def submit(self, packet):
+        """Capture-thread entry point: enqueue only, never block"""
+        return self.ring.put(packet)
+
+    def start(self):
+        stages = [("feature-worker", self._feature_worker), ("scorer", self._scorer)]
+        stages += [(f"sink-{name}", self._sink_worker(name)) for name in self.sinks]
+        for name, target in stages:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Close the ring buffer and let every stage drain in order"""
+        self.ring.close()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        stats = {queue.name: queue.stats() for queue in (self.ring, self.windows)}
+        for name, queue in self.sink_queues.items():
+            stats[f"sink_{name}"] = queue.stats()
+        stats["windows_scored"] = self.windows_scored
+        return stats
+
+    def _track_queues(self, metrics):
+        queues = [("capture", self.ring), ("features", self.windows)]
+        queues += [(f"sink_{name}", queue) for name, queue in self.sink_queues.items()]
+        for name, queue in queues:
+            metrics.track("ics_queue_depth", "Items waiting in a pipeline queue", queue.__len__, queue=name)
+            metrics.track("ics_queue_dropped_total", "Items dropped by a full pipeline queue",
+                          lambda queue=queue: queue.dropped, "counter", queue=name)
+
+    def _feature_worker(self):
+        detector = self.detector
+        flow_table = detector.flow_table
+        metrics = self.metrics
+        packets = metrics.packets if metrics is not None else None
+        extract_seconds = metrics.extract_seconds["pipeline"] if metrics is not None else None
+        last_expire = time.time()
+        try:
+            while not self.ring.finished:
+                expired = []
+                batch = self.ring.get_many(self.feature_batch, timeout=self.expire_interval)
+                started = time.perf_counter()
+                for packet in batch:
+                    header = detector.packet_header(packet)
+                    if header is not None:
+                        expired.extend(flow_table.update(header))
+                if batch and metrics is not None:
+                    extract_seconds.record(time.perf_counter() - started)
+                    packets.inc(len(batch))
+                now = time.time()
+                if now - last_expire >= self.expire_interval:
+                    # Quiet links still need idle flows expired on wall-clock time
+                    expired.extend(flow_table.expire(now))
+                    last_expire = now
+                for flow in expired:
+                    self.windows.put_flow(flow)
+            for flow in flow_table.flush():
+                self.windows.put_flow(flow)
+        finally:
+            self.windows.close()
+
+    def _scorer(self):
+        detector = self.detector
+        metrics = self.metrics
+        X = np.zeros((self.score_batch_size, len(detector.feature_names)), dtype=np.float64)
+        queued_at = np.zeros(self.score_batch_size, dtype=np.float64)
+        try:
+            while not self.windows.finished:
+                count = self.windows.take(X, queued_at, timeout=self.score_timeout)
+                if not count:
+                    continue
+                started = time.perf_counter()
+                batch = score_batch(detector.model, detector.feature_names, X[:count], queued_at[:count])
+                if metrics is not None:
+                    metrics.detect_seconds.record(time.perf_counter() - started)
+                    metrics.scored(batch.is_anomaly)
+                    for wait in (started - batch.queued_at).tolist():
+                        metrics.queue_seconds.record(wait)
+                self.windows_scored += count
+                results = list(batch)
+                for queue in self.sink_queues.values():
+                    for result in results:
+                        queue.put(result)
+        finally:
+            for queue in self.sink_queues.values():
+                queue.close()
+
+    def _sink_worker(self, name):
+        queue = self.sink_queues[name]
+        sink = self.sinks[name]
+
+        def run():
+            while not queue.finished:
+                for result in queue.get_many(self.score_batch_size, timeout=self.score_timeout):
+                    try:
+                        sink(result)
+                    except Exception as e:
+                        print(f"Error in {name} sink: {e}")
+        return run
@@ -0,0 +1,225 @@
+import struct
+from collections import namedtuple
+
+MODBUS_PORT = 502
+DNP3_PORT = 20000
+S7_PORT = 102
+
+# Per-packet summary of the industrial protocol PDUs found in one payload.
+# functions is a bitmask of the request function codes; unit is the last
+# Modbus unit id / DNP3 outstation address (-1 if none); register_low/high
+# bound the Modbus addresses touched by requests (-1 if none).
+ProtocolSummary = namedtuple(
+    "ProtocolSummary",
+    "requests responses reads writes controls exceptions functions unit register_low register_high"
+)
+
+# Summaries are built with tuple.__new__ directly: the namedtuple constructor
+# costs more than parsing a typical PDU
+_new = tuple.__new__
+
+# Per-flow protocol features appended to the flow feature vector
+PROTOCOL_FEATURE_NAMES = [
+    'ics_request_count',
+    'ics_response_count',
+    'ics_read_count',
+    'ics_write_count',
+    'ics_control_count',
+    'ics_function_count',
+    'ics_write_read_ratio',
+    'ics_exception_rate',
+    'ics_unit_count',
+    'ics_register_span',
+]
+
+# Function classes; lookup tables map a function code byte to its class
+CLASS_OTHER = 0
+CLASS_READ = 1
+CLASS_WRITE = 2
+CLASS_CONTROL = 3
+
+def _class_table(reads=(), writes=(), controls=()):
+    table = bytearray(256)
+    for codes, cls in ((reads, CLASS_READ), (writes, CLASS_WRITE), (controls, CLASS_CONTROL)):
+        for code in codes:
+            table[code] = cls
+    return bytes(table)
+
+MODBUS_CLASSES = _class_table(
+    reads=(1, 2, 3, 4, 20, 24),
+    writes=(5, 6, 15, 16, 21, 22, 23),
+    controls=(7, 8, 11, 12, 17, 43)  # diagnostics and identification
+)
+DNP3_CLASSES = _class_table(
+    reads=(0x01,),
+    writes=(0x02,),
+    controls=range(0x03, 0x16)  # select/operate, freeze, restart, start/stop, unsolicited
+)
+S7_CLASSES = _class_table(
+    reads=(0x04, 0x1d, 0x1e, 0x1f),  # read var, upload
+    writes=(0x05, 0x1a, 0x1b, 0x1c),  # write var, download
+    controls=(0x28, 0x29)  # PI service (start/stop program), PLC stop
+)
+
+# Functions that carry a Modbus (address, quantity) request
+_MODBUS_RANGE_FUNCTIONS = frozenset((1, 2, 3, 4, 15, 16, 23))
+_MODBUS_SINGLE_FUNCTIONS = frozenset((5, 6, 22))
+
+_mbap = struct.Struct('!2xHHBB').unpack_from        # protocol id, length, unit id, function
+_u16 = struct.Struct('!H').unpack_from
+_u16_pair = struct.Struct('!HH').unpack_from
+_dnp3_link = struct.Struct('<HBxHH').unpack_from    # start bytes, length, destination, source
+
+def parse_modbus(buf, start, end, to_server):
+    """
+    Summarize the Modbus/TCP ADUs in buf[start:end]. Requests (to_server)
+    are classified by function code and their register range recorded;
+    responses are checked for the exception bit. Fields are read in place
+    with struct, so buf may be bytes, a memoryview or an mmap.
+    """
+    requests = responses = reads = writes = controls = exceptions = functions = 0
+    unit = low = high = -1
+    pos = start
+    while pos + 8 <= end:
+        protocol, length, unit_id, function = _mbap(buf, pos)
+        if protocol != 0 or length < 2 or length > 254:
+            break
+        unit = unit_id
+        if to_server:
+            requests += 1
+            functions |= 1 << function
+            cls = MODBUS_CLASSES[function]
+            if cls == CLASS_READ:
+                reads += 1
+            elif cls == CLASS_WRITE:
+                writes += 1
+            elif cls == CLASS_CONTROL:
+                controls += 1
+            if function in _MODBUS_RANGE_FUNCTIONS and pos + 12 <= end:
+                address, quantity = _u16_pair(buf, pos + 8)
+                last = address + max(quantity, 1) - 1
+            elif function in _MODBUS_SINGLE_FUNCTIONS and pos + 10 <= end:
+                address = last = _u16(buf, pos + 8)[0]
+            else:
+                address = -1
+            if address >= 0:
+                if low < 0 or address < low:
+                    low = address
+                if last > high:
+                    high = last
+        else:
+            responses += 1
+            if function & 0x80:
+                exceptions += 1
+        pos += 6 + length
+    if not (requests or responses):
+        return None
+    return _new(ProtocolSummary, (requests, responses, reads, writes, controls, exceptions, functions, unit, low, high))
+
+def parse_dnp3(buf, start, end, to_server=True):
+    """
+    Summarize the DNP3 link frames in buf[start:end]. The application
+    function code is read from the first transport segment of each frame;
+    responses with IIN2 error bits (unknown function, object or parameter)
+    count as exceptions. Direction comes from the function code, so
+    to_server is ignored.
+    """
+    requests = responses = reads = writes = controls = exceptions = functions = 0
+    unit = -1
+    pos = start
+    while pos + 10 <= end:
+        start_bytes, length, destination, source = _dnp3_link(buf, pos)
+        if start_bytes != 0x6405 or length < 5:
+            break
+        user_length = length - 5
+        # transport header, application control, function code
+        if user_length >= 3 and pos + 13 <= end and buf[pos + 10] & 0x40:
+            function = buf[pos + 12]
+            if function >= 0x81:
+                responses += 1
+                unit = source
+                if user_length >= 5 and pos + 15 <= end and buf[pos + 14] & 0x07:
+                    exceptions += 1
+            else:
+                requests += 1
+                unit = destination
+                functions |= 1 << function
+                cls = DNP3_CLASSES[function]
+                if cls == CLASS_READ:
+                    reads += 1
+                elif cls == CLASS_WRITE:
+                    writes += 1
+                elif cls == CLASS_CONTROL:
+                    controls += 1
+        # header CRC plus a CRC after every 16 bytes of user data
+        pos += 10 + user_length + 2 * ((user_length + 15) // 16)
+    if not (requests or responses):
+        return None
+    return _new(ProtocolSummary, (requests, responses, reads, writes, controls, exceptions, functions, unit, -1, -1))
+
+def parse_s7(buf, start, end, to_server=True):
+    """
+    Summarize the S7comm PDUs (TPKT + COTP data) in buf[start:end]. Jobs
+    are classified by the parameter function code; ack-data with a non-zero
+    error class counts as an exception. Userdata PDUs are requests of
+    class other. Direction comes from the PDU type, so to_server is ignored.
+    """
+    requests = responses = reads = writes = controls = exceptions = functions = 0
+    pos = start
+    while pos + 7 <= end:
+        if buf[pos] != 3:
+            break
+        length = _u16(buf, pos + 2)[0]
+        if length < 7:
+            break
+        cotp = pos + 4
+        s7 = cotp + 1 + buf[cotp]
+        if s7 + 10 <= end and buf[cotp + 1] == 0xf0 and buf[s7] == 0x32:
+            rosctr = buf[s7 + 1]
+            if rosctr == 1:
+                requests += 1
+                if s7 + 11 <= end:
+                    function = buf[s7 + 10]
+                    functions |= 1 << function
+                    cls = S7_CLASSES[function]
+                    if cls == CLASS_READ:
+                        reads += 1
+                    elif cls == CLASS_WRITE:
+                        writes += 1
+                    elif cls == CLASS_CONTROL:
+                        controls += 1
+            elif rosctr in (2, 3):
+                responses += 1
+                if s7 + 11 <= end and buf[s7 + 10]:
+                    exceptions += 1
+            elif rosctr == 7:
+                requests += 1
+        pos += length
+    if not (requests or responses):
+        return None
+    return _new(ProtocolSummary, (requests, responses, reads, writes, controls, exceptions, functions, -1, -1, -1))
+
+# Parser per service port; every parser takes (buf, start, end, to_server)
+PORT_PARSERS = {
+    MODBUS_PORT: parse_modbus,
+    DNP3_PORT: parse_dnp3,
+    S7_PORT: parse_s7,
+}
+
+def parse_payload(buf, start, end, sport, dport):
+    """
+    Dispatch an application payload to the parser for its service port.
+    Returns a ProtocolSummary, or None for other traffic, empty payloads and
+    payloads that do not parse. Live captures may be truncated by a kernel
+    snaplen; PDUs whose header lies past the captured bytes are not counted
+    (capture.PROTOCOL_SNAPLEN keeps a full ADU).
+    """
+    if end <= start:
+        return None
+    parser = PORT_PARSERS.get(dport)
+    if parser is not None:
+        return parser(buf, start, end, True)
+    parser = PORT_PARSERS.get(sport)
+    if parser is not None:
+        return parser(buf, start, end, False)
+    return None
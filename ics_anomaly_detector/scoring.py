@@ -0,0 +1,114 @@
+from datetime import datetime
+
+import numpy as np
+
+def features_to_array(features_list, feature_names):
+    """Convert feature dicts into an (n, n_features) array in feature_names order"""
+    X = np.empty((len(features_list), len(feature_names)), dtype=np.float64)
+    for i, features in enumerate(features_list):
+        X[i] = [features[name] for name in feature_names]
+    return X
+
+def decision_scores(model, X):
+    """
+    Score rows with one model call; returns (is_anomaly, scores), anomalous
+    below zero. Streaming models (score_partial) also learn from the rows.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X.reshape(1, -1)
+    score = getattr(model, 'score_partial', None) or model.decision_function
+    scores = score(X)
+    return scores < 0, scores
+
+def score_features(model, feature_names, features_list):
+    """Score feature dicts and build result documents; returns (results, is_anomaly)"""
+    is_anomaly, scores = decision_scores(model, features_to_array(features_list, feature_names))
+    timestamp = datetime.now().isoformat()
+    results = [
+        {
+            'timestamp': timestamp,
+            'is_anomaly': bool(anomaly),
+            'anomaly_score': float(score),
+            'features': features
+        }
+        for features, anomaly, score in zip(features_list, is_anomaly, scores)
+    ]
+    return results, is_anomaly
+
+class ScoredWindow:
+    """
+    One scored window: a view of a row of its ScoredBatch. Indexing with
+    the result-dict keys ('timestamp', 'is_anomaly', 'anomaly_score',
+    'features') works, so sinks written for result dicts accept it; the
+    features dict is only built when asked for.
+    """
+    __slots__ = ('batch', 'index')
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def values(self):
+        """Feature vector in batch.feature_names order"""
+        return self.batch.X[self.index]
+
+    @property
+    def queued_at(self):
+        """perf_counter time the window was queued for scoring, if tracked"""
+        queued_at = self.batch.queued_at
+        return None if queued_at is None else float(queued_at[self.index])
+
+    def __getitem__(self, key):
+        if key == 'is_anomaly':
+            return bool(self.batch.is_anomaly[self.index])
+        if key == 'anomaly_score':
+            return float(self.batch.scores[self.index])
+        if key == 'timestamp':
+            return self.batch.timestamp
+        if key == 'features':
+            return dict(zip(self.batch.feature_names, self.values.tolist()))
+        raise KeyError(key)
+
+    def to_dict(self):
+        """The equivalent result dict (for JSON serialization)"""
+        return {
+            'timestamp': self.batch.timestamp,
+            'is_anomaly': self['is_anomaly'],
+            'anomaly_score': self['anomaly_score'],
+            'features': self['features']
+        }
+
+class ScoredBatch:
+    """
+    Scores for a block of feature vectors, kept as arrays end to end: X is
+    (n, n_features), scores and is_anomaly have n entries. Small enough to
+    pickle between processes; iterate it for per-window ScoredWindow views.
+    """
+    __slots__ = ('timestamp', 'feature_names', 'X', 'scores', 'is_anomaly', 'queued_at')
+
+    def __init__(self, timestamp, feature_names, X, scores, is_anomaly, queued_at=None):
+        self.timestamp = timestamp
+        self.feature_names = feature_names
+        self.X = X
+        self.scores = scores
+        self.is_anomaly = is_anomaly
+        self.queued_at = queued_at
+
+    def __len__(self):
+        return len(self.X)
+
+    def __iter__(self):
+        return (ScoredWindow(self, i) for i in range(len(self.X)))
+
+def score_batch(model, feature_names, X, queued_at=None):
+    """
+    Score an (n, n_features) block; returns a ScoredBatch that owns a copy
+    of X, so the caller may reuse its buffer right away.
+    """
+    X = np.array(X, dtype=np.float64)
+    is_anomaly, scores = decision_scores(model, X)
+    if queued_at is not None:
+        queued_at = np.array(queued_at, dtype=np.float64)
+    return ScoredBatch(datetime.now().isoformat(), feature_names, X, scores, is_anomaly, queued_at)
@@ -0,0 +1,288 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from ics_anomaly_detector.features import FeatureBuffer
+from ics_anomaly_detector.flows import FlowTable, flow_key
+from ics_anomaly_detector.model_store import load_model
+from ics_anomaly_detector.scoring import score_batch
+
+def default_workers():
+    """One shard per available core"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Seconds to wait for a shard to take a batch or its stop sentinel, and to
+# exit after it, before it is terminated
+STOP_TIMEOUT = 60.0
+# How often a blocked put checks that its shard is still alive
+PUT_POLL_INTERVAL = 0.5
+
+def _mp_context():
+    # Shards start after the MQTT, bulk writer and metrics threads are running;
+    # forking then would copy locks held by those threads. A forkserver (or
+    # spawned) worker starts from a clean interpreter and is handed the model.
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+def _shard_worker(shard, model, feature_names, flow_config, inbox, outbox,
+                  score_batch_size, expire_interval, timed=False):
+    """
+    Worker process: owns one FlowTable and scores the flows it expires.
+    Expired flows are written into a preallocated FeatureBuffer and scored
+    blocks go back to the parent as ScoredBatch arrays; a final stats dict
+    marks the end of the shard. With timed, the flow table time of each
+    header batch is sent back as a list of seconds ahead of every scored
+    block. model may be a saved model path to load in the worker.
+    """
+    if isinstance(model, str):
+        model = load_model(model, expected_features=feature_names)["model"]
+    flow_table = FlowTable(**flow_config)
+    windows = FeatureBuffer(score_batch_size, len(feature_names))
+    packets = 0
+    scored = 0
+    timings = []
+    last_expire = time.time()
+
+    def send_timings():
+        nonlocal timings
+        if timings:
+            # The queue pickles in a feeder thread, so hand over the list
+            # rather than clearing it
+            outbox.put(timings)
+            timings = []
+
+    def score():
+        nonlocal scored
+        if len(windows):
+            send_timings()
+            outbox.put(score_batch(model, feature_names, windows.rows()))
+            scored += len(windows)
+            windows.clear()
+
+    def add(flows):
+        for flow in flows:
+            windows.add(flow)
+            if windows.full:
+                score()
+
+    while True:
+        try:
+            batch = inbox.get(timeout=expire_interval)
+        except queue.Empty:
+            batch = ()
+        if batch is None:
+            break
+        started = time.perf_counter()
+        for header in batch:
+            expired = flow_table.update(header)
+            if expired:
+                add(expired)
+        if timed and batch:
+            timings.append(time.perf_counter() - started)
+        packets += len(batch)
+        if expire_interval:
+            now = time.time()
+            if now - last_expire >= expire_interval:
+                # Quiet links still need idle flows expired on wall-clock time
+                add(flow_table.expire(now))
+                last_expire = now
+                score()
+
+    add(flow_table.flush())
+    score()
+    send_timings()
+    outbox.put({
+        "shard": shard,
+        "packets": packets,
+        "windows_scored": scored,
+        "evicted": flow_table.evicted
+    })
+
+class ShardedDetector:
+    """
+    Spread flow tracking and scoring over worker processes.
+
+    Packet headers are dispatched by a hash of the direction-independent
+    5-tuple, so both directions of a flow always land on the same shard and
+    every worker keeps private flow state with no locking. Workers are
+    started through a forkserver (spawn where unavailable), never forked from
+    the threaded parent, and each loads its own copy of the fitted model from
+    the saved model file or receives it pickled. They send scored blocks back
+    to the parent as arrays, where a merger thread feeds the detector's sinks
+    one ScoredWindow at a time. An online model keeps learning separately in
+    each shard from the flows that hash to it.
+
+    Headers are shipped in batches of batch_size to amortise IPC cost. With
+    block=False, `submit` drops a batch when its shard's inbox is full
+    instead of stalling the capture thread; blocking puts give up on a shard
+    that has died, counting its batches as dropped. With metrics, the merger counts
+    scored windows and anomalies and records the per-batch flow table time
+    the shards report; scoring latency stays inside the shards.
+    """
+
+    def __init__(self, detector, sinks, workers=None, batch_size=2048, inbox_batches=64,
+                 score_batch_size=1024, expire_interval=None, metrics=None):
+        self.detector = detector
+        self.metrics = metrics
+        self.sinks = sinks
+        self.workers = workers or default_workers()
+        self.batch_size = batch_size
+        self.inbox_batches = inbox_batches
+        self.score_batch_size = score_batch_size
+        self.expire_interval = expire_interval
+
+        self.dispatched = 0
+        self.dropped = 0
+        self.windows_scored = 0
+        self.shard_stats = {}
+
+        self._batches = [[] for _ in range(self.workers)]
+        self._inboxes = []
+        self._processes = []
+        self._outbox = None
+        self._merger = None
+        if metrics is not None:
+            metrics.track("ics_queue_dropped_total", "Items dropped by a full pipeline queue",
+                          lambda: self.dropped, "counter", queue="shard_inbox")
+
+    def start(self):
+        context = _mp_context()
+        # Loading the saved file avoids pickling the model to every worker
+        model = self.detector.model_path or self.detector.model
+        flow_table = self.detector.flow_table
+        flow_config = {
+            "idle_timeout": flow_table.idle_timeout,
+            "active_timeout": flow_table.active_timeout,
+            "max_flows": max(1, flow_table.max_flows // self.workers)
+        }
+        self._outbox = context.Queue(maxsize=self.workers * self.inbox_batches)
+        for shard in range(self.workers):
+            inbox = context.Queue(maxsize=self.inbox_batches)
+            process = context.Process(
+                target=_shard_worker,
+                args=(shard, model, self.detector.feature_names, flow_config,
+                      inbox, self._outbox, self.score_batch_size, self.expire_interval,
+                      self.metrics is not None),
+                name=f"detector-shard-{shard}",
+                daemon=True
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        self._merger = threading.Thread(target=self._merge, name="shard-merger", daemon=True)
+        self._merger.start()
+
+    def submit(self, header, block=True):
+        """Route one PacketHeader to its shard; returns False if it was dropped"""
+        shard = hash(flow_key(header)) % self.workers
+        batch = self._batches[shard]
+        batch.append(header)
+        if len(batch) >= self.batch_size:
+            return self._send(shard, block)
+        return True
+
+    def flush(self, block=True, timeout=None):
+        """Send partially filled batches to their shards"""
+        for shard, batch in enumerate(self._batches):
+            if batch:
+                self._send(shard, block, timeout)
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """
+        Flush pending headers, let every shard drain and wait for its results.
+        Shards that do not take their stop sentinel or exit within timeout
+        seconds are terminated.
+        """
+        self.flush(timeout=timeout)
+        for shard, process in enumerate(self._processes):
+            try:
+                self._put(shard, None, timeout=timeout)
+            except queue.Full:
+                print(f"Detector shard {shard} is not accepting work; terminating it")
+                process.terminate()
+        if self._merger is not None:
+            self._merger.join(timeout)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                print(f"{process.name} did not exit; terminating it")
+                process.terminate()
+                process.join()
+        self._inboxes = []
+        self._processes = []
+        self._merger = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "dispatched": self.dispatched,
+            "dropped": self.dropped,
+            "windows_scored": self.windows_scored,
+            "shards": [self.shard_stats[shard] for shard in sorted(self.shard_stats)]
+        }
+
+    def _put(self, shard, item, block=True, timeout=None):
+        """
+        Put item on a shard's inbox. A blocking put gives up with queue.Full
+        once the shard has died or timeout seconds have passed.
+        """
+        inbox = self._inboxes[shard]
+        if not block:
+            inbox.put(item, block=False)
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                inbox.put(item, timeout=PUT_POLL_INTERVAL)
+                return
+            except queue.Full:
+                if not self._processes[shard].is_alive():
+                    raise
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise
+
+    def _send(self, shard, block, timeout=None):
+        batch = self._batches[shard]
+        self._batches[shard] = []
+        try:
+            self._put(shard, batch, block, timeout)
+        except queue.Full:
+            self.dropped += len(batch)
+            return False
+        self.dispatched += len(batch)
+        return True
+
+    def _merge(self):
+        remaining = self.workers
+        while remaining:
+            try:
+                message = self._outbox.get(timeout=1.0)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self._processes):
+                    print("Detector shards exited without reporting; stopping merge")
+                    return
+                continue
+            if isinstance(message, dict):
+                self.shard_stats[message["shard"]] = message
+                remaining -= 1
+                continue
+            if isinstance(message, list):
+                extract_seconds = self.metrics.extract_seconds["shard"]
+                for seconds in message:
+                    extract_seconds.record(seconds)
+                continue
+            self.windows_scored += len(message)
+            if self.metrics is not None:
+                self.metrics.scored(message.is_anomaly)
+            for result in message:
+                for name, sink in self.sinks.items():
+                    try:
+                        sink(result)
+                    except Exception as e:
+                        print(f"Error in {name} sink: {e}")
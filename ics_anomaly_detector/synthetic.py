@@ -0,0 +1,157 @@
+import heapq
+import random
+import socket
+import struct
+
+# Poll-style ICS sessions: (protocol, server port, poll period range in seconds)
+SESSION_PROFILES = [
+    ('modbus', 502, (0.1, 0.5)),
+    ('dnp3', 20000, (0.5, 2.0)),
+    ('s7', 102, (0.2, 1.0)),
+]
+
+ANOMALY_KINDS = ('scan', 'write_flood', 'oversized_dnp3')
+
+TCP_SYN = 0x02
+TCP_PSH_ACK = 0x18
+
+_ETHERNET = bytes.fromhex('001122334455' '66778899aabb' '0800')
+_ipv4 = struct.Struct('!BBHHHBBH4s4s')
+_tcp = struct.Struct('!HHIIBBHHH')
+
+def tcp_frame(src, dst, sport, dport, flags, payload=b'', window=8192, ident=0):
+    """Ethernet/IPv4/TCP frame; checksums are left zero"""
+    ip = _ipv4.pack(0x45, 0, 40 + len(payload), ident & 0xffff, 0x4000, 64, 6, 0, src, dst)
+    tcp = _tcp.pack(sport, dport, 0, 0, 5 << 4, flags, window, 0, 0)
+    return _ETHERNET + ip + tcp + payload
+
+def modbus_request(transaction, function=3, address=0, count=10, values=b''):
+    if function in (15, 16):
+        pdu = struct.pack('!BHHB', function, address, count, len(values)) + values
+    else:
+        pdu = struct.pack('!BHH', function, address, count)
+    return struct.pack('!HHHB', transaction & 0xffff, 0, len(pdu) + 1, 1) + pdu
+
+def modbus_response(transaction, function=3, count=10):
+    pdu = struct.pack('!BB', function, count * 2) + bytes(count * 2)
+    return struct.pack('!HHHB', transaction & 0xffff, 0, len(pdu) + 1, 1) + pdu
+
+def dnp3_frame(function, destination=1, source=1024, data=b''):
+    """DNP3 link header, transport byte and application header (CRCs zeroed)"""
+    user_data = bytes([0xc0, 0xc0, function]) + data
+    link = struct.pack('<HBBHH', 0x6405, 5 + len(user_data), 0xc4, destination, source) + b'\x00\x00'
+    return link + user_data
+
+def s7_frame(rosctr, function, pdu_reference, data=b''):
+    """TPKT + COTP data + S7comm header and parameter"""
+    param = bytes([function, 1]) + bytes(10)
+    s7 = struct.pack('!BBHHHH', 0x32, rosctr, 0, pdu_reference & 0xffff, len(param), len(data))
+    if rosctr in (2, 3):
+        s7 += b'\x00\x00'  # ack/ack-data carry an error class and code
+    s7 += param + data
+    cotp = b'\x02\xf0\x80'
+    return struct.pack('!BBH', 3, 0, 4 + len(cotp) + len(s7)) + cotp + s7
+
+class _Session:
+    __slots__ = ('protocol', 'client', 'server', 'sport', 'dport', 'period', 'count')
+
+    def __init__(self, protocol, client, server, sport, dport, period):
+        self.protocol = protocol
+        self.client = client
+        self.server = server
+        self.sport = sport
+        self.dport = dport
+        self.period = period
+        self.count = 0
+
+    def exchange(self, rng):
+        """Request and response payloads for the next poll"""
+        n = self.count
+        self.count += 1
+        if self.protocol == 'modbus':
+            registers = rng.choice((10, 10, 20))
+            return modbus_request(n, count=registers), modbus_response(n, count=registers)
+        if self.protocol == 'dnp3':
+            return dnp3_frame(0x01, data=b'\x3c\x02\x06'), dnp3_frame(0x81, data=bytes(rng.randint(20, 40)))
+        return s7_frame(1, 0x04, n), s7_frame(3, 0x04, n, data=bytes(rng.choice((8, 16))))
+
+def _anomaly(kind, rng, start, attacker, plc, ident):
+    """Packets (timestamp, frame) for one injected anomaly"""
+    packets = []
+    if kind == 'scan':
+        # SYNs to many ports of one PLC, one flow each
+        for i, port in enumerate(rng.sample(range(1, 1024), 64)):
+            packets.append((start + i * 0.002, tcp_frame(attacker, plc, 50000 + i, port, TCP_SYN, ident=ident + i)))
+    elif kind == 'write_flood':
+        # Burst of large Modbus multi-register writes on one connection
+        for i in range(200):
+            request = modbus_request(i, function=16, count=100, values=bytes(200))
+            packets.append((start + i * 0.001, tcp_frame(attacker, plc, 51000, 502, TCP_PSH_ACK, request, ident=ident + i)))
+    else:
+        # DNP3 from an unknown station with oversized fragments
+        for i in range(40):
+            request = dnp3_frame(0x02, source=rng.randint(2000, 3000), data=bytes(240))
+            packets.append((start + i * 0.01, tcp_frame(attacker, plc, 52000, 20000, TCP_PSH_ACK, request, ident=ident + i)))
+    return packets
+
+def generate_traffic(n_packets, sessions=200, anomaly_rate=0.001, seed=0, start_time=1700000000.0):
+    """
+    Yield (timestamp, frame, anomalous) for synthetic Modbus/DNP3/S7 traffic
+    in time order. Normal traffic is request/response polling from HMIs to
+    PLCs; after each poll an anomaly (port scan, Modbus write flood or
+    oversized DNP3 from an unknown station) is injected with probability
+    anomaly_rate. Output is deterministic for a given seed.
+    """
+    rng = random.Random(seed)
+    plcs = [socket.inet_aton(f'10.10.1.{i}') for i in range(1, 33)]
+    hmis = [socket.inet_aton(f'10.10.2.{i}') for i in range(1, 17)]
+    attacker = socket.inet_aton('10.10.9.66')
+
+    schedule = []
+    session_list = []
+    for i in range(sessions):
+        protocol, port, (low, high) = SESSION_PROFILES[i % len(SESSION_PROFILES)]
+        session = _Session(protocol, rng.choice(hmis), rng.choice(plcs), 30000 + i, port, rng.uniform(low, high))
+        session_list.append(session)
+        schedule.append((start_time + rng.random() * session.period, i))
+    heapq.heapify(schedule)
+
+    pending = []  # (timestamp, sequence, frame, anomalous)
+    sequence = 0
+    emitted = 0
+    while emitted < n_packets:
+        now, index = heapq.heappop(schedule)
+        session = session_list[index]
+        request, response = session.exchange(rng)
+        rtt = rng.uniform(0.001, 0.004)
+        heapq.heappush(pending, (now, sequence, tcp_frame(session.client, session.server, session.sport, session.dport, TCP_PSH_ACK, request, ident=sequence), False))
+        heapq.heappush(pending, (now + rtt, sequence + 1, tcp_frame(session.server, session.client, session.dport, session.sport, TCP_PSH_ACK, response, ident=sequence + 1), False))
+        sequence += 2
+        if rng.random() < anomaly_rate:
+            kind = rng.choice(ANOMALY_KINDS)
+            for timestamp, frame in _anomaly(kind, rng, now, attacker, rng.choice(plcs), sequence):
+                heapq.heappush(pending, (timestamp, sequence, frame, True))
+                sequence += 1
+        heapq.heappush(schedule, (now + session.period * rng.uniform(0.95, 1.05), index))
+
+        while pending and pending[0][0] <= now and emitted < n_packets:
+            timestamp, _, frame, anomalous = heapq.heappop(pending)
+            yield timestamp, frame, anomalous
+            emitted += 1
+
+def write_pcap(path, packets):
+    """Write (timestamp, frame, ...) tuples to a classic Ethernet pcap; returns the packet count"""
+    record = struct.Struct('<IIII')
+    count = 0
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for packet in packets:
+            timestamp, frame = packet[0], packet[1]
+            seconds = int(timestamp)
+            micros = int(round((timestamp - seconds) * 1e6))
+            if micros == 1000000:
+                seconds, micros = seconds + 1, 0
+            f.write(record.pack(seconds, micros, len(frame), len(frame)))
+            f.write(frame)
+            count += 1
+    return count
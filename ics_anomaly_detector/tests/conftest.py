@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from ics_anomaly_detector.detector import ICSAnomalyDetector
+
+class StubMQTT:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.messages.append((topic, payload))
+
+class StubIndices:
+    def exists(self, index):
+        return True
+
+    def create(self, index, **kwargs):
+        pass
+
+class StubES:
+    def __init__(self):
+        self.indices = StubIndices()
+        self.operations = []
+
+    def bulk(self, operations):
+        self.operations.extend(operations)
+        return {"errors": False, "items": [{"index": {"status": 201}}] * (len(operations) // 2)}
+
+@pytest.fixture
+def detector():
+    detector = ICSAnomalyDetector(mqtt_client=StubMQTT(), es_client=StubES())
+    yield detector
+    detector.close()
+
+@pytest.fixture
+def online_detector():
+    detector = ICSAnomalyDetector(mqtt_client=StubMQTT(), es_client=StubES(), online=True)
+    yield detector
+    detector.close()
+
+def make_training_data(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'packet_size': rng.normal(100, 5),
+            'inter_arrival_time': rng.normal(0.1, 0.01),
+            'protocol_type': 6,
+            'port_number': 502,
+            'packet_count': rng.normal(50, 3),
+            'byte_count': rng.normal(5000, 200),
+            'flow_duration': rng.normal(5.0, 0.3),
+            'tcp_flags': 24,
+            'tcp_window_size': 8192,
+            'payload_length': rng.normal(80, 4),
+            'inter_arrival_std': rng.normal(0.02, 0.002),
+            'payload_std': rng.normal(10, 1),
+            'payload_max': rng.normal(120, 5),
+            'fin_count': 0,
+            'syn_count': 1,
+            'rst_count': 0,
+            'psh_count': rng.normal(24, 2),
+            'ack_count': rng.normal(49, 3),
+            'urg_count': 0,
+            'ics_request_count': rng.normal(24, 2),
+            'ics_response_count': rng.normal(24, 2),
+            'ics_read_count': rng.normal(24, 2),
+            'ics_write_count': 0,
+            'ics_control_count': 0,
+            'ics_function_count': 1,
+            'ics_write_read_ratio': 0.0,
+            'ics_exception_rate': 0.0,
+            'ics_unit_count': 1,
+            'ics_register_span': 10
+        }
+        for _ in range(n)
+    ]
+
+@pytest.fixture
+def training_data():
+    return make_training_data()
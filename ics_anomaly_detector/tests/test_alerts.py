@@ -0,0 +1,63 @@
+import json
+import time
+import pytest
+from ics_anomaly_detector.alerts import AlertPublisher, decode_alerts, encode_alerts
+from ics_anomaly_detector.flows import FLOW_FEATURE_NAMES
+
+class RecordingMQTT:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        self.messages.append((topic, payload, qos))
+
+def make_result(i, anomaly=False):
+    return {
+        'timestamp': "2024-05-01T12:00:00.250000",
+        'is_anomaly': anomaly,
+        'anomaly_score': -0.25 if anomaly else 0.125,
+        'features': {name: float(i + n) for n, name in enumerate(FLOW_FEATURE_NAMES)}
+    }
+
+@pytest.mark.parametrize("encoding", ["struct", "msgpack"])
+def test_binary_encodings_round_trip(encoding):
+    if encoding == "msgpack":
+        pytest.importorskip("msgpack")
+    results = [make_result(i, anomaly=i == 1) for i in range(3)]
+    payload = encode_alerts(results, encoding)
+    assert payload[:4] == b"ICSA"
+    assert len(payload) < len(encode_alerts(results, "json"))
+    assert decode_alerts(payload) == results
+
+def test_single_json_result_keeps_document_format():
+    result = make_result(0)
+    assert json.loads(encode_alerts([result])) == result
+    assert decode_alerts(encode_alerts([result, result])) == [result, result]
+
+def test_decoder_rejects_other_feature_schema():
+    payload = encode_alerts([make_result(0)], "struct")
+    with pytest.raises(ValueError, match="features"):
+        decode_alerts(payload, FLOW_FEATURE_NAMES[:-1])
+
+def test_anomalies_only_and_batching():
+    mqtt = RecordingMQTT()
+    publisher = AlertPublisher(mqtt, "ics/anomaly", encoding="struct", normal_sample_rate=0.0,
+                               batch_size=2, qos=1, flush_interval=60)
+    for i in range(10):
+        publisher.publish(make_result(i, anomaly=i % 3 == 0))
+    # anomalies are windows 0, 3, 6 and 9: two full batches
+    assert len(mqtt.messages) == 2
+    assert all(qos == 1 for _, _, qos in mqtt.messages)
+    assert [len(decode_alerts(payload)) for _, payload, _ in mqtt.messages] == [2, 2]
+    assert publisher.stats() == {"messages": 2, "published": 4, "suppressed": 6, "pending": 0}
+    publisher.close()
+
+def test_partial_batch_is_flushed_on_interval():
+    mqtt = RecordingMQTT()
+    publisher = AlertPublisher(mqtt, "ics/anomaly", batch_size=100, flush_interval=0.05)
+    publisher.publish(make_result(0, anomaly=True))
+    deadline = time.monotonic() + 5
+    while not mqtt.messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(mqtt.messages) == 1
+    publisher.close()
@@ -0,0 +1,69 @@
+import struct
+import pytest
+from scapy.all import Ether, IP, TCP, Raw
+from scapy.libs.structures import bpf_insn, bpf_program
+from ics_anomaly_detector.capture import (
+    BPF_RET_K, PROTOCOL_SNAPLEN, _apply_snaplen, build_capture_filter, capture_snaplen
+)
+
+def test_presets_and_ports_build_one_expression():
+    expression = build_capture_filter(["modbus", "DNP3", 4840])
+    base = "tcp port 502 or port 20000 or port 4840"
+    assert expression == f"({base}) or (vlan and ({base}))"
+
+def test_default_filter_covers_every_preset():
+    expression = build_capture_filter()
+    for port in (502, 20000, 102, 44818, 4840):
+        assert f"port {port}" in expression
+
+def test_unknown_protocol_is_rejected():
+    with pytest.raises(ValueError, match="Unknown ICS protocol"):
+        build_capture_filter(["profinet"])
+
+def test_empty_selection_means_no_filter():
+    assert build_capture_filter([]) is None
+
+def test_snaplen_rewrites_accepting_returns_only():
+    insns = (bpf_insn * 3)(
+        bpf_insn(0x28, 0, 0, 12),
+        bpf_insn(BPF_RET_K, 0, 0, 262144),
+        bpf_insn(BPF_RET_K, 0, 0, 0),
+    )
+    program = _apply_snaplen(bpf_program(3, insns), 128)
+    assert [program.bf_insns[i].k for i in range(3)] == [12, 128, 0]
+
+def test_cli_snaplen_options():
+    assert capture_snaplen() is None
+    assert capture_snaplen(headers_only=True) == PROTOCOL_SNAPLEN
+    assert capture_snaplen(headers_only=True, snaplen=96) == 96
+    assert capture_snaplen(snaplen=1024, default=65535) == 1024
+    assert capture_snaplen(default=65535) == 65535
+
+def test_truncated_packet_keeps_wire_sizes(detector):
+    packet = Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=40000, dport=502, flags="PA") / Raw(b"\x00" * 200)
+    full = Ether(bytes(packet))
+    truncated = Ether(bytes(packet)[:96])
+    full.time = truncated.time = 1700000000.0
+
+    expected = detector.packet_header(full)
+    assert expected.length == len(packet)
+    assert expected.payload_length == 200
+    assert detector.packet_header(truncated) == expected
+
+def test_protocol_snaplen_keeps_the_parsed_pdus(detector):
+    # Three pipelined Modbus "write multiple registers" requests, 93 bytes each
+    adu = struct.pack('!HHHBBHHB', 1, 0, 87, 1, 16, 100, 40, 80) + bytes(80)
+    packet = Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=40000, dport=502, flags="PA") / Raw(adu * 3)
+    full = Ether(bytes(packet))
+    full.time = 1700000000.0
+    expected = detector.packet_header(full)
+    assert expected.ics.requests == expected.ics.writes == 3
+
+    # --headers-only keeps all three; a limit just past the TCP header cuts
+    # off the pipelined requests after the first
+    for snaplen, requests in ((capture_snaplen(headers_only=True), 3), (128, 1)):
+        truncated = Ether(bytes(packet)[:snaplen])
+        truncated.time = full.time
+        header = detector.packet_header(truncated)
+        assert header.payload_length == expected.payload_length
+        assert header.ics.requests == requests
@@ -0,0 +1,117 @@
+import json
+import time
+import numpy as np
+import pytest
+from ics_anomaly_detector.model_store import save_model
+
+def test_detect_batch_matches_predict(detector, training_data):
+    detector.train(training_data)
+    X = detector.features_to_array(training_data)
+    X[:5] *= np.arange(20, 70, 10)[:, None]  # far outside the baseline
+
+    is_anomaly, scores = detector.detect_batch(X)
+    assert is_anomaly.shape == scores.shape == (len(training_data),)
+    assert is_anomaly[:5].all()
+    np.testing.assert_array_equal(is_anomaly, detector.model.predict(X) == -1)
+
+def test_detect_publishes_result(detector, training_data):
+    detector.train(training_data)
+
+    assert detector.detect(training_data[0]) in (True, False)
+    topic, payload = detector.mqtt_client.messages[-1]
+    result = json.loads(payload)
+    assert topic == "ics/anomaly"
+    assert set(result) == {'timestamp', 'is_anomaly', 'anomaly_score', 'features'}
+
+def test_packet_headers_feed_flow_features(detector):
+    from scapy.all import IP, TCP, Raw, Ether
+    from ics_anomaly_detector.features import FeatureBuffer
+
+    packets = []
+    for i in range(4):
+        request = Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=40000, dport=502, flags="PA") / Raw(b"\x00" * 12)
+        request.time = 100.0 + i
+        response = Ether() / IP(src="10.0.0.2", dst="10.0.0.1") / TCP(sport=502, dport=40000, flags="A")
+        response.time = 100.5 + i
+        packets.extend([request, response])
+
+    # The path live capture takes: header extraction, flow table, feature rows
+    windows = FeatureBuffer(8, len(detector.feature_names))
+    for packet in packets:
+        assert detector.flow_table.update(detector.packet_header(packet)) == []
+    for flow in detector.flow_table.flush():
+        windows.add(flow)
+    assert len(windows) == 1
+    features = dict(zip(detector.feature_names, windows.rows()[0]))
+    assert features['packet_count'] == 8
+    assert features['port_number'] == 502
+    assert features['psh_count'] == 4
+    assert features['ack_count'] == 8
+    assert features['payload_max'] == 12
+
+def test_saved_model_round_trips(detector, training_data, tmp_path):
+    detector.train(training_data)
+    path = str(tmp_path / "model.joblib")
+    detector.save_model(path)
+    X = detector.features_to_array(training_data[:20])
+    _, expected = detector.detect_batch(X)
+
+    detector.train([dict(row, packet_size=row['packet_size'] * 3) for row in training_data])
+    assert not np.array_equal(detector.detect_batch(X)[1], expected)
+    detector.load_model(path)
+    np.testing.assert_array_equal(detector.detect_batch(X)[1], expected)
+    assert detector.feature_stats["count"] == len(training_data)
+    assert detector.model_path == path
+
+def test_load_model_rejects_other_feature_schema(detector, training_data, tmp_path):
+    detector.train(training_data)
+    path = str(tmp_path / "model.joblib")
+    save_model(path, detector.model, detector.feature_names[:-1])
+    with pytest.raises(ValueError, match="feature schema"):
+        detector.load_model(path)
+
+def test_sharded_capture_flushes_without_new_packets(detector, monkeypatch):
+    from scapy.all import IP, TCP, Ether
+    import ics_anomaly_detector.detector as detector_module
+
+    events = []
+
+    class RecordingShards:
+        def start(self):
+            pass
+
+        def submit(self, header, block=True):
+            events.append("submit")
+
+        def flush(self, block=True):
+            events.append("flush")
+
+        def stop(self):
+            events.append("stop")
+
+        def stats(self):
+            return {}
+
+    class QuietSocket:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    calls = []
+
+    def sniff(opened_socket, prn, store, timeout, chainCC):
+        calls.append(timeout)
+        if len(calls) == 1:
+            # One packet right after start, then nothing until the timeout
+            prn(Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=40000, dport=502))
+            time.sleep(timeout)
+        else:
+            opened_socket.closed = True
+
+    monkeypatch.setattr(detector, "create_sharded", lambda *args, **kwargs: RecordingShards())
+    monkeypatch.setattr(detector_module, "sniff", sniff)
+    detector._start_sharded_capture(QuietSocket(), 2, 16, 0, flush_interval=0.05)
+
+    assert calls == [0.05, 0.05]
+    assert events == ["submit", "flush", "stop"]
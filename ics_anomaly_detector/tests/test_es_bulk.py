@@ -0,0 +1,78 @@
+import json
+import threading
+import pytest
+from ics_anomaly_detector.es_bulk import BulkIndexError, BulkWriter
+
+class FakeES:
+    def __init__(self, statuses=None):
+        # statuses: list of per-request status lists consumed in order
+        self.statuses = list(statuses or [])
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def bulk(self, operations):
+        docs = [json.loads(line) for line in operations[1::2]]
+        with self.lock:
+            self.requests.append(docs)
+            statuses = self.statuses.pop(0) if self.statuses else [201] * len(docs)
+        items = [{"index": {"status": status, "error": None if status < 300 else "rejected"}}
+                 for status in statuses]
+        return {"errors": any(status >= 300 for status in statuses), "items": items}
+
+def test_flushes_on_document_count():
+    es = FakeES()
+    writer = BulkWriter(es, max_docs=3, flush_interval=60)
+    for i in range(6):
+        writer.index("test", {"n": i})
+    writer.flush(timeout=5)
+    writer.close()
+    assert [len(docs) for docs in es.requests] == [3, 3]
+    assert writer.stats()["indexed"] == 6
+
+def test_flushes_on_interval():
+    es = FakeES()
+    writer = BulkWriter(es, max_docs=100, flush_interval=0.05)
+    writer.index("test", {"n": 1})
+    for _ in range(100):
+        if es.requests:
+            break
+        threading.Event().wait(0.01)
+    writer.close()
+    assert es.requests == [[{"n": 1}]]
+
+def test_retries_partial_failures():
+    es = FakeES(statuses=[[201, 429, 400]])
+    writer = BulkWriter(es, max_docs=3, flush_interval=60, retry_backoff=0)
+    for i in range(3):
+        writer.index("test", {"n": i})
+    writer.close(timeout=5)
+    assert es.requests[1] == [{"n": 1}]
+    stats = writer.stats()
+    assert (stats["indexed"], stats["failed"], stats["retried"]) == (2, 1, 1)
+
+def test_back_pressure_times_out():
+    blocked = threading.Event()
+
+    class SlowES(FakeES):
+        def bulk(self, operations):
+            blocked.wait(5)
+            return super().bulk(operations)
+
+    writer = BulkWriter(SlowES(), max_docs=1, max_pending=2, flush_interval=60)
+    assert writer.index("test", {"n": 1})
+    assert writer.index("test", {"n": 2})
+    assert not writer.index("test", {"n": 3}, timeout=0.05)
+    blocked.set()
+    writer.close(timeout=5)
+    assert writer.stats()["dropped"] == 1
+
+def test_index_and_wait_reports_item_result():
+    es = FakeES(statuses=[[201], [400]])
+    writer = BulkWriter(es, max_docs=100, flush_interval=60)
+    writer.index_and_wait("test", {"n": 1}, id="a", timeout=5)
+    assert es.requests == [[{"n": 1}]]
+    with pytest.raises(BulkIndexError, match="rejected"):
+        writer.index_and_wait("test", {"n": 2}, id="b", timeout=5)
+    writer.close(timeout=5)
+    stats = writer.stats()
+    assert (stats["indexed"], stats["failed"]) == (1, 1)
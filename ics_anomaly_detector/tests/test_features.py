@@ -0,0 +1,63 @@
+import json
+import pickle
+
+import numpy as np
+from ics_anomaly_detector.alerts import decode_alerts, encode_alerts
+from ics_anomaly_detector.es_bulk import json_default
+from ics_anomaly_detector.features import FeatureBuffer, FeatureRing
+from ics_anomaly_detector.flows import FLOW_FEATURE_NAMES, FlowTable, PacketHeader
+from ics_anomaly_detector.scoring import score_batch
+
+def make_flows(n):
+    table = FlowTable()
+    for i in range(n):
+        for j in range(i + 1):
+            table.update(PacketHeader(j * 0.1, "10.0.0.1", "10.0.0.2", 40000 + i, 502, 6, 60 + j, 0x18, 8192, j))
+    return table.flush()
+
+def test_buffer_rows_match_feature_dicts():
+    flows = make_flows(3)
+    buffer = FeatureBuffer(4)
+    for flow in flows:
+        buffer.add(flow)
+    assert len(buffer) == 3 and not buffer.full
+    expected = [[flow.to_features()[name] for name in FLOW_FEATURE_NAMES] for flow in flows]
+    assert np.array_equal(buffer.rows(), np.array(expected))
+    buffer.clear()
+    assert len(buffer.rows()) == 0
+
+def test_ring_wraps_drops_and_keeps_order():
+    flows = make_flows(5)
+    ring = FeatureRing("features", capacity=3)
+    out = np.zeros((2, len(FLOW_FEATURE_NAMES)))
+    queued_at = np.zeros(2)
+    assert all(ring.put_flow(flow) for flow in flows[:3])
+    assert not ring.put_flow(flows[3])
+    assert ring.take(out, queued_at) == 2
+    assert list(out[:, FLOW_FEATURE_NAMES.index('packet_count')]) == [1, 2]
+    assert queued_at[0] <= queued_at[1]
+    # Writes wrap around the end of the ring
+    assert ring.put_flow(flows[4])
+    assert ring.take(out) == 2
+    assert list(out[:, FLOW_FEATURE_NAMES.index('packet_count')]) == [3, 5]
+    ring.close()
+    assert ring.finished and ring.take(out, timeout=0) == 0
+    assert ring.stats() == {"depth": 0, "capacity": 3, "enqueued": 4, "dropped": 1}
+
+def test_scored_windows_behave_like_result_dicts(detector, training_data):
+    detector.train(training_data)
+    buffer = FeatureBuffer(8)
+    for flow in make_flows(4):
+        buffer.add(flow)
+    batch = score_batch(detector.model, detector.feature_names, buffer.rows())
+    buffer.clear()  # the batch owns a copy of the rows
+    windows = list(pickle.loads(pickle.dumps(batch)))
+    assert len(windows) == 4
+    dicts = [window.to_dict() for window in windows]
+    assert [d['features']['packet_count'] for d in dicts] == [1, 2, 3, 4]
+    assert windows[0]['anomaly_score'] == float(batch.scores[0])
+    assert json.loads(json.dumps(windows[1], default=json_default)) == json.loads(json.dumps(dicts[1]))
+
+    for encoding in ("json", "struct"):
+        assert encode_alerts(windows, encoding) == encode_alerts(dicts, encoding)
+    assert decode_alerts(encode_alerts(windows, "struct"))[2]['features']['packet_count'] == 3
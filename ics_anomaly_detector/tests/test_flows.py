@@ -0,0 +1,50 @@
+import pytest
+from ics_anomaly_detector.flows import FlowTable, PacketHeader
+
+def header(ts, src="10.0.0.1", dst="10.0.0.2", sport=40000, dport=502, length=100, flags=0x18, payload=40):
+    return PacketHeader(ts, src, dst, sport, dport, 6, length, flags, 8192, payload)
+
+def test_aggregates_both_directions_into_one_flow():
+    table = FlowTable()
+    table.update(header(0.0))
+    table.update(header(0.5, src="10.0.0.2", dst="10.0.0.1", sport=502, dport=40000, flags=0x10, payload=0))
+    table.update(header(1.5))
+    assert len(table) == 1
+
+    features = table.flush()[0].to_features()
+    assert features['packet_count'] == 3
+    assert features['byte_count'] == 300
+    assert features['flow_duration'] == 1.5
+    assert features['inter_arrival_time'] == pytest.approx(0.75)
+    assert features['inter_arrival_std'] == pytest.approx(0.25)
+    assert features['port_number'] == 502
+    assert features['tcp_flags'] == 0x18
+    assert (features['psh_count'], features['ack_count']) == (2, 3)
+    assert features['payload_max'] == 40
+
+def test_idle_timeout_expires_flows():
+    table = FlowTable(idle_timeout=10)
+    table.update(header(0.0))
+    table.update(header(5.0, sport=40001))
+    expired = table.update(header(12.0, sport=40002))
+    assert [flow.key[2] for flow in expired] == [40000]
+    assert len(table) == 2
+    assert len(table.expire(100.0)) == 2
+
+def test_active_timeout_restarts_long_flows():
+    table = FlowTable(idle_timeout=10, active_timeout=20)
+    expired = []
+    for ts in range(0, 30, 5):
+        expired.extend(table.update(header(float(ts))))
+    assert len(expired) == 1
+    assert expired[0].packet_count == 4
+    assert len(table) == 1
+
+def test_max_flows_bounds_memory():
+    table = FlowTable(max_flows=2)
+    table.update(header(0.0, sport=1))
+    table.update(header(0.1, sport=2))
+    expired = table.update(header(0.2, sport=3))
+    assert len(table) == 2
+    assert expired[0].key[2] == 1
+    assert table.evicted == 1
@@ -0,0 +1,72 @@
+import urllib.error
+import urllib.request
+
+import pytest
+from ics_anomaly_detector.metrics import Histogram, MetricsRegistry
+from ics_anomaly_detector.tests.test_pipeline import make_packets
+
+def sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} not in metrics output")
+
+def test_histogram_quantiles_are_within_one_bucket():
+    histogram = Histogram()
+    for us in range(1, 10001):
+        histogram.record(us / 1e6)
+    assert histogram.count == 10000
+    for q, exact in ((0.5, 0.005), (0.99, 0.0099), (1.0, 0.01)):
+        assert exact <= histogram.quantile(q) <= exact * 1.125
+    assert Histogram().quantile(0.5) == 0.0
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs run").inc(3)
+    assert registry.counter("jobs_total", "Jobs run").value == 3
+    histogram = registry.histogram("job_seconds", "Job time", {"stage": "parse"})
+    histogram.record(0.003)
+    histogram.record(0.5)
+    depth = [4]
+    registry.callback("queue_depth", "Queued jobs", lambda: depth[0])
+    depth[0] = 7
+
+    text = registry.render()
+    assert "# TYPE jobs_total counter" in text
+    assert "# TYPE job_seconds histogram" in text
+    assert sample(text, "jobs_total") == 3
+    assert sample(text, "queue_depth") == 7
+    assert sample(text, 'job_seconds_bucket{stage="parse",le="0.002048"}') == 0
+    assert sample(text, 'job_seconds_bucket{stage="parse",le="0.004096"}') == 1
+    assert sample(text, 'job_seconds_bucket{stage="parse",le="+Inf"}') == 2
+    assert sample(text, 'job_seconds_count{stage="parse"}') == 2
+    assert sample(text, 'job_seconds_sum{stage="parse"}') == pytest.approx(0.503)
+
+def test_server_exposes_detector_metrics(detector, training_data):
+    detector.train(training_data)
+    pipeline = detector.create_pipeline()
+    pipeline.expire_interval = 0.05
+    pipeline.start()
+    for packet in make_packets(5):
+        pipeline.submit(packet)
+    pipeline.stop(timeout=5)
+
+    server = detector.serve_metrics(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(url + "/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            text = response.read().decode()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/other")
+    finally:
+        server.stop()
+
+    assert sample(text, "ics_packets_total") == 15
+    assert sample(text, "ics_windows_scored_total") == 5
+    assert sample(text, "ics_detect_seconds_count") >= 1
+    assert sample(text, 'ics_extract_seconds_count{stage="pipeline"}') >= 1
+    assert sample(text, "ics_feature_queue_seconds_count") == 5
+    assert sample(text, 'ics_sink_seconds_count{sink="mqtt"}') == 5
+    assert sample(text, 'ics_queue_dropped_total{queue="capture"}') == 0
+    assert sample(text, 'ics_queue_depth{queue="features"}') == 0
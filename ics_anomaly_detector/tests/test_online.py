@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from ics_anomaly_detector.model_store import load_model, save_model
+from ics_anomaly_detector.online import HalfSpaceTrees
+
+def baseline(n, center=100.0, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(center, 5, (n, 6)).clip(0)
+
+def test_flags_outliers_against_the_baseline():
+    model = HalfSpaceTrees(window_size=128, random_state=0).fit(baseline(1000))
+    outliers = baseline(50, seed=1)
+    outliers[:, :2] *= 30
+    assert (model.decision_function(outliers) < 0).mean() > 0.8
+    assert (model.decision_function(baseline(500, seed=2)) < 0).mean() < 0.2
+
+def test_unfitted_model_raises():
+    with pytest.raises(ValueError, match="not fitted"):
+        HalfSpaceTrees().score_partial(baseline(4))
+
+def test_learning_adapts_to_drift_with_fixed_memory():
+    model = HalfSpaceTrees(window_size=128, random_state=0).fit(baseline(1000))
+    mass_shape = model.r_mass_.shape
+    shifted = baseline(128 * 4, center=300.0, seed=3)
+
+    first = model.score_partial(shifted[:128])
+    assert (first < 0).mean() > 0.8
+    stats = model.drift_stats()
+    assert stats["windows_completed"] == 1
+    assert stats["latest"]["out_of_range_rate"] == 1.0
+    assert stats["latest"]["mass_shift"] > 0.2
+
+    model.score_partial(shifted[128:256])
+    # Once the new regime is the reference window it is no longer anomalous
+    assert (model.score_partial(shifted[256:]) < 0).mean() < 0.2
+    assert model.r_mass_.shape == mass_shape
+    assert model.drift_stats(["a", "b", "c", "d", "e", "f"])["latest"]["feature_shift"]["a"] == pytest.approx(0, abs=1)
+
+def test_round_trips_through_save_and_load(training_data, tmp_path):
+    model = HalfSpaceTrees(window_size=64, random_state=0)
+    X = np.array([list(row.values()) for row in training_data])
+    model.fit(X)
+    model.score_partial(X[:100])
+    path = str(tmp_path / "online.joblib")
+    save_model(path, model, [str(i) for i in range(X.shape[1])])
+
+    restored = load_model(path)["model"]
+    restored.score_partial(X[:100])
+    assert restored.samples_seen == 200
+    assert restored.drift_stats()["windows_completed"] == 3
+
+def test_detector_online_mode_learns_while_scoring(online_detector, training_data):
+    online_detector.train(training_data)
+    assert online_detector.drift_stats()["samples_seen"] == 0
+    online_detector.detect_many(training_data * 6)
+    stats = online_detector.drift_stats()
+    assert stats["samples_seen"] == len(training_data) * 6
+    assert set(stats["latest"]["feature_shift"]) == set(online_detector.feature_names)
@@ -0,0 +1,52 @@
+import pytest
+from scapy.all import Ether, Dot1Q, IP, IPv6, TCP, UDP, ARP, Raw, wrpcap
+from ics_anomaly_detector.pcap import iter_pcap_headers
+
+def write_sample(path):
+    packets = [
+        Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=40000, dport=502, flags="PA", window=4096) / Raw(b"\x00\x01\x00\x00\x00\x06\x01\x03\x00\x00\x00\x0a"),
+        Ether() / Dot1Q(vlan=10) / IP(src="10.0.0.2", dst="10.0.0.1") / TCP(sport=502, dport=40000, flags="A"),
+        Ether() / IP(src="10.0.0.3", dst="10.0.0.4") / UDP(sport=20000, dport=20000) / Raw(b"\x05\x64" + b"\x00" * 8),
+        Ether() / ARP(),
+        Ether() / IPv6(src="fe80::1", dst="fe80::2") / TCP(sport=1234, dport=4840, flags="S"),
+    ]
+    for i, packet in enumerate(packets):
+        packet.time = 1700000000 + i * 0.25
+    wrpcap(str(path), packets)
+    return packets
+
+def test_parses_ethernet_vlan_udp_and_ipv6(tmp_path):
+    path = tmp_path / "sample.pcap"
+    packets = write_sample(path)
+    headers = list(iter_pcap_headers(str(path)))
+
+    assert len(headers) == 4  # ARP is skipped
+    first = headers[0]
+    assert (first.sport, first.dport, first.proto) == (40000, 502, 6)
+    assert first.tcp_flags == 0x18
+    assert first.window == 4096
+    assert first.payload_length == 12
+    assert first.length == len(packets[0])
+    assert first.timestamp == pytest.approx(1700000000)
+
+    vlan = headers[1]
+    assert (vlan.sport, vlan.dport, vlan.tcp_flags, vlan.payload_length) == (502, 40000, 0x10, 0)
+
+    udp = headers[2]
+    assert (udp.proto, udp.sport, udp.dport, udp.payload_length) == (17, 20000, 20000, 10)
+
+    ipv6 = headers[3]
+    assert (ipv6.dport, ipv6.tcp_flags) == (4840, 0x02)
+
+def test_rejects_non_pcap(tmp_path):
+    path = tmp_path / "bad.pcap"
+    path.write_bytes(b"\x0a\x0d\x0d\x0a" + b"\x00" * 28)
+    with pytest.raises(ValueError):
+        list(iter_pcap_headers(str(path)))
+
+def test_replay_pcap_scores_flows(detector, training_data, tmp_path):
+    path = tmp_path / "sample.pcap"
+    write_sample(path)
+    detector.train(training_data)
+    assert detector.replay_pcap(str(path)) == 4
+    assert len(detector.mqtt_client.messages) == 3  # Modbus, DNP3 and OPC UA flows
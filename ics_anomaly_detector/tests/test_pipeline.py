@@ -0,0 +1,54 @@
+import threading
+from scapy.all import Ether, IP, TCP, Raw
+from ics_anomaly_detector.pipeline import DetectionPipeline, StageQueue
+
+def make_packets(n_flows, packets_per_flow=3):
+    packets = []
+    for flow in range(n_flows):
+        for i in range(packets_per_flow):
+            packet = Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=40000 + flow, dport=502, flags="PA") / Raw(b"\x00" * 12)
+            packet.time = 1000.0 + flow + i * 0.1
+            packets.append(packet)
+    return packets
+
+def test_stage_queue_drops_when_full():
+    queue = StageQueue("test", maxsize=2)
+    assert queue.put(1) and queue.put(2)
+    assert not queue.put(3)
+    assert queue.get_many(10) == [1, 2]
+    queue.close()
+    assert queue.finished
+    assert queue.stats() == {"depth": 0, "capacity": 2, "enqueued": 2, "dropped": 1}
+
+def test_pipeline_scores_flows_into_sinks(detector, training_data):
+    detector.train(training_data)
+    received = []
+    pipeline = DetectionPipeline(detector, sinks={"memory": received.append}, expire_interval=0.05)
+    pipeline.start()
+    for packet in make_packets(5):
+        assert pipeline.submit(packet)
+    pipeline.stop(timeout=5)
+
+    assert len(received) == 5
+    assert {result["features"]["packet_count"] for result in received} == {3}
+    stats = pipeline.stats()
+    assert stats["windows_scored"] == 5
+    assert stats["capture"]["dropped"] == 0
+
+def test_slow_sink_does_not_block_capture(detector, training_data):
+    detector.train(training_data)
+    release = threading.Event()
+    pipeline = DetectionPipeline(
+        detector, sinks={"slow": lambda result: release.wait(5)},
+        sink_buffer=2, score_batch_size=1, expire_interval=0.05
+    )
+    pipeline.start()
+    for packet in make_packets(20, packets_per_flow=1):
+        assert pipeline.submit(packet)
+    # Flush flows through the scorer while the sink is stuck
+    pipeline.ring.close()
+    pipeline._threads[0].join(5)
+    pipeline._threads[1].join(5)
+    assert pipeline.stats()["sink_slow"]["dropped"] > 0
+    release.set()
+    pipeline.stop(timeout=5)
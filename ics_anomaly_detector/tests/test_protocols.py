@@ -0,0 +1,84 @@
+import struct
+
+from scapy.all import Ether
+from ics_anomaly_detector.detector import ICSAnomalyDetector
+from ics_anomaly_detector.flows import FLOW_FEATURE_NAMES, FlowTable
+from ics_anomaly_detector.pcap import iter_pcap_headers
+from ics_anomaly_detector.protocols import (
+    PROTOCOL_FEATURE_NAMES, parse_dnp3, parse_modbus, parse_payload, parse_s7
+)
+from ics_anomaly_detector.synthetic import (
+    TCP_PSH_ACK, dnp3_frame, modbus_request, modbus_response, s7_frame, tcp_frame, write_pcap
+)
+
+CLIENT = bytes([10, 0, 0, 1])
+SERVER = bytes([10, 0, 0, 2])
+
+def test_modbus_requests_and_exceptions():
+    payload = modbus_request(1, function=3, address=100, count=10) + modbus_request(2, function=16, address=200, count=2, values=bytes(4))
+    summary = parse_modbus(memoryview(payload), 0, len(payload), to_server=True)
+    assert (summary.requests, summary.reads, summary.writes) == (2, 1, 1)
+    assert summary.functions == (1 << 3) | (1 << 16)
+    assert (summary.unit, summary.register_low, summary.register_high) == (1, 100, 201)
+
+    exception = struct.pack('!HHHBBB', 1, 0, 3, 1, 0x83, 2)
+    summary = parse_modbus(exception + modbus_response(2), 0, len(exception) + len(modbus_response(2)), to_server=False)
+    assert (summary.responses, summary.exceptions, summary.requests) == (2, 1, 0)
+
+def test_dnp3_function_classes_and_iin_errors():
+    request = dnp3_frame(0x05, destination=7, source=1024)
+    summary = parse_dnp3(request, 0, len(request))
+    assert (summary.requests, summary.controls, summary.unit) == (1, 1, 7)
+
+    # IIN2 bit 0: function code not supported
+    response = dnp3_frame(0x81, destination=1024, source=7, data=b'\x00\x01')
+    summary = parse_dnp3(response, 0, len(response))
+    assert (summary.responses, summary.exceptions, summary.unit) == (1, 1, 7)
+
+def test_s7_jobs_and_ack_errors():
+    job = s7_frame(1, 0x05, 1) + s7_frame(1, 0x29, 2)
+    summary = parse_s7(job, 0, len(job))
+    assert (summary.requests, summary.writes, summary.controls) == (2, 1, 1)
+    ack = s7_frame(3, 0x05, 1)
+    assert parse_s7(ack, 0, len(ack)).exceptions == 0
+    error = bytearray(ack)
+    error[4 + 3 + 10] = 0x85  # error class of the ack-data header
+    assert parse_s7(error, 0, len(error)).exceptions == 1
+
+def test_unparseable_payloads_are_ignored():
+    assert parse_payload(b'GET / HTTP/1.1\r\n', 0, 16, 40000, 80) is None
+    assert parse_payload(b'\xff' * 20, 0, 20, 40000, 502) is None
+    # Truncated headers never read past `end`
+    frame = modbus_request(1)
+    assert parse_payload(frame, 0, 5, 40000, 502) is None
+    assert parse_payload(s7_frame(1, 4, 1), 0, 9, 40000, 102) is None
+
+def test_flow_features_from_pcap_and_scapy_agree(tmp_path):
+    frames = []
+    for i in range(20):
+        function = 16 if i % 4 == 0 else 3
+        request = modbus_request(i, function=function, address=i * 10, count=2, values=bytes(4))
+        frames.append((float(i), tcp_frame(CLIENT, SERVER, 40000, 502, TCP_PSH_ACK, request)))
+        frames.append((i + 0.01, tcp_frame(SERVER, CLIENT, 502, 40000, TCP_PSH_ACK, modbus_response(i, function, 2))))
+    path = str(tmp_path / "modbus.pcap")
+    write_pcap(path, frames)
+
+    table = FlowTable()
+    for header in iter_pcap_headers(path):
+        table.update(header)
+    features = table.flush()[0].to_features()
+    assert set(PROTOCOL_FEATURE_NAMES) <= set(features) == set(FLOW_FEATURE_NAMES)
+    assert (features['ics_request_count'], features['ics_response_count']) == (20, 20)
+    assert (features['ics_read_count'], features['ics_write_count']) == (15, 5)
+    assert features['ics_write_read_ratio'] == 5 / 15
+    assert features['ics_function_count'] == 2
+    assert features['ics_register_span'] == 192
+    assert features['ics_exception_rate'] == 0.0
+
+    detector = ICSAnomalyDetector.__new__(ICSAnomalyDetector)
+    table = FlowTable()
+    for timestamp, frame in frames:
+        packet = Ether(frame)
+        packet.time = timestamp
+        table.update(detector.packet_header(packet))
+    assert table.flush()[0].to_features() == features
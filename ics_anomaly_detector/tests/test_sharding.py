@@ -0,0 +1,86 @@
+import json
+import time
+import pytest
+from scapy.all import Ether, IP, TCP, Raw, wrpcap
+from ics_anomaly_detector.flows import PacketHeader, flow_key
+from ics_anomaly_detector.sharding import ShardedDetector, _mp_context
+
+def make_header(sport, timestamp, reverse=False):
+    src, dst = ("10.0.0.2", "10.0.0.1") if reverse else ("10.0.0.1", "10.0.0.2")
+    ports = (502, sport) if reverse else (sport, 502)
+    return PacketHeader(timestamp, src, dst, ports[0], ports[1], 6, 66, 0x18, 8192, 12)
+
+def test_both_directions_reach_the_same_shard(detector, training_data):
+    detector.train(training_data)
+    received = []
+    sharded = ShardedDetector(detector, sinks={"memory": received.append}, workers=3, batch_size=4)
+    sharded.start()
+    for flow in range(12):
+        for i in range(4):
+            assert sharded.submit(make_header(40000 + flow, 1000.0 + i * 0.1, reverse=i % 2))
+    sharded.stop(timeout=30)
+
+    # One window per flow: neither direction was split onto another shard
+    assert len(received) == 12
+    assert {result["features"]["packet_count"] for result in received} == {4}
+    stats = sharded.stats()
+    assert stats["dispatched"] == 48 and stats["dropped"] == 0
+    assert sum(shard["packets"] for shard in stats["shards"]) == 48
+    assert stats["windows_scored"] == 12
+
+@pytest.mark.parametrize("saved", [False, True])
+def test_sharded_replay_matches_single_process(detector, training_data, tmp_path, saved):
+    detector.train(training_data)
+    if saved:
+        # Shards load the model from the file instead of receiving it pickled
+        detector.save_model(str(tmp_path / "model.joblib"))
+        detector.load_model(str(tmp_path / "model.joblib"))
+    packets = []
+    for flow in range(20):
+        for i in range(3):
+            packet = Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=41000 + flow, dport=502, flags="PA") / Raw(b"\x00" * 12)
+            packet.time = 1700000000 + flow + i * 0.1
+            packets.append(packet)
+    path = str(tmp_path / "flows.pcap")
+    wrpcap(path, packets)
+
+    assert detector.replay_pcap(path) == 60
+    single = sorted(json.loads(message)["anomaly_score"] for _, message in detector.mqtt_client.messages)
+    detector.mqtt_client.messages.clear()
+
+    assert detector.replay_pcap(path, workers=2) == 60
+    sharded = sorted(json.loads(message)["anomaly_score"] for _, message in detector.mqtt_client.messages)
+    assert len(single) == 20
+    assert sharded == single
+    assert detector.metrics.extract_seconds["shard"].count >= 1
+
+def test_flow_key_hash_is_direction_independent():
+    forward = make_header(40000, 0.0)
+    backward = make_header(40000, 0.0, reverse=True)
+    assert hash(flow_key(forward)) == hash(flow_key(backward))
+
+def test_shards_are_not_forked_from_the_threaded_parent():
+    # The MQTT, bulk writer and metrics threads are already running when
+    # shards start, so they must not inherit the parent's locks through fork
+    assert _mp_context().get_start_method() in ("forkserver", "spawn")
+
+def test_stop_gives_up_on_a_dead_shard(detector, training_data):
+    detector.train(training_data)
+    sharded = ShardedDetector(detector, sinks={}, workers=2, batch_size=1, inbox_batches=1)
+    sharded.start()
+    dead = sharded._processes[0]
+    dead.terminate()
+    dead.join(30)
+
+    started = time.monotonic()
+    for flow in range(20):
+        sharded.submit(make_header(40000 + flow, 1000.0))
+    sharded.stop(timeout=2)
+    assert time.monotonic() - started < 30
+
+    # The dead shard's inbox filled up and its batches were dropped; the
+    # live shard still drained and reported
+    stats = sharded.stats()
+    assert stats["dropped"] >= 1
+    assert stats["dispatched"] + stats["dropped"] == 20
+    assert [shard["shard"] for shard in stats["shards"]] == [1]
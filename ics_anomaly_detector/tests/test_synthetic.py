@@ -0,0 +1,36 @@
+from scapy.all import Ether, TCP, Raw
+from ics_anomaly_detector.benchmark import run_benchmarks
+from ics_anomaly_detector.pcap import iter_pcap_headers
+from ics_anomaly_detector.synthetic import generate_traffic, write_pcap
+
+def test_traffic_is_ordered_deterministic_and_parseable(tmp_path):
+    packets = list(generate_traffic(5000, anomaly_rate=0.01, seed=7))
+    assert packets == list(generate_traffic(5000, anomaly_rate=0.01, seed=7))
+    timestamps = [packet[0] for packet in packets]
+    assert timestamps == sorted(timestamps)
+    assert any(anomalous for _, _, anomalous in packets)
+
+    path = str(tmp_path / "synthetic.pcap")
+    assert write_pcap(path, packets) == 5000
+    headers = list(iter_pcap_headers(path))
+    assert len(headers) == 5000
+    assert {502, 20000, 102} <= {min(h.sport, h.dport) for h in headers}
+
+def test_frames_carry_protocol_headers():
+    ports = {}
+    for _, frame, anomalous in generate_traffic(300, anomaly_rate=0.0):
+        packet = Ether(frame)
+        ports.setdefault(packet[TCP].dport, bytes(packet[Raw].load))
+    assert ports[502][2:4] == b"\x00\x00"    # Modbus MBAP protocol id
+    assert ports[20000][:2] == b"\x05\x64"   # DNP3 start bytes
+    assert ports[102][:1] == b"\x03" and ports[102][7:8] == b"\x32"  # TPKT + S7comm
+
+def test_benchmark_report_is_machine_readable(tmp_path):
+    report = run_benchmarks(packets=3000, scapy_packets=500, anomaly_rate=0.01, workdir=str(tmp_path))
+    results = report["results"]
+    assert report["schema_version"] == 1
+    assert results["pcap_extraction"]["packets"] == 3000
+    assert results["replay"]["packets_per_s"] > 0
+    assert set(results["scoring"]) == {"1", "64", "256", "1024"}
+    assert results["end_to_end"]["latency_ms"]["p99"] >= results["end_to_end"]["latency_ms"]["p50"]
+    assert report["peak_rss_mb"] > 0
@@ -0,0 +1,63 @@
+import numpy as np
+from scapy.all import Ether, IP, TCP, Raw, wrpcap
+from ics_anomaly_detector import training
+from ics_anomaly_detector.flows import FLOW_FEATURE_NAMES
+from ics_anomaly_detector.training import ReservoirSample, iter_es_feature_batches, iter_pcap_feature_batches
+
+def test_reservoir_is_bounded_and_uniform():
+    reservoir = ReservoirSample(1000, 1, random_state=0)
+    for start in range(0, 100000, 4096):
+        rows = np.arange(start, min(start + 4096, 100000), dtype=np.float32)[:, None]
+        reservoir.add(rows)
+    assert reservoir.seen == 100000
+    sample = reservoir.sample()[:, 0]
+    assert sample.shape == (1000,)
+    assert len(np.unique(sample)) == 1000
+    # A uniform sample of 0..99999 has its mean near the middle
+    assert abs(sample.mean() - 50000) < 3000
+
+def test_reservoir_smaller_than_capacity_keeps_everything():
+    reservoir = ReservoirSample(10, 2)
+    reservoir.add(np.ones((3, 2)))
+    np.testing.assert_array_equal(reservoir.sample(), np.ones((3, 2)))
+
+def write_flows(path, n_flows):
+    packets = []
+    for flow in range(n_flows):
+        for i in range(2):
+            packet = Ether() / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=30000 + flow, dport=502, flags="PA") / Raw(b"\x00" * 8)
+            packet.time = 1700000000 + flow * 0.01 + i * 0.001
+            packets.append(packet)
+    wrpcap(str(path), packets)
+
+def test_pcap_batches_cover_every_flow(tmp_path):
+    write_flows(tmp_path / "a.pcap", 30)
+    write_flows(tmp_path / "b.pcap", 20)
+    paths = [str(tmp_path / "a.pcap"), str(tmp_path / "b.pcap")]
+    sizes = [len(batch) for batch in iter_pcap_feature_batches(paths, FLOW_FEATURE_NAMES, batch_size=16)]
+    assert sizes == [16, 16, 16, 2]
+
+def test_train_from_pcaps_samples_and_fits(detector, tmp_path):
+    write_flows(tmp_path / "train.pcap", 300)
+    seen = detector.train_from_pcaps([str(tmp_path / "train.pcap")], sample_size=100, n_jobs=2)
+    assert seen == 300
+    assert detector.feature_stats["count"] == 100
+    assert detector.model.n_jobs == 2
+    is_anomaly, _ = detector.detect_batch(np.zeros((1, len(FLOW_FEATURE_NAMES))))
+    assert is_anomaly.shape == (1,)
+
+def test_es_batches_skip_documents_from_other_schemas(monkeypatch):
+    names = ["packet_size", "packet_count"]
+    hits = [{"_source": {"features": {"packet_size": i, "packet_count": 1}}} for i in range(5)]
+    hits.append({"_source": {"features": {"packet_size": 1}}})
+    calls = []
+
+    def fake_scan(client, index, query, size):
+        calls.append((index, query, size))
+        return iter(hits)
+
+    monkeypatch.setattr(training, "scan", fake_scan)
+    batches = [batch.copy() for batch in iter_es_feature_batches(None, "ics_anomalies", names, batch_size=2)]
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert calls[0][1]["query"] == {"term": {"is_anomaly": False}}
+    assert calls[0][1]["_source"] == ["features.packet_size", "features.packet_count"]
@@ -0,0 +1,112 @@
+import numpy as np
+from elasticsearch.helpers import scan
+
+from ics_anomaly_detector.flows import FLOW_FEATURE_NAMES, FlowStats, FlowTable
+from ics_anomaly_detector.pcap import iter_pcap_headers
+
+class ReservoirSample:
+    """
+    Uniform fixed-size sample of an unbounded stream of feature rows.
+
+    Rows are kept in one preallocated float32 array (Algorithm R applied a
+    batch at a time), so memory is capacity * n_features * 4 bytes no
+    matter how many rows are offered.
+    """
+
+    def __init__(self, capacity, n_features, random_state=None):
+        self.capacity = capacity
+        self.rows = np.empty((capacity, n_features), dtype=np.float32)
+        self.seen = 0
+        self._rng = np.random.default_rng(random_state)
+
+    def __len__(self):
+        return min(self.seen, self.capacity)
+
+    def add(self, X):
+        X = np.asarray(X)
+        if not len(X):
+            return
+        # Fill the reservoir first
+        free = max(self.capacity - self.seen, 0)
+        head = X[:free]
+        self.rows[self.seen:self.seen + len(head)] = head
+        self.seen += len(head)
+        rest = X[len(head):]
+        if not len(rest):
+            return
+        # Row number i (0-based) replaces a random slot with probability capacity / (i + 1)
+        positions = self._rng.integers(0, np.arange(self.seen, self.seen + len(rest)) + 1)
+        keep = positions < self.capacity
+        self.rows[positions[keep]] = rest[keep]
+        self.seen += len(rest)
+
+    def sample(self):
+        """The sampled rows (a view, valid until the next add)"""
+        return self.rows[:len(self)]
+
+def _fill(buffer, count, rows):
+    """Yield full copies of buffer while appending rows to it; returns the leftover count"""
+    for row in rows:
+        buffer[count] = row
+        count += 1
+        if count == len(buffer):
+            yield buffer
+            count = 0
+    return count
+
+def iter_pcap_feature_batches(paths, feature_names, batch_size=65536, idle_timeout=30.0,
+                              active_timeout=120.0, max_flows=500000):
+    """
+    Replay pcaps through a flow table and yield (n, n_features) arrays of
+    flow features. The same buffer is reused between batches.
+    """
+    if list(feature_names) == FLOW_FEATURE_NAMES:
+        vector = FlowStats.feature_values
+    else:
+        def vector(flow):
+            features = flow.to_features()
+            return [features[name] for name in feature_names]
+
+    buffer = np.empty((batch_size, len(feature_names)), dtype=np.float32)
+    count = 0
+    for path in paths:
+        flow_table = FlowTable(idle_timeout, active_timeout, max_flows)
+
+        def rows():
+            for header in iter_pcap_headers(path):
+                for flow in flow_table.update(header):
+                    yield vector(flow)
+            for flow in flow_table.flush():
+                yield vector(flow)
+
+        count = yield from _fill(buffer, count, rows())
+    if count:
+        yield buffer[:count]
+
+def iter_es_feature_batches(es_client, index, feature_names, batch_size=10000, query=None):
+    """
+    Scroll stored detection results and yield (n, n_features) arrays of
+    their features. Only windows not flagged as anomalous are used unless
+    another query is given. The same buffer is reused between batches.
+    """
+    if query is None:
+        query = {"term": {"is_anomaly": False}}
+    hits = scan(
+        es_client,
+        index=index,
+        query={"query": query, "_source": [f"features.{name}" for name in feature_names]},
+        size=batch_size
+    )
+
+    def rows():
+        for hit in hits:
+            features = hit["_source"].get("features", {})
+            try:
+                yield [features[name] for name in feature_names]
+            except KeyError:
+                continue  # written before the feature schema changed
+
+    buffer = np.empty((batch_size, len(feature_names)), dtype=np.float32)
+    count = yield from _fill(buffer, count=0, rows=rows())
+    if count:
+        yield buffer[:count]
@@ -1,7 +1,12 @@
 import unittest
 from unittest.mock import patch, Mock, mock_open
+import asyncio
 import os
-from analyzer import analyze_threat_intel_pdf, format_results
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from analyzer import analyze_threat_intel_pdf, analyze_directory_parallel, format_results
+from chunk_executor import ChunkExecutor
+from extraction_cache import ExtractionCache
 
 class TestThreatIntelAnalyzer(unittest.TestCase):
     def setUp(self):
@@ -26,18 +31,14 @@ class TestThreatIntelAnalyzer(unittest.TestCase):
         ]
 
     @patch('analyzer.PyPDFLoader')
-    @patch('analyzer.CharacterTextSplitter')
     @patch('analyzer.ChatOpenAI')
     @patch('analyzer.create_extraction_chain')
-    def test_analyze_threat_intel_pdf_success(self, mock_chain, mock_chat, mock_splitter, mock_loader):
+    def test_analyze_threat_intel_pdf_success(self, mock_chain, mock_chat, mock_loader):
         """Test successful PDF analysis"""
         # Mock the PDF loader
         mock_page = Mock()
         mock_page.page_content = "Sample threat intel content"
-        mock_loader.return_value.load_and_split.return_value = [mock_page]
-        
-        # Mock the text splitter
-        mock_splitter.return_value.split_documents.return_value = [mock_page]
+        mock_loader.return_value.load.return_value = [mock_page]
         
         # Mock the extraction chain
         mock_chain.return_value.run.return_value = [self.sample_results[0]]
@@ -49,13 +50,12 @@ class TestThreatIntelAnalyzer(unittest.TestCase):
         self.assertEqual(result[0]["malware_name"], "SUNBURST")
 
     @patch('analyzer.PyPDFLoader')
-    @patch('analyzer.CharacterTextSplitter')
     @patch('analyzer.ChatOpenAI')
     @patch('analyzer.create_extraction_chain')
-    def test_analyze_threat_intel_pdf_error(self, mock_chain, mock_chat, mock_splitter, mock_loader):
+    def test_analyze_threat_intel_pdf_error(self, mock_chain, mock_chat, mock_loader):
         """Test error handling in PDF analysis"""
         # Mock the PDF loader to raise an exception
-        mock_loader.return_value.load_and_split.side_effect = Exception("PDF loading error")
+        mock_loader.return_value.load.side_effect = Exception("PDF loading error")
         
         with self.assertRaises(Exception):
             analyze_threat_intel_pdf("sample.pdf")
@@ -95,5 +95,72 @@ class TestThreatIntelAnalyzer(unittest.TestCase):
         self.assertIn("SUNBURST", formatted_output)
         self.assertNotIn("severity", formatted_output.lower())
 
+    @patch('analyzer.PyPDFLoader')
+    @patch('analyzer.ChatOpenAI')
+    @patch('analyzer.create_extraction_chain')
+    def test_analyze_threat_intel_pdf_cache(self, mock_chain, mock_chat, mock_loader):
+        """Test cached chunks skip the LLM on re-analysis"""
+        mock_page = Mock()
+        mock_page.page_content = "Sample threat intel content"
+        mock_loader.return_value.load.return_value = [mock_page]
+        mock_chain.return_value.run.return_value = [self.sample_results[0]]
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ExtractionCache(os.path.join(tmpdir, "cache.sqlite3"))
+            first = analyze_threat_intel_pdf("sample.pdf", cache=cache)
+            second = analyze_threat_intel_pdf("sample.pdf", cache=cache)
+            cache.close()
+        
+        self.assertEqual(first, second)
+        self.assertEqual(mock_chain.return_value.run.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    @patch('analyzer.ProcessPoolExecutor', ThreadPoolExecutor)
+    @patch('analyzer.build_chains')
+    @patch('analyzer.load_pdf_chunks')
+    def test_analyze_directory_parallel(self, mock_load, mock_build):
+        """Test parallel batch analysis writes one output per file"""
+        chunks = {"a.pdf": (2, ["chunk a1", "chunk a2"]), "b.pdf": (1, ["chunk b1"]), "c.pdf": (1, [])}
+        mock_load.side_effect = lambda path: chunks[path]
+        mock_chain = Mock()
+        mock_chain.run.side_effect = lambda text: [{"threat_actor": text}]
+        mock_build.return_value = (mock_chain, None)
+        
+        with tempfile.TemporaryDirectory() as output_dir:
+            summaries = asyncio.run(analyze_directory_parallel(
+                list(chunks), None, output_dir, workers=2,
+                executor=ChunkExecutor(max_concurrency=2)
+            ))
+            written = sorted(os.listdir(output_dir))
+        
+        self.assertEqual(written, ["a_analysis.txt", "b_analysis.txt", "c_analysis.txt"])
+        self.assertLess(summaries[0].index("chunk a1"), summaries[0].index("chunk a2"))
+        self.assertIn("chunk b1", summaries[1])
+        self.assertIn("No threat intelligence findings", summaries[2])
+
+    @patch('analyzer.ProcessPoolExecutor', ThreadPoolExecutor)
+    @patch('analyzer.build_chains')
+    @patch('analyzer.load_pdf_chunks')
+    def test_analyze_directory_parallel_survives_write_errors(self, mock_load, mock_build):
+        """Test a file whose results cannot be saved does not stop the other files"""
+        chunks = {"a.pdf": (1, ["chunk a1"]), "b.pdf": (2, ["chunk b1", "chunk b2"]), "c.pdf": (1, ["chunk c1"])}
+        mock_load.side_effect = lambda path: chunks[path]
+        mock_chain = Mock()
+        mock_chain.run.side_effect = lambda text: [{"threat_actor": text}]
+        mock_build.return_value = (mock_chain, None)
+        
+        with tempfile.TemporaryDirectory() as output_dir:
+            # A directory where a.pdf's output goes makes writing it fail
+            os.mkdir(os.path.join(output_dir, "a_analysis.txt"))
+            summaries = asyncio.run(asyncio.wait_for(analyze_directory_parallel(
+                list(chunks), None, output_dir, workers=1,
+                executor=ChunkExecutor(max_concurrency=1)
+            ), timeout=10))
+            written = sorted(os.listdir(output_dir))
+        
+        self.assertEqual(written, ["a_analysis.txt", "b_analysis.txt", "c_analysis.txt"])
+        self.assertIn("chunk b2", summaries[1])
+        self.assertIn("chunk c1", summaries[2])
+
 if __name__ == '__main__':
     unittest.main()
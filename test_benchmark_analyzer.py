@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from pypdf import PdfReader
+
+from benchmark_analyzer import make_corpus, run_benchmarks
+from fake_llm import FakeLLMServer
+
+class TestFakeLLMServer(unittest.TestCase):
+    def test_function_call_and_stats(self):
+        """Test extraction requests get a function call and are counted"""
+        with FakeLLMServer() as server:
+            body = json.dumps({
+                "model": "gpt-3.5-turbo",
+                "messages": [{"role": "user", "content": "APT28 used spearphishing"}],
+                "functions": [{"name": "information_extraction", "parameters": {}}]
+            }).encode()
+            request = urllib.request.Request(server.base_url + "/chat/completions", data=body,
+                                             headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request) as response:
+                reply = json.loads(response.read())
+            call = reply["choices"][0]["message"]["function_call"]
+            self.assertEqual(call["name"], "information_extraction")
+            self.assertIn("info", json.loads(call["arguments"]))
+            self.assertEqual(server.stats()["calls"], 1)
+            self.assertGreater(server.stats()["prompt_tokens"], 0)
+
+class TestBenchmarkAnalyzer(unittest.TestCase):
+    def test_corpus_page_counts(self):
+        """Test generated PDFs have the requested page counts and extractable text"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = make_corpus(tmpdir, page_counts=(1, 3))
+            readers = [PdfReader(path) for path in paths]
+            self.assertEqual([len(reader.pages) for reader in readers], [1, 3])
+            self.assertTrue(readers[1].pages[2].extract_text().strip())
+
+    def test_run_benchmarks_report(self):
+        """Test a small run reports parsing, analyzer and backend metrics"""
+        saved = os.environ.get("OPENAI_API_BASE")
+        report = run_benchmarks(page_counts=(1, 2), concurrency_levels=(1, 2), upload_levels=(1, 2), latency=0)
+        self.assertEqual(os.environ.get("OPENAI_API_BASE"), saved)
+        results = report["results"]
+        self.assertEqual(results["parsing"]["pages"], 3)
+        chunks = results["parsing"]["chunks"]
+        for level in ("1", "2"):
+            self.assertEqual(results["analyzer"][level]["llm_calls"], chunks)
+            self.assertEqual(results["analyzer"][level]["findings"], chunks)
+        self.assertEqual(results["analyzer_batch"]["llm_calls"], chunks)
+        backend = results["backend"]
+        if "skipped" not in backend:
+            self.assertEqual(backend["2"]["failed"], 0)
+            self.assertEqual(backend["2"]["llm_calls"], 2 * backend["1"]["llm_calls"])
+        json.dumps(report)
+
+if __name__ == "__main__":
+    unittest.main()
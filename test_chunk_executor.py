@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+from chunk_executor import ChunkExecutor, RateLimiter
+
+class StatusError(Exception):
+    """An API error carrying an HTTP status, as the OpenAI client raises"""
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class RateLimitError(Exception):
+    pass
+
+class TestChunkExecutor(unittest.TestCase):
+    def test_map_preserves_order(self):
+        """Results come back in input order regardless of completion order"""
+        executor = ChunkExecutor(max_concurrency=3)
+
+        async def work(item):
+            await asyncio.sleep(0.01 * (5 - item))
+            return item * 10
+
+        results = executor.run(work, range(5))
+        self.assertEqual([r.value for r in results], [0, 10, 20, 30, 40])
+        self.assertEqual([r.index for r in results], [0, 1, 2, 3, 4])
+
+    def test_map_isolates_failures(self):
+        """A failing chunk does not stop the others"""
+        executor = ChunkExecutor(max_concurrency=2)
+
+        async def work(item):
+            if item == 1:
+                raise ValueError("bad chunk")
+            return item
+
+        results = executor.run(work, range(3))
+        self.assertTrue(results[0].ok)
+        self.assertFalse(results[1].ok)
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertEqual(results[2].value, 2)
+
+    def test_call_retries_with_backoff(self):
+        """Transient errors are retried until the call succeeds"""
+        executor = ChunkExecutor(max_retries=3, backoff_base=0)
+        func = Mock(side_effect=[RateLimitError("rate limited"), StatusError(503), TimeoutError(), "ok"])
+
+        result = asyncio.run(executor.call(func, "text"))
+        self.assertEqual(result, "ok")
+        self.assertEqual(func.call_count, 4)
+
+    def test_call_gives_up_after_max_retries(self):
+        """Persistent errors are raised once retries are exhausted"""
+        executor = ChunkExecutor(max_retries=1, backoff_base=0)
+        func = Mock(side_effect=StatusError(502))
+
+        with self.assertRaises(StatusError):
+            asyncio.run(executor.call(func))
+        self.assertEqual(func.call_count, 2)
+
+    def test_call_does_not_retry_other_errors(self):
+        """Client errors and bugs are raised without retrying"""
+        executor = ChunkExecutor(max_retries=3, backoff_base=0)
+        for error in (StatusError(400), ValueError("bad chunk")):
+            func = Mock(side_effect=error)
+            with self.assertRaises(type(error)):
+                asyncio.run(executor.call(func))
+            self.assertEqual(func.call_count, 1)
+
+    def test_run_refuses_a_running_loop(self):
+        """run() inside a coroutine points callers at map()"""
+        async def double(item):
+            return item * 2
+
+        executor = ChunkExecutor()
+        self.assertEqual([r.value for r in executor.run(double, [1, 2])], [2, 4])
+
+        async def nested():
+            executor.run(double, [1])
+
+        with self.assertRaisesRegex(RuntimeError, "await executor.map"):
+            asyncio.run(nested())
+
+    def test_rate_limiter_reserve(self):
+        """Requests beyond the per-minute budget have to wait"""
+        limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=1000)
+        for _ in range(60):
+            self.assertEqual(limiter.reserve(tokens=1), 0)
+        self.assertGreater(limiter.reserve(tokens=1), 0)
+
+        limiter = RateLimiter(tokens_per_minute=600)
+        self.assertEqual(limiter.reserve(tokens=600), 0)
+        self.assertAlmostEqual(limiter.reserve(tokens=60), 6.0, places=1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from extraction_cache import ExtractionCache
+
+class TestExtractionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_set_counts_hits_and_misses(self):
+        """Test hits and misses are counted and values round-trip"""
+        cache = ExtractionCache(self.path)
+        key = ExtractionCache.make_key("chunk", "gpt-3.5-turbo", 0, {"properties": {}})
+        self.assertIsNone(cache.get(key))
+        cache.set(key, [{"threat_actor": "APT29"}])
+        self.assertEqual(cache.get(key), [{"threat_actor": "APT29"}])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        cache.close()
+
+    def test_persists_across_instances(self):
+        """Test entries survive reopening the database"""
+        cache = ExtractionCache(self.path)
+        cache.set("key", [])
+        cache.close()
+        cache = ExtractionCache(self.path)
+        self.assertEqual(cache.get("key"), [])
+        cache.close()
+
+    def test_key_depends_on_all_inputs(self):
+        """Test model, temperature, schema and prompt all change the key"""
+        base = ExtractionCache.make_key("chunk", "m", 0, {"a": 1}, "prompt")
+        self.assertNotEqual(base, ExtractionCache.make_key("chunk2", "m", 0, {"a": 1}, "prompt"))
+        self.assertNotEqual(base, ExtractionCache.make_key("chunk", "m2", 0, {"a": 1}, "prompt"))
+        self.assertNotEqual(base, ExtractionCache.make_key("chunk", "m", 0.7, {"a": 1}, "prompt"))
+        self.assertNotEqual(base, ExtractionCache.make_key("chunk", "m", 0, {"a": 2}, "prompt"))
+        self.assertNotEqual(base, ExtractionCache.make_key("chunk", "m", 0, {"a": 1}, None))
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted once over max_bytes"""
+        cache = ExtractionCache(self.path, max_bytes=25)
+        cache.set("a", "x" * 8)
+        cache.set("b", "y" * 8)
+        cache.get("a")
+        cache.set("c", "z" * 8)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertLessEqual(cache.stats()["bytes"], 25)
+        cache.close()
+
+    def test_eviction_budget_is_shared_between_instances(self):
+        """Test instances sharing a database (e.g. separate processes) evict against one total"""
+        first = ExtractionCache(self.path, max_bytes=25)
+        second = ExtractionCache(self.path, max_bytes=25)
+        first.set("a", "x" * 8)
+        second.set("b", "y" * 8)
+        first.get("a")
+        second.set("c", "z" * 8)
+        # The clock and the total are shared, so "b" is the oldest entry for both
+        self.assertIsNone(first.get("b"))
+        self.assertIsNotNone(second.get("a"))
+        self.assertIsNotNone(first.get("c"))
+        self.assertEqual(first.stats()["bytes"], second.stats()["bytes"])
+        self.assertLessEqual(first.stats()["bytes"], 25)
+        first.close()
+        second.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+import token_chunker
+from token_chunker import (
+    DEFAULT_CONTEXT_TOKENS, FALLBACK_CHARS_PER_TOKEN, MAX_CHUNK_TOKENS, RESERVED_TOKENS,
+    chunk_token_budget, conservative_estimate, context_tokens, split_pages, token_counter
+)
+
+def load_encoding():
+    # The real tokenizer needs tiktoken and its (downloaded or cached) encoding files
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model("gpt-4")
+    except Exception:
+        return None
+
+ENCODING = load_encoding()
+
+IOC_TEXT = "\n".join(
+    f"d41d8cd98f00b204e9800998ecf8427{i % 10} 10.{i % 256}.3[.]7 hxxp://c2-{i}[.]example[.]net/stage.bin"
+    for i in range(200)
+)
+
+def words(count, word="intel"):
+    # Each "intel " is six characters, i.e. two estimated tokens
+    return " ".join([word] * count)
+
+class TestTokenChunker(unittest.TestCase):
+    def test_budget_from_model_and_configuration(self):
+        """Test the budget follows the context window and configuration overrides"""
+        self.assertEqual(context_tokens("gpt-4-0613"), 8192)
+        self.assertEqual(context_tokens("gpt-4-turbo-2024-04-09"), 128000)
+        self.assertEqual(context_tokens("unknown-model"), DEFAULT_CONTEXT_TOKENS)
+        self.assertEqual(chunk_token_budget("gpt-4"), 8192 - RESERVED_TOKENS)
+        self.assertEqual(chunk_token_budget("gpt-4o"), MAX_CHUNK_TOKENS)
+        self.assertEqual(chunk_token_budget("gpt-4", {"chunk_tokens": 3000}), 3000)
+        self.assertEqual(chunk_token_budget("custom", {"context_tokens": 4096}), 4096 - RESERVED_TOKENS)
+
+    def test_packs_pages_without_overlap(self):
+        """Test small pages are packed together and no text is repeated"""
+        pages = [f"Page {i}. " + words(50) for i in range(20)]
+        chunks = split_pages(pages, max_tokens=1000)
+        self.assertEqual(len(chunks), 2)
+        joined = "\n\n".join(chunks)
+        for i in range(20):
+            self.assertEqual(joined.count(f"Page {i}."), 1)
+
+    def test_keeps_paragraphs_and_pages_whole(self):
+        """Test chunks break between paragraphs and prefer page boundaries"""
+        page = "\n\n".join(f"Paragraph {i} " + words(40) for i in range(3))
+        chunks = split_pages([page, page, page], max_tokens=300)
+        # Each page is ~190 tokens: a greedy split would start a page mid-chunk
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(all(chunk.startswith("Paragraph 0") for chunk in chunks))
+
+    def test_splits_oversized_paragraphs(self):
+        """Test a paragraph larger than the budget is split at lines, then sentences"""
+        lines = "\n".join(f"Line {i} " + words(20) for i in range(10))
+        chunks = split_pages([lines], max_tokens=100)
+        self.assertTrue(all(len(chunk) / 4 <= 100 for chunk in chunks))
+        self.assertEqual(sum(chunk.count("Line ") for chunk in chunks), 10)
+
+        unbroken = "x" * 4000
+        chunks = split_pages([unbroken], max_tokens=100)
+        self.assertEqual("".join(chunks), unbroken)
+        self.assertTrue(all(len(chunk) <= 400 for chunk in chunks))
+
+    def test_overlap_repeats_trailing_paragraphs(self):
+        """Test overlap_tokens carries the last paragraph into the next chunk"""
+        page = "\n\n".join(f"Paragraph {i} " + words(40) for i in range(6))
+        chunks = split_pages([page], max_tokens=300, overlap_tokens=100)
+        self.assertGreater(len(chunks), 1)
+        last_paragraph = chunks[0].split("\n\n")[-1]
+        self.assertTrue(chunks[1].startswith(last_paragraph))
+
+    def test_order_of_magnitude_fewer_chunks(self):
+        """Test an 8k-context budget needs far fewer calls than 1000-character chunks"""
+        pages = ["\n".join(words(15) for _ in range(50)) for _ in range(30)]
+        baseline = sum(len(page) for page in pages) / 800  # 1000 characters with 200 overlap
+        chunks = split_pages(pages, chunk_token_budget("gpt-4"))
+        self.assertLessEqual(len(chunks) * 10, baseline)
+
+    @unittest.skipUnless(ENCODING is not None, "tiktoken or its cl100k_base encoding is not available")
+    def test_real_tokenizer_sizes_chunks(self):
+        """Test chunks of IOC-heavy text stay within the budget as counted by tiktoken"""
+        count = token_counter("gpt-4")
+        self.assertIsNot(count, conservative_estimate)
+        self.assertEqual(count(IOC_TEXT), len(ENCODING.encode(IOC_TEXT)))
+        chunks = split_pages([IOC_TEXT], max_tokens=500, count=count)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(ENCODING.encode(chunk)) <= 500 for chunk in chunks))
+
+    def test_fallback_estimate_is_conservative(self):
+        """Test chunks are sized at FALLBACK_CHARS_PER_TOKEN when no encoding can be loaded"""
+        with mock.patch.object(token_chunker, "_encoding", return_value=None):
+            count = token_counter("gpt-4")
+        self.assertIs(count, conservative_estimate)
+        self.assertEqual(count("x" * 100), 100 / FALLBACK_CHARS_PER_TOKEN)
+        if ENCODING is not None:
+            self.assertGreaterEqual(count(IOC_TEXT), len(ENCODING.encode(IOC_TEXT)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import math
+import re
+from functools import lru_cache
+
+from chunk_executor import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:  # listed in requirements; without it chunks are sized by FALLBACK_CHARS_PER_TOKEN
+    tiktoken = None
+
+# Context windows (tokens) for models we run; unknown models get DEFAULT_CONTEXT_TOKENS
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-16k": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# Room left in the context for the prompt template, the function schema and the reply
+RESERVED_TOKENS = 2048
+
+# Upper bound on a chunk even for very large contexts: extraction quality and
+# per-call latency both suffer on huge inputs
+MAX_CHUNK_TOKENS = 24000
+
+# Characters per token assumed when no tokenizer is available. IOC-heavy text
+# (hashes, IP addresses, defanged URLs) runs close to two characters per
+# token, so the four-character rate-limiting estimate would overfill chunks
+FALLBACK_CHARS_PER_TOKEN = 2.5
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def context_tokens(model_name):
+    """Context window of a model, matching dated variants by prefix"""
+    for name in sorted(MODEL_CONTEXT_TOKENS, key=len, reverse=True):
+        if model_name == name or model_name.startswith(name + "-"):
+            return MODEL_CONTEXT_TOKENS[name]
+    return DEFAULT_CONTEXT_TOKENS
+
+def chunk_token_budget(model_name, configuration=None):
+    """
+    Tokens of document text per LLM call for a model.
+
+    configuration (an LLMModel.configuration dict) may set `chunk_tokens`
+    directly, or `context_tokens` to override the known context window;
+    otherwise the budget is the context window less RESERVED_TOKENS, capped
+    at MAX_CHUNK_TOKENS.
+    """
+    configuration = configuration or {}
+    if configuration.get("chunk_tokens"):
+        return int(configuration["chunk_tokens"])
+    context = int(configuration.get("context_tokens") or context_tokens(model_name))
+    return max(256, min(context - RESERVED_TOKENS, MAX_CHUNK_TOKENS))
+
+def conservative_estimate(text):
+    """Token estimate at FALLBACK_CHARS_PER_TOKEN, used to size chunks without a tokenizer"""
+    return max(1, math.ceil(len(text) / FALLBACK_CHARS_PER_TOKEN))
+
+@lru_cache(maxsize=None)
+def _encoding(model_name):
+    """The model's tiktoken encoding, or None (with a warning, once per model) if unavailable"""
+    if tiktoken is None:
+        print(f"Warning: tiktoken is not installed; sizing {model_name} chunks at "
+              f"{FALLBACK_CHARS_PER_TOKEN} characters per token")
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Encoding files are downloaded on first use; offline hosts need them cached
+        print(f"Warning: could not load the tiktoken encoding for {model_name} ({e}); sizing chunks at "
+              f"{FALLBACK_CHARS_PER_TOKEN} characters per token")
+        return None
+
+def token_counter(model_name=None):
+    """
+    Return a text -> token count function: the model's tiktoken encoding, or
+    conservative_estimate if it cannot be loaded. Without a model name the
+    rough four-characters-per-token estimate is used.
+    """
+    if model_name is None:
+        return estimate_tokens
+    encoding = _encoding(model_name)
+    if encoding is None:
+        return conservative_estimate
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+def _paragraphs(page):
+    """Non-empty, blank-line separated paragraphs of a page"""
+    paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(page)]
+    return [p for p in paragraphs if p]
+
+def _split_oversized(text, max_tokens, count):
+    """Break a paragraph that alone exceeds the budget: at lines, then sentences, then characters"""
+    for splitter, separator in ((lambda t: t.split("\n"), "\n"), (_SENTENCE_END.split, " ")):
+        parts = [p for p in splitter(text) if p.strip()]
+        if len(parts) > 1:
+            pieces = []
+            for piece in _pack(parts, max_tokens, count, separator):
+                pieces.extend(_split_oversized(piece, max_tokens, count) if count(piece) > max_tokens else [piece])
+            return pieces
+    # No natural break left: cut at a character length matching the budget
+    step = max(1, len(text) * max_tokens // count(text))
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+def _pack(parts, max_tokens, count, separator):
+    """Greedily join parts into strings of at most max_tokens (single parts may exceed it)"""
+    packed = []
+    current, current_tokens = [], 0
+    for part in parts:
+        tokens = count(part)
+        if current and current_tokens + tokens > max_tokens:
+            packed.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += tokens
+    if current:
+        packed.append(separator.join(current))
+    return packed
+
+def split_pages(pages, max_tokens, overlap_tokens=0, count=estimate_tokens):
+    """
+    Pack page texts into chunks of at most max_tokens tokens.
+
+    Paragraphs are never split unless one alone exceeds the budget, and a
+    chunk that is at least half full breaks at a page boundary when the next
+    page would fit whole in a chunk of its own. Up to overlap_tokens of
+    trailing paragraphs are repeated at the start of the next chunk (0 by
+    default: paragraphs are kept intact, so little context is lost at a
+    boundary).
+    """
+    units = []  # (text, tokens, starts_page)
+    for page in pages:
+        for i, paragraph in enumerate(_paragraphs(page)):
+            tokens = count(paragraph)
+            pieces = [paragraph] if tokens <= max_tokens else _split_oversized(paragraph, max_tokens, count)
+            for j, piece in enumerate(pieces):
+                units.append((piece, tokens if len(pieces) == 1 else count(piece), i == 0 and j == 0))
+
+    page_tokens = []  # tokens from each unit to the end of its page
+    remaining = 0
+    for text, tokens, starts_page in reversed(units):
+        remaining += tokens
+        page_tokens.append(remaining)
+        if starts_page:
+            remaining = 0
+    page_tokens.reverse()
+
+    chunks = []
+    current, current_tokens = [], 0
+    for (text, tokens, starts_page), rest_of_page in zip(units, page_tokens):
+        full = current_tokens + tokens > max_tokens
+        page_break = (starts_page and current_tokens * 2 >= max_tokens
+                      and rest_of_page <= max_tokens < current_tokens + rest_of_page)
+        if current and (full or page_break):
+            chunks.append("\n\n".join(part for part, _ in current))
+            carried, carried_tokens = [], 0
+            for part, part_tokens in reversed(current):
+                if carried_tokens + part_tokens > overlap_tokens or carried_tokens + part_tokens + tokens > max_tokens:
+                    break
+                carried.insert(0, (part, part_tokens))
+                carried_tokens += part_tokens
+            current, current_tokens = carried, carried_tokens
+        current.append((text, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(part for part, _ in current))
+    return chunks